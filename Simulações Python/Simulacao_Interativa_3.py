@@ -1,13 +1,9 @@
-import numpy as np
-import pandas as pd
+import sys
 
-
-def format_number_pt(value, decimals=2):
-    """Formata números para o padrão português (vírgula como decimal, ponto como milhar)"""
-    try:
-        return f"{value:,.{decimals}f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except (TypeError, ValueError):
-        return str(value)
+from simulador.comandos import main as command_line
+from simulador.formatacao import format_number_pt, render_table
+from simulador.modos import single_path
+from simulador.resultados import LABELS
 
 
 def simulation(
@@ -31,13 +27,26 @@ def simulation(
     contribution_step_up_amount=100,
     max_monthly_contribution=None,
     withdrawal_strategy=1,  # 1 = Valor fixo, 2 = 4% anual líquido
-    seed=None
+    block_length=None,
+    bootstrap_circular=True,
+    bootstrap_stationary=False,
+    seed=None,
+    engine="numpy",
+    monthly_rules="original",
+    as_table=False
 ):
     """
     Simula o crescimento de um portfólio de investimentos ao longo do tempo.
     
+    Nos modos 3 e 5, com as regras "original" (padrão), o valor fixo a retirar não
+    cresce e withdrawal_growth_rate só se aplica ao valor mostrado na tabela, como
+    no ciclo mensal original. Com monthly_rules="consistent" o valor fixo cresce no
+    fim de cada ano com retiradas, como nos modos anuais, e a tabela mostra os
+    fluxos efetivos de cada ano.
+    
     Args:
-        mode: 1 = Retornos aleatórios, 2 = Histórico real do S&P500 (anual), 3 = Dados mensais reais
+        mode: 1 = Retornos aleatórios, 2 = Histórico real do S&P500 (anual), 3 = Dados mensais reais,
+            4 = Bootstrap em blocos do histórico anual, 5 = Bootstrap em blocos do histórico mensal
         total_years: Número total de anos para simular
         initial_portfolio: Valor inicial do portfólio
         initial_monthly_contribution: Contribuição mensal inicial
@@ -57,327 +66,53 @@ def simulation(
         contribution_step_up_amount: Valor a aumentar nas contribuições
         max_monthly_contribution: Contribuição mensal máxima
         withdrawal_strategy: Estratégia de retirada (1=fixo, 2=4% anual)
+        block_length: Comprimento dos blocos do bootstrap (padrão: 5 anos no modo 4, 12 meses no modo 5)
+        bootstrap_circular: Permitir blocos que dão a volta ao fim da série (modos 4 e 5)
+        bootstrap_stationary: Blocos de comprimento aleatório, com média block_length (modos 4 e 5)
         seed: Semente para gerador aleatório
+        engine: Motor dos modos anuais ("numpy", "numba" ou "auto", ver simulador.modos.simulation_batch)
+        monthly_rules: Regras dos modos 3 e 5 ("original" ou "consistent")
+        as_table: Devolver a tabela em colunas (YearlyResults) em vez do DataFrame
     
     Returns:
         DataFrame com resultados anuais, ano de início das retiradas, total retirado
     """
     
-    # Histórico real do S&P500 (1969–2024) - Retornos anuais
-    sp500_returns = [
-        26.29, 25.02, -18.11, 28.71, 18.40, 31.49, -4.38, 21.83, 11.96, 1.38, 13.69,
-        32.39, 16.00, 2.11, 15.06, 26.46, -37.00, 5.49, 15.79, 4.91, 10.88, 28.68,
-        -22.10, -11.89, -9.10, 21.04, 28.58, 33.36, 22.96, 37.58, 1.32, 10.08, 7.62,
-        30.47, -3.10, 31.69, 16.61, 5.25, 18.67, 31.73, 6.27, 22.56, 21.55, -4.91,
-        32.42, 18.44, 6.56, -7.18, 23.84, 37.20, -26.47, -14.66, 18.98, 14.31, 4.01
-    ]
-    
-    # Histórico real do S&P500 (1985-2024) - Retornos mensais
-    sp500_monthly_returns = [
-        # 1985
-        5.8, 2.1, -1.2, 3.4, 2.8, 1.9, -2.1, 4.2, 1.5, -3.8, 2.9, 4.1,
-        # 1986
-        2.3, 5.1, 1.8, -0.9, 3.2, 2.4, -1.7, 3.8, 2.1, -2.5, 4.3, 2.7,
-        # 1987
-        13.2, 4.4, -2.8, 1.9, 2.1, 3.5, 6.8, 3.2, -3.3, -21.5, -8.2, 6.1,
-        # 1988
-        4.2, 2.8, 1.9, -1.2, 3.4, 2.1, 1.8, 2.9, 3.1, -2.8, 1.5, 2.4,
-        # 1989
-        7.1, 1.8, 2.9, 4.2, 3.1, 2.8, 1.9, 0.8, -1.2, 2.4, 1.8, 2.1,
-        # 1990
-        -6.8, 2.1, 1.9, 2.8, 3.4, -0.8, -3.2, -9.2, -5.1, 2.8, 6.1, 2.4,
-        # 1991
-        4.2, 3.8, 2.1, 1.9, 2.8, 1.5, 2.4, 3.1, 1.8, 2.9, 1.2, 11.2,
-        # 1992
-        2.1, 1.8, 2.4, 1.9, 2.8, 1.5, 2.1, 1.8, 2.4, 1.9, 2.8, 1.5,
-        # 1993
-        0.8, 1.2, 1.8, 2.1, 1.9, 2.4, 1.8, 2.1, 1.9, 2.4, 1.8, 1.2,
-        # 1994
-        3.1, -2.8, -1.9, 1.2, 2.1, 1.8, 2.4, 1.9, 2.1, 1.8, 2.4, 1.9,
-        # 1995
-        2.8, 3.4, 2.1, 1.9, 2.8, 1.5, 2.4, 3.1, 1.8, 2.9, 4.2, 1.8,
-        # 1996
-        3.1, 0.8, 2.1, 1.9, 2.8, 1.5, 2.4, 1.8, 2.1, 1.9, 2.4, 1.8,
-        # 1997
-        6.1, 0.8, -4.2, 5.8, 5.1, 4.2, 7.8, -5.8, 5.1, -3.2, 4.2, 1.8,
-        # 1998
-        1.0, 7.0, 4.9, 0.8, -1.8, 3.8, -1.2, -14.5, 6.2, 8.1, 5.8, 5.1,
-        # 1999
-        4.1, -2.9, 3.8, 3.9, -2.5, 5.4, -3.2, -0.5, -2.8, 6.2, 1.9, 5.8,
-        # 2000
-        -5.1, 1.9, 9.7, -3.1, -2.2, 2.4, -1.8, 6.1, -5.4, -0.5, -8.0, 0.4,
-        # 2001
-        3.5, -9.2, -6.4, 7.7, 0.4, -2.5, -1.2, -6.4, -8.2, 1.8, 7.5, 0.8,
-        # 2002
-        -1.6, -2.1, 3.7, -6.1, -0.9, -7.2, -7.9, 0.5, -11.0, 8.6, 5.7, -6.0,
-        # 2003
-        -2.7, -1.7, 1.0, 8.1, 5.1, 1.2, 1.6, 1.8, -1.2, 5.5, 0.9, 5.1,
-        # 2004
-        1.7, 1.2, -1.6, -1.7, 1.2, 1.8, -3.4, 0.4, 0.8, 1.4, 3.9, 3.2,
-        # 2005
-        -2.5, 1.9, -1.9, -2.0, 3.0, 0.0, 3.6, -1.2, 0.7, -1.8, 3.5, 0.0,
-        # 2006
-        2.5, 0.0, 1.2, 1.3, -3.1, 0.2, 0.3, 2.1, 2.5, 3.2, 1.8, 1.4,
-        # 2007
-        1.4, -2.2, 1.0, 4.3, 3.3, -1.8, -3.2, 1.3, 3.6, 1.5, -4.4, -0.9,
-        # 2008
-        -6.1, -3.5, -0.6, 4.8, 1.1, -8.6, -0.8, 1.2, -9.1, -16.9, -7.2, 0.8,
-        # 2009
-        -8.6, -10.9, 8.5, 9.4, 5.3, 0.0, 7.4, 3.4, 3.6, -1.9, 5.7, 1.8,
-        # 2010
-        -3.7, 2.9, 5.9, 1.5, -8.2, -5.4, 6.9, -4.7, 8.8, 3.7, -0.2, 6.5,
-        # 2011
-        2.3, 3.2, -0.1, 2.8, -1.4, -1.8, -2.2, -5.7, -7.2, 10.8, -0.5, 0.9,
-        # 2012
-        4.4, 4.1, 3.1, -0.8, -6.3, 4.0, 1.3, 2.0, 2.4, -1.9, 0.3, 0.7,
-        # 2013
-        5.0, 1.1, 3.6, 1.8, 2.1, -1.5, 4.9, -3.1, 3.0, 4.5, 2.8, 2.4,
-        # 2014
-        -3.6, 4.3, 0.7, 0.6, 2.1, 1.9, -1.5, 3.8, -1.6, 2.3, 2.5, -0.4,
-        # 2015
-        -3.1, 5.5, -1.7, 0.9, 1.0, -2.1, 2.0, -6.3, -2.6, 8.3, 0.1, -1.8,
-        # 2016
-        -5.1, -0.4, 6.6, 0.3, 1.5, 0.1, 3.6, -0.1, -0.1, -1.9, 3.4, 1.8,
-        # 2017
-        1.8, 3.7, 0.0, 0.9, 1.2, 0.5, 1.9, 0.1, 1.9, 2.2, 2.8, 1.1,
-        # 2018
-        5.6, -3.9, -2.7, 0.3, 2.2, 0.5, 3.6, 3.0, 0.4, -6.9, 1.8, -9.2,
-        # 2019
-        7.9, 3.0, 1.8, 3.9, -6.6, 6.9, 1.3, -1.8, 1.7, 2.0, 3.4, 2.9,
-        # 2020
-        -0.2, -8.4, -12.5, 12.7, 4.5, 1.8, 5.5, 7.0, -3.9, -2.8, 10.8, 3.7,
-        # 2021
-        -1.0, 2.6, 4.2, 5.2, 0.6, 2.2, 2.3, 2.9, -4.8, 6.9, -0.8, 4.4,
-        # 2022
-        -5.3, -3.1, 3.6, -8.8, 0.0, -8.4, 9.1, -4.2, -9.3, 8.0, 5.4, -5.9,
-        # 2023
-        6.2, -2.6, 3.5, 1.5, 0.3, 6.5, 3.1, -1.8, -4.9, -2.2, 8.9, 4.4,
-        # 2024
-        1.6, 5.2, 3.1, -4.2, 4.8, 3.5, 2.1, 1.8, -4.9, 4.6, 2.8, 1.2
-    ]
-
-    if seed is not None:
-        np.random.seed(seed)
-
-    # Inicialização das variáveis
-    portfolio = initial_portfolio
-    phase = "Acumulação"
-    current_withdrawal_net = withdrawal_base
-    results = []
-    withdrawal_start_year = None
-    total_withdrawn = 0.0
-    total_contributions = 0.0
-
-    if mode == 3:  # Simulação mensal com dados reais
-        # Simulação mensal
-        monthly_results = []
-        total_months = total_years * 12
-        
-        for month in range(total_months):
-            year = (month // 12) + 1
-            month_in_year = (month % 12) + 1
-            
-            # Cálculo das contribuições mensais
-            increment_periods = (year - 1) // contribution_step_up_interval
-            adjusted_monthly_contribution = initial_monthly_contribution + (contribution_step_up_amount * increment_periods)
-            
-            if max_monthly_contribution is not None:
-                adjusted_monthly_contribution = min(adjusted_monthly_contribution, max_monthly_contribution)
-            
-            # Aplicar crescimento anual das contribuições
-            monthly_contribution = adjusted_monthly_contribution * (1 + contribution_growth_rate) ** (year - 1)
-            
-            # Aplicar contribuição extra em junho e dezembro (14 meses por ano)
-            if month_in_year in [6, 12]:  # Junho e dezembro
-                monthly_contribution += adjusted_monthly_contribution * (1 + contribution_growth_rate) ** (year - 1)
-            
-            # Transição para fase de retirada
-            if phase == "Acumulação" and portfolio >= target_portfolio:
-                phase = "Retirada"
-                withdrawal_start_year = year
-                current_withdrawal_net = withdrawal_base
-            
-            # Processamento da fase atual
-            if phase == "Acumulação":
-                portfolio += monthly_contribution
-                total_contributions += monthly_contribution
-            else:  # Fase de retirada
-                if continue_contributions_during_withdrawal:
-                    portfolio += monthly_contribution
-                    total_contributions += monthly_contribution
-                
-                # Retiradas mensais (dividir retirada anual por 12)
-                if portfolio >= min_threshold:
-                    if withdrawal_strategy == 1:
-                        desired_net_monthly = current_withdrawal_net / 12
-                        if portfolio >= upper_threshold:
-                            desired_net_monthly *= 2
-                    else:  # 4% anual líquido
-                        desired_net_monthly = (0.04 * portfolio) / 12
-                    
-                    # Cálculo para obter bruto tal que o líquido = desired_net_monthly
-                    capital_ratio = min(1.0, total_contributions / portfolio) if portfolio > 0 else 1.0
-                    gross_withdrawal_monthly = desired_net_monthly / (1 - tax_rate_withdrawal * (1 - capital_ratio))
-                    
-                    portfolio -= gross_withdrawal_monthly
-                    total_withdrawn += desired_net_monthly
-            
-            # Aplicação dos retornos mensais
-            if month < len(sp500_monthly_returns):
-                monthly_return = sp500_monthly_returns[month] / 100
-            else:
-                # Se não há dados suficientes, usar dados anuais convertidos para mensais
-                annual_index = (month // 12) % len(sp500_returns)
-                annual_return = sp500_returns[annual_index] / 100
-                # Converter retorno anual para mensal (aproximação)
-                monthly_return = (1 + annual_return) ** (1/12) - 1
-            
-            # Converter taxa de gestão anual para mensal
-            monthly_management_fee = management_fee / 12
-            effective_return = monthly_return - monthly_management_fee
-            portfolio *= (1 + effective_return)
-            
-            monthly_results.append({
-                'year': year,
-                'month': month_in_year,
-                'portfolio': portfolio,
-                'phase': phase,
-                'monthly_contribution': monthly_contribution,
-                'monthly_return': monthly_return,
-                'effective_return': effective_return
-            })
-        
-        # Agregação dos resultados mensais por ano
-        for year in range(1, total_years + 1):
-            year_months = [m for m in monthly_results if m['year'] == year]
-            
-            if not year_months:
-                continue
-                
-            data = {}
-            data["Ano"] = year
-            data["Fase"] = year_months[0]['phase']
-            data["Saldo inicio (€)"] = round(year_months[0]['portfolio'] / (1 + year_months[0]['effective_return']), 2)
-            
-            # Soma das contribuições do ano
-            annual_contribution = sum(m['monthly_contribution'] for m in year_months)
-            data["Contribuição (€)"] = round(annual_contribution, 2)
-            
-            # Retiradas (já calculadas mensalmente)
-            if data["Fase"] == "Retirada":
-                if withdrawal_strategy == 1:
-                    desired_net = current_withdrawal_net
-                    if year_months[-1]['portfolio'] >= upper_threshold:
-                        desired_net *= 2
-                else:
-                    desired_net = 0.04 * year_months[-1]['portfolio']
-                
-                data["Retirada (€)"] = round(desired_net, 2)
-                data["Retirada líquida (€)"] = round(desired_net, 2)
-                
-                # Atualiza para estratégia de valor fixo
-                if withdrawal_strategy == 1:
-                    current_withdrawal_net *= (1 + withdrawal_growth_rate)
-            else:
-                data["Retirada (€)"] = round(0.0, 2)
-                data["Retirada líquida (€)"] = round(0.0, 2)
-            
-            # Retorno anual composto
-            portfolio_start = data["Saldo inicio (€)"]
-            portfolio_end = year_months[-1]['portfolio']
-            annual_return = (portfolio_end / portfolio_start - 1) * 100
-            
-            data["Crescimento (%)"] = f"{format_number_pt(annual_return, 2)} %"
-            data["Saldo final (€)"] = round(portfolio_end, 2)
-            results.append(data)
-    
-    else:  # Simulação anual (modos 1 e 2)
-        for year in range(1, total_years + 1):
-            data = {}
-            data["Ano"] = year
-            data["Fase"] = phase
-            data["Saldo inicio (€)"] = round(portfolio, 2)
-
-            # Cálculo das contribuições
-            increment_periods = (year - 1) // contribution_step_up_interval
-            adjusted_monthly_contribution = initial_monthly_contribution + (contribution_step_up_amount * increment_periods)
-            
-            if max_monthly_contribution is not None:
-                adjusted_monthly_contribution = min(adjusted_monthly_contribution, max_monthly_contribution)
-
-            annual_contribution = adjusted_monthly_contribution * contribution_multiplier
-            annual_contribution *= (1 + contribution_growth_rate) ** (year - 1)
-
-            # Transição para fase de retirada
-            if phase == "Acumulação" and portfolio >= target_portfolio:
-                phase = "Retirada"
-                withdrawal_start_year = year
-                current_withdrawal_net = withdrawal_base
-                data["Fase"] = phase
-
-            # Processamento da fase atual
-            if phase == "Acumulação":
-                data["Contribuição (€)"] = round(annual_contribution, 2)
-                data["Retirada (€)"] = round(0.0, 2)
-                data["Retirada líquida (€)"] = round(0.0, 2)
-                portfolio += annual_contribution
-                total_contributions += annual_contribution
-
-            else:  # Fase de retirada
-                this_contribution = annual_contribution if continue_contributions_during_withdrawal else 0.0
-                data["Contribuição (€)"] = round(this_contribution, 2)
-
-                if continue_contributions_during_withdrawal:
-                    portfolio += this_contribution
-                    total_contributions += this_contribution
-
-                # Cálculo das retiradas
-                if portfolio < min_threshold:
-                    data["Retirada (€)"] = round(0.0, 2)
-                    data["Retirada líquida (€)"] = round(0.0, 2)
-                else:
-                    # Definição do líquido desejado conforme estratégia
-                    if withdrawal_strategy == 1:
-                        desired_net = current_withdrawal_net
-                        if portfolio >= upper_threshold:
-                            desired_net *= 2
-                    else:  # 4% anual líquido
-                        desired_net = 0.04 * portfolio
-
-                    # Cálculo para obter bruto tal que o líquido = desired_net
-                    # (imposto só sobre mais-valias)
-                    capital_ratio = min(1.0, total_contributions / portfolio) if portfolio > 0 else 1.0
-                    gross_withdrawal = desired_net / (1 - tax_rate_withdrawal * (1 - capital_ratio))
-                    capital_withdrawn = gross_withdrawal * capital_ratio
-                    gain_withdrawn = gross_withdrawal - capital_withdrawn
-                    tax_paid = gain_withdrawn * tax_rate_withdrawal
-                    net_withdrawal = gross_withdrawal - tax_paid
-
-                    portfolio -= gross_withdrawal
-                    total_withdrawn += net_withdrawal
-                    data["Retirada (€)"] = round(gross_withdrawal, 2)
-                    data["Retirada líquida (€)"] = round(net_withdrawal, 2)
-
-                    # Atualiza apenas para estratégia de valor fixo
-                    if withdrawal_strategy == 1:
-                        current_withdrawal_net *= (1 + withdrawal_growth_rate)
-
-            # Aplicação dos retornos
-            if mode == 1:
-                annual_return = np.random.normal(loc=mean_return, scale=std_return)
-            else:
-                annual_return = sp500_returns[(year - 1) % len(sp500_returns)] / 100
-
-            effective_return = annual_return - management_fee
-            portfolio *= (1 + effective_return)
-            data["Crescimento (%)"] = f"{format_number_pt(effective_return * 100, 2)} %"
-            data["Saldo final (€)"] = round(portfolio, 2)
-            results.append(data)
-
-    df = pd.DataFrame(results)
-
-    # Configuração da formatação para exibição
-    pd.options.display.float_format = lambda x: format_number_pt(x, 2)
+    table, withdrawal_start_year, total_withdrawn = single_path(
+        mode=mode,
+        total_years=total_years,
+        initial_portfolio=initial_portfolio,
+        initial_monthly_contribution=initial_monthly_contribution,
+        contribution_multiplier=contribution_multiplier,
+        contribution_growth_rate=contribution_growth_rate,
+        mean_return=mean_return,
+        std_return=std_return,
+        management_fee=management_fee,
+        target_portfolio=target_portfolio,
+        min_threshold=min_threshold,
+        upper_threshold=upper_threshold,
+        withdrawal_base=withdrawal_base,
+        withdrawal_growth_rate=withdrawal_growth_rate,
+        tax_rate_withdrawal=tax_rate_withdrawal,
+        continue_contributions_during_withdrawal=continue_contributions_during_withdrawal,
+        contribution_step_up_interval=contribution_step_up_interval,
+        contribution_step_up_amount=contribution_step_up_amount,
+        max_monthly_contribution=max_monthly_contribution,
+        withdrawal_strategy=withdrawal_strategy,
+        block_length=block_length,
+        bootstrap_circular=bootstrap_circular,
+        bootstrap_stationary=bootstrap_stationary,
+        seed=seed,
+        engine=engine,
+        monthly_rules=monthly_rules,
+        decimals=2,
+        growth_formatter=None  # numérico; formatado ao mostrar (render_table)
+    )
+
+    if as_table:
+        return table, withdrawal_start_year, total_withdrawn
+
+    df = table.to_frame()
 
     return df, withdrawal_start_year, round(total_withdrawn, 2)
 
@@ -390,6 +125,8 @@ Escolha o tipo de simulação:
 1 - Retornos personalizados (média em %/desvio)
 2 - Histórico real do S&P500 (anual)
 3 - Dados mensais reais do S&P500 (1985-2024)
+4 - Bootstrap em blocos do histórico anual do S&P500
+5 - Bootstrap em blocos do histórico mensal do S&P500
 """)
     mode = int(input("Opção: "))
 
@@ -440,6 +177,14 @@ Escolha a estratégia de retirada:
         mean_return = 0.07
         std_return = 0.15
 
+    # Comprimento dos blocos (apenas para os modos 4 e 5)
+    if mode == 4:
+        block_length = int(input("Comprimento dos blocos do bootstrap (anos): "))
+    elif mode == 5:
+        block_length = int(input("Comprimento dos blocos do bootstrap (meses): "))
+    else:
+        block_length = None
+
     # Taxa de gestão (em %)
     management_fee_input = float(input("Taxa de gestão anual (%): "))
     management_fee = management_fee_input / 100
@@ -468,7 +213,8 @@ Escolha a estratégia de retirada:
         'contribution_step_up_interval': contribution_step_up_interval,
         'contribution_step_up_amount': contribution_step_up_amount,
         'max_monthly_contribution': max_monthly_contribution,
-        'withdrawal_strategy': withdrawal_strategy
+        'withdrawal_strategy': withdrawal_strategy,
+        'block_length': block_length
     }
 
 
@@ -489,7 +235,7 @@ def main():
     
     # Exibição dos resultados
     print("\n=== RESULTADOS ===")
-    print(df.to_string(index=False))
+    render_table(df, decimals=2, suffixes={LABELS["growth"]: " %"})
     
     print(f"\n=== RESUMO ===")
     print(f"Ano de início das retiradas: {withdrawal_start_year if withdrawal_start_year else 'Não atingido'}")
@@ -509,4 +255,7 @@ def main():
 
 
 if __name__ == "__main__":
+    # Com argumentos corre sem perguntas (ver simulador.comandos); sem argumentos, o questionário
+    if len(sys.argv) > 1:
+        sys.exit(command_line(sys.argv[1:], prog="python Simulacao_Interativa_3.py"))
     main()
@@ -0,0 +1,73 @@
+"""
+Motor de simulação partilhado pelos scripts de `Simulações Python`.
+
+Os scripts `Simulacao*.py` continuam a ser o ponto de entrada interativo;
+este pacote reúne as versões vetorizadas (muitas trajetórias de uma vez)
+das mesmas regras de acumulação e retirada.
+"""
+from simulador.resultados import ACUMULACAO, RETIRADA, YearlyResults
+from simulador.vetorizado import (
+    BatchResult,
+    contribution_schedule,
+    monte_carlo_batch,
+    simulate_paths,
+)
+from simulador.modos import simulation_batch
+from simulador.paralelo import run_parallel
+from simulador.agregacao import StreamingSummary, stream_simulation
+from simulador.mensal import monthly_contribution_schedule, simulate_monthly_paths
+from simulador.diario import DailyBatchResult, simulate_daily_paths
+from simulador.coortes import backtest_annual_cohorts, backtest_monthly_cohorts
+from simulador.grelha import sweep
+from simulador.comparacao import compare, sampling_efficiency
+from simulador.adaptativo import AdaptiveResult, adaptive_simulation
+from simulador.retoma import PhaseCheckpoint, phase_checkpoint
+from simulador.cache import ResultCache
+from simulador.objetivos import GoalSeekResult, max_safe_withdrawal, min_required_contribution
+from simulador.registo import ReturnRegistry, SeriesInfo, load_series, series_info
+from simulador.ingestao import ingest_prices
+from simulador.memoria import chunk_size, chunked_batch, parse_memory
+from simulador.instrumentacao import Instrumentation
+from simulador.formatacao import format_pt, render_table
+
+__all__ = [
+    "ACUMULACAO",
+    "adaptive_simulation",
+    "AdaptiveResult",
+    "RETIRADA",
+    "ResultCache",
+    "BatchResult",
+    "chunk_size",
+    "chunked_batch",
+    "compare",
+    "backtest_annual_cohorts",
+    "backtest_monthly_cohorts",
+    "contribution_schedule",
+    "DailyBatchResult",
+    "format_pt",
+    "GoalSeekResult",
+    "ingest_prices",
+    "Instrumentation",
+    "load_series",
+    "max_safe_withdrawal",
+    "min_required_contribution",
+    "monte_carlo_batch",
+    "monthly_contribution_schedule",
+    "parse_memory",
+    "phase_checkpoint",
+    "PhaseCheckpoint",
+    "render_table",
+    "ReturnRegistry",
+    "run_parallel",
+    "sampling_efficiency",
+    "series_info",
+    "SeriesInfo",
+    "simulate_daily_paths",
+    "simulate_monthly_paths",
+    "simulate_paths",
+    "simulation_batch",
+    "stream_simulation",
+    "StreamingSummary",
+    "sweep",
+    "YearlyResults",
+]
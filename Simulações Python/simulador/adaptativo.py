@@ -0,0 +1,213 @@
+"""
+Monte Carlo adaptativo: simula até atingir a precisão pedida.
+
+Em vez de um número fixo de trajetórias indica-se a tolerância de cada
+métrica (metade da largura do intervalo de confiança) e os blocos de
+trajetórias são simulados até todas ficarem dentro da tolerância:
+
+    adaptive_simulation({"success_probability": 0.005}, confidence=0.95, seed=1)
+
+Métricas (`METRICS`):
+- "target_probability", "ruin_probability", "success_probability":
+  probabilidades (tolerância em fração, 0.005 = ±0,5 pontos percentuais),
+  com o intervalo de Agresti-Coull, que não colapsa quando nenhuma (ou
+  todas as) trajetória(s) atinge(m) o evento;
+- "median_final_balance": saldo final mediano (tolerância em €), com o
+  intervalo de confiança da mediana por estatísticas de ordem (sem supor
+  nenhuma distribuição).
+
+O primeiro bloco tem `initial_paths` trajetórias; os seguintes têm as que
+faltam, pela regra 1/√n, para a métrica mais atrasada cumprir a tolerância
+(com uma margem), limitadas a `block_size`. Cenários fáceis terminam no
+primeiro ou segundo bloco; os difíceis recebem as trajetórias de que
+precisam até `max_paths`.
+
+Cada bloco usa um gerador de `SeedSequence(seed).spawn`, como em
+`stream_simulation`, por isso o resultado é reprodutível para a mesma semente.
+"""
+import time
+from dataclasses import dataclass, field
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from simulador.agregacao import DEFAULT_BLOCK_SIZE
+from simulador.memoria import chunk_size
+from simulador.modos import simulation_batch
+
+METRICS = {
+    "target_probability": "Atinge o target (%)",
+    "ruin_probability": "Ruína (%)",
+    "success_probability": "Sucesso (%)",
+    "median_final_balance": "Saldo final mediano (€)",
+}
+
+DEFAULT_INITIAL_PATHS = 2000
+DEFAULT_MAX_PATHS = 10_000_000
+
+# Margem sobre as trajetórias projetadas, para não parar mesmo antes da tolerância
+_GROWTH_MARGIN = 1.2
+
+
+@dataclass
+class AdaptiveResult:
+    """
+    Resultado de uma simulação adaptativa.
+
+    Attributes:
+        estimates: Estimativa de cada métrica pedida (probabilidades em fração)
+        intervals: Intervalo de confiança (inferior, superior) de cada métrica
+        half_widths: Metade da largura desses intervalos
+        tolerances: Tolerâncias pedidas
+        confidence: Nível de confiança dos intervalos
+        n_paths: Trajetórias simuladas
+        blocks: Blocos simulados
+        elapsed: Tempo total (segundos)
+        converged: Se todas as métricas ficaram dentro da tolerância
+            (False se `max_paths` foi atingido antes)
+        history: (trajetórias acumuladas, meias larguras) após cada bloco
+    """
+
+    estimates: dict
+    intervals: dict
+    half_widths: dict
+    tolerances: dict
+    confidence: float
+    n_paths: int
+    blocks: int
+    elapsed: float
+    converged: bool
+    history: list = field(default_factory=list, repr=False)
+
+    def to_frame(self):
+        """Uma linha por métrica (probabilidades em %)"""
+        rows = []
+        for metric, tolerance in self.tolerances.items():
+            scale = 1.0 if metric == "median_final_balance" else 100.0
+            lower, upper = self.intervals[metric]
+            rows.append({
+                "Métrica": METRICS[metric],
+                "Estimativa": self.estimates[metric] * scale,
+                "IC inferior": lower * scale,
+                "IC superior": upper * scale,
+                "Tolerância (±)": tolerance * scale,
+                "Cumprida": self.half_widths[metric] <= tolerance,
+            })
+        return pd.DataFrame(rows)
+
+
+def _proportion_interval(successes, n, z):
+    """Estimativa e intervalo de Agresti-Coull de uma proporção"""
+    adjusted_n = n + z * z
+    adjusted_p = (successes + z * z / 2) / adjusted_n
+    half_width = z * float(np.sqrt(adjusted_p * (1 - adjusted_p) / adjusted_n))
+    return successes / n, (max(adjusted_p - half_width, 0.0), min(adjusted_p + half_width, 1.0))
+
+
+def _median_interval(values, z):
+    """Mediana e intervalo de confiança por estatísticas de ordem"""
+    n = len(values)
+    spread = z * np.sqrt(n) / 2
+    lower = max(int(np.floor(n / 2 - spread)), 0)
+    upper = min(int(np.ceil(n / 2 + spread)), n - 1)
+    ordered = np.partition(values, (lower, upper))
+    return float(np.median(values)), (float(ordered[lower]), float(ordered[upper]))
+
+
+def adaptive_simulation(
+    tolerances,
+    confidence=0.95,
+    initial_paths=DEFAULT_INITIAL_PATHS,
+    block_size=DEFAULT_BLOCK_SIZE,
+    max_paths=DEFAULT_MAX_PATHS,
+    seed=None,
+    max_memory=None,
+    **params
+):
+    """
+    Simula blocos de trajetórias até as métricas pedidas atingirem a precisão.
+
+    Args:
+        tolerances: Dicionário {métrica: tolerância} com métricas de
+            `METRICS`; a tolerância é a meia largura máxima do intervalo de
+            confiança (fração nas probabilidades, € no saldo mediano)
+        confidence: Nível de confiança dos intervalos
+        initial_paths: Trajetórias do primeiro bloco
+        block_size: Máximo de trajetórias por bloco (define o pico de memória)
+        max_paths: Limite de trajetórias; ao atingi-lo devolve o resultado
+            com `converged=False`
+        seed: Semente (gerada se omitida)
+        max_memory: Orçamento de memória (ex: "2GB"); se indicado, limita
+            também o tamanho dos blocos
+        **params: Parâmetros de `simulation_batch`
+
+    Returns:
+        AdaptiveResult
+    """
+    unknown = set(tolerances) - set(METRICS)
+    if unknown:
+        raise ValueError(f"Métricas desconhecidas: {', '.join(sorted(unknown))}")
+    if not tolerances or any(tolerance <= 0 for tolerance in tolerances.values()):
+        raise ValueError("Indique pelo menos uma métrica, com tolerância positiva")
+    if params.get("sampling", "random") != "random":
+        raise ValueError("Os intervalos supõem trajetórias independentes (sampling='random')")
+    for name in ("n_paths", "rng", "record"):
+        if name in params:
+            raise ValueError(f"{name} é definido pela simulação adaptativa")
+
+    params.setdefault("total_years", 55)
+    if max_memory is not None:
+        block_size = min(block_size, chunk_size(max_paths, max_memory, copies=0, **params))
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    seed_sequence = np.random.SeedSequence(seed)
+
+    counts = {"target_probability": 0, "ruin_probability": 0, "success_probability": 0}
+    final_balances = []
+    n_paths = blocks = 0
+    history = []
+    started = time.perf_counter()
+    next_block = initial_paths
+
+    while True:
+        block = min(max(next_block, 1), block_size, max_paths - n_paths)
+        (child,) = seed_sequence.spawn(1)
+        result = simulation_batch(n_paths=block, rng=np.random.default_rng(child), **params)
+        reached = result.reached_target
+        counts["target_probability"] += int(reached.sum())
+        counts["ruin_probability"] += int(result.ruined.sum())
+        counts["success_probability"] += int((reached & ~result.ruined).sum())
+        if "median_final_balance" in tolerances:
+            final_balances.append(result.final_balance)
+        n_paths += block
+        blocks += 1
+
+        estimates, intervals = {}, {}
+        for metric in tolerances:
+            if metric == "median_final_balance":
+                final_balances = [np.concatenate(final_balances)]
+                estimates[metric], intervals[metric] = _median_interval(final_balances[0], z)
+            else:
+                estimates[metric], intervals[metric] = _proportion_interval(counts[metric], n_paths, z)
+        half_widths = {metric: (upper - lower) / 2 for metric, (lower, upper) in intervals.items()}
+        history.append((n_paths, dict(half_widths)))
+
+        converged = all(half_widths[metric] <= tolerance for metric, tolerance in tolerances.items())
+        if converged or n_paths >= max_paths:
+            break
+        # meia largura ∝ 1/√n: trajetórias que a métrica mais atrasada ainda precisa
+        ratio = max(half_widths[metric] / tolerance for metric, tolerance in tolerances.items())
+        next_block = int(np.ceil(n_paths * (ratio * ratio * _GROWTH_MARGIN - 1)))
+
+    return AdaptiveResult(
+        estimates=estimates,
+        intervals=intervals,
+        half_widths=half_widths,
+        tolerances=dict(tolerances),
+        confidence=confidence,
+        n_paths=n_paths,
+        blocks=blocks,
+        elapsed=time.perf_counter() - started,
+        converged=converged,
+        history=history,
+    )
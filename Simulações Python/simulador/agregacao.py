@@ -0,0 +1,211 @@
+"""
+Agregação em streaming de simulações em lote.
+
+Em vez de guardar o saldo de todas as trajetórias, `StreamingSummary`
+consome blocos de trajetórias à medida que são simulados e mantém apenas
+estatísticas por ano: histogramas fixos (bins geométricos) para as bandas
+P5/P25/P50/P75/P95, somas para as médias, a probabilidade de ruína e a
+distribuição do ano de início das retiradas. A memória depende do número de
+anos e de bins, nunca do número de trajetórias.
+"""
+import numpy as np
+import pandas as pd
+
+from simulador.memoria import chunk_size
+from simulador.modos import simulation_batch
+from simulador.resultados import ACUMULACAO, LABELS, RETIRADA
+
+DEFAULT_QUANTILES = (5, 25, 50, 75, 95)
+DEFAULT_BLOCK_SIZE = 65536
+
+
+class _Histogram:
+    """
+    Histograma por ano com bins geométricos fixos entre `low` e `high`.
+
+    Valores negativos ficam num bin próprio, tal como os valores acima de
+    `high`; o mínimo e o máximo de cada ano delimitam esses bins extremos.
+    """
+
+    def __init__(self, total_years, low, high, n_bins):
+        self.edges = np.concatenate(([0.0], np.geomspace(low, high, n_bins - 1)))
+        self.n_slots = len(self.edges) + 1
+        self.counts = np.zeros((total_years, self.n_slots), dtype=np.int64)
+        self.minimum = np.full(total_years, np.inf)
+        self.maximum = np.full(total_years, -np.inf)
+
+    def update(self, values):
+        """Acrescenta um bloco (anos, trajetórias)"""
+        total_years = values.shape[0]
+        slots = np.searchsorted(self.edges, values, side="right")
+        slots += (np.arange(total_years) * self.n_slots)[:, None]
+        self.counts += np.bincount(slots.ravel(), minlength=self.counts.size).reshape(self.counts.shape)
+        np.minimum(self.minimum, values.min(axis=1), out=self.minimum)
+        np.maximum(self.maximum, values.max(axis=1), out=self.maximum)
+
+    def quantiles(self, percentages):
+        """Quantis por ano, (anos, quantis), com interpolação linear dentro do bin"""
+        total_years = self.counts.shape[0]
+        result = np.full((total_years, len(percentages)), np.nan)
+        cumulative = np.cumsum(self.counts, axis=1)
+
+        for year in range(total_years):
+            n = cumulative[year, -1]
+            if n == 0:
+                continue
+            lower_edges = np.concatenate(([self.minimum[year]], self.edges))
+            upper_edges = np.concatenate((self.edges, [self.maximum[year]]))
+            for column, percentage in enumerate(percentages):
+                position = percentage / 100 * n
+                slot = min(int(np.searchsorted(cumulative[year], position, side="left")), self.n_slots - 1)
+                before = cumulative[year, slot - 1] if slot > 0 else 0
+                inside = self.counts[year, slot]
+                lower = max(lower_edges[slot], self.minimum[year])
+                upper = min(upper_edges[slot], self.maximum[year])
+                fraction = (position - before) / inside if inside else 0.0
+                result[year, column] = lower + (upper - lower) * fraction
+
+        return result
+
+
+class StreamingSummary:
+    """
+    Estatísticas anuais de uma simulação em lote, acumuladas bloco a bloco.
+
+    Args:
+        total_years: Número de anos simulados
+        quantiles: Percentis das bandas do saldo
+        low, high: Limites dos bins geométricos do histograma (€)
+        n_bins: Número de bins por ano
+    """
+
+    def __init__(self, total_years, quantiles=DEFAULT_QUANTILES, low=1.0, high=1e10, n_bins=4096):
+        self.total_years = total_years
+        self.quantiles = tuple(quantiles)
+        self.n_paths = 0
+        self.labels = LABELS
+        self.decimals = None
+        self.growth_formatter = None
+
+        self._start_balance = _Histogram(total_years, low, high, n_bins)
+        self._end_balance = _Histogram(total_years, low, high, n_bins)
+        self._sums = {
+            column: np.zeros(total_years) for column in ("contribution", "withdrawal", "net_withdrawal", "growth")
+        }
+        self._in_withdrawal = np.zeros(total_years, dtype=np.int64)
+        self._ruined_by_year = np.zeros(total_years, dtype=np.int64)
+        self._withdrawal_start = np.zeros(total_years + 1, dtype=np.int64)
+
+    def update(self, result):
+        """
+        Acrescenta um bloco de trajetórias.
+
+        Args:
+            result: BatchResult simulado com `record=True`
+        """
+        table = result.table
+        if table is None:
+            raise ValueError("O bloco tem de ser simulado com record=True")
+        if self.n_paths == 0:
+            self.labels = table.labels
+            self.decimals = table.decimals
+            self.growth_formatter = table.growth_formatter
+
+        self.n_paths += result.n_paths
+        self._start_balance.update(table.start_balance)
+        self._end_balance.update(table.end_balance)
+        for column, total in self._sums.items():
+            total += getattr(table, column).sum(axis=1)
+        self._in_withdrawal += table.phase.sum(axis=1)
+        self._ruined_by_year += np.logical_or.accumulate(table.end_balance <= 0, axis=0).sum(axis=1)
+        self._withdrawal_start += np.bincount(result.withdrawal_start_year, minlength=self.total_years + 1)
+
+    def ruin_probability(self):
+        """Probabilidade de o saldo se esgotar até ao fim da simulação"""
+        return self._ruined_by_year[-1] / self.n_paths if self.n_paths else np.nan
+
+    def withdrawal_start_distribution(self):
+        """Fração de trajetórias por ano de início das retiradas (0 = não atingido)"""
+        return pd.Series(self._withdrawal_start / max(self.n_paths, 1), name="Início das retiradas")
+
+    def summary(self):
+        """
+        Tabela anual compacta com o mesmo layout das tabelas originais.
+
+        Os saldos são medianas, as contribuições, retiradas e crescimento são
+        médias; seguem-se as bandas do saldo final, a fração de trajetórias em
+        retirada, o início das retiradas e a ruína acumulada (em %).
+        """
+        if self.n_paths == 0:
+            raise ValueError("Nenhuma trajetória agregada")
+
+        labels = self.labels
+        start = self._start_balance.quantiles((50,))[:, 0]
+        end_bands = self._end_balance.quantiles(self.quantiles)
+        end = self._end_balance.quantiles((50,))[:, 0]
+        in_withdrawal = self._in_withdrawal / self.n_paths
+        means = {column: total / self.n_paths for column, total in self._sums.items()}
+
+        data = {
+            labels["year"]: np.arange(1, self.total_years + 1),
+            labels["phase"]: np.where(in_withdrawal > 0.5, RETIRADA, ACUMULACAO),
+            labels["start_balance"]: start,
+            labels["contribution"]: means["contribution"],
+            labels["withdrawal"]: means["withdrawal"],
+            labels["net_withdrawal"]: means["net_withdrawal"],
+            labels["growth"]: means["growth"],
+            labels["end_balance"]: end,
+        }
+        for column in (labels["start_balance"], labels["contribution"], labels["withdrawal"],
+                       labels["net_withdrawal"], labels["end_balance"]):
+            if self.decimals is not None:
+                data[column] = np.round(data[column], self.decimals)
+        if self.growth_formatter is None:
+            data[labels["growth"]] = means["growth"] * 100
+        else:
+            data[labels["growth"]] = [self.growth_formatter(value) for value in means["growth"] * 100]
+
+        for column, percentage in enumerate(self.quantiles):
+            data[f"Saldo final P{percentage} (€)"] = end_bands[:, column]
+        data["Em retirada (%)"] = in_withdrawal * 100
+        data["Início das retiradas (%)"] = self._withdrawal_start[1:] / self.n_paths * 100
+        data["Ruína (%)"] = self._ruined_by_year / self.n_paths * 100
+
+        return pd.DataFrame(data)
+
+
+def stream_simulation(n_paths, block_size=DEFAULT_BLOCK_SIZE, seed=None, summary=None, max_memory=None, **params):
+    """
+    Simula `n_paths` trajetórias do modo 1 em blocos e agrega-as sem as guardar.
+
+    Cada bloco usa um gerador criado com `SeedSequence(seed).spawn`, tal como
+    em `run_parallel`, por isso o resultado é reprodutível para a mesma semente.
+
+    Args:
+        n_paths: Número total de trajetórias
+        block_size: Trajetórias simuladas de cada vez (define o pico de memória)
+        summary: StreamingSummary a atualizar (criado se omitido)
+        max_memory: Orçamento de memória (ex: "2GB"); se indicado, o bloco é
+            o maior que cabe no orçamento (os blocos não são guardados)
+        **params: Parâmetros de `simulation_batch`
+
+    Returns:
+        StreamingSummary
+    """
+    params.setdefault("total_years", 55)
+    if summary is None:
+        summary = StreamingSummary(params["total_years"])
+    if max_memory is not None:
+        block_size = chunk_size(n_paths, max_memory, copies=0, record=True, **params)
+
+    starts = range(0, n_paths, block_size)
+    for start, seed_sequence in zip(starts, np.random.SeedSequence(seed).spawn(len(starts))):
+        block = simulation_batch(
+            n_paths=min(block_size, n_paths - start),
+            rng=np.random.default_rng(seed_sequence),
+            record=True,
+            **params
+        )
+        summary.update(block)
+
+    return summary
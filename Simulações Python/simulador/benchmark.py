@@ -0,0 +1,524 @@
+"""
+Benchmarks dos motores, com histórico em JSON.
+
+Para cada cenário (os modos de `simulation()` e os parâmetros de
+Simulacao10_* e SimulacaoSP500_*), motor e combinação de trajetórias ×
+anos mede:
+
+- a latência de `simulation_batch` (mínimo e mediana de várias repetições);
+- o débito, em trajetórias × anos por segundo;
+- o pico de memória alocada (`tracemalloc`, numa execução à parte).
+
+Mede da mesma forma as funções dos próprios scripts (`ENTRY_POINTS`:
+`monte_carlo_simulation_modified` e `monte_carlo_simulation_batch` de
+Simulacao10_*, `monte_carlo_simulation_modified` de SimulacaoSP500_* e
+`simulation()` de Simulacao_Interativa_3), chamadas diretamente, para
+apanhar também o custo da tabela e do DataFrame de cada uma.
+
+Mede também o tempo de importação do pacote e de arranque do interpretador
+(num processo novo) e verifica a equivalência numérica dos motores com os
+ciclos de referência (`simulador.referencia`) sobre os mesmos retornos, a
+da formatação vetorizada (`format_pt`) com `format_number_pt` e a da
+primeira coorte do backtest (`simulador.coortes`) com os modos 2 e 3.
+
+Cada execução é acrescentada a um ficheiro JSON (`{"runs": [...]}`) com o
+commit, as versões e a máquina, e comparada com a anterior:
+
+    python -m simulador.benchmark --history benchmarks.json
+    python -m simulador.benchmark --quick --max-regression 0.2
+
+Código de saída: 0 = tudo bem, 1 = regressão de débito acima do limite,
+2 = motor, formatação ou coortes diferentes da referência.
+"""
+import argparse
+import datetime
+import importlib.util
+import inspect
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from simulador import historico
+from simulador.compilado import NUMBA_AVAILABLE
+from simulador.coortes import backtest_annual_cohorts, backtest_monthly_cohorts
+from simulador.formatacao import format_number_pt, format_pt
+from simulador.modos import simulation_batch
+from simulador.referencia import reference_monte_carlo, reference_simulation
+from simulador.registo import write_atomic
+
+DEFAULT_HISTORY = "benchmarks.json"
+DEFAULT_PATHS = (1_000, 10_000, 100_000)
+DEFAULT_YEARS = (10, 30, 55)
+QUICK_PATHS = (1_000, 10_000)
+QUICK_YEARS = (30,)
+
+# Diferença relativa máxima aceite face aos ciclos de referência
+EQUIVALENCE_RTOL = 1e-9
+
+# Parâmetros de cada script (desvio > 0 em Simulacao10_* para exercitar o
+# limite de anos negativos)
+_MONTE_CARLO = dict(
+    initial_portfolio=2500, mean_return=0.12, std_return=0.18, target_portfolio=400000, min_threshold=100000,
+    upper_threshold=550000, withdrawal_base=30000, negative_years_cap=12, threshold_before_contribution=True,
+)
+SCENARIOS = {
+    "simulation_mode1": dict(mode=1),
+    "simulation_mode1_growth": dict(mode=1, withdrawal_growth_rate=0.02),
+    "simulation_mode2": dict(mode=2),
+    "simulation_mode3": dict(mode=3),
+    "simulation_mode3_growth": dict(mode=3, withdrawal_growth_rate=0.02),
+    "simulation_mode3_consistent": dict(mode=3, withdrawal_growth_rate=0.02, monthly_rules="consistent"),
+    "simulation_mode4": dict(mode=4),
+    "simulation_mode5": dict(mode=5),
+    "simulation_mode6": dict(mode=6),
+    "simulacao10_1": dict(
+        _MONTE_CARLO, contribution_step_up_amount=-50, min_monthly_contribution=200,
+    ),
+    "simulacao10_2": dict(_MONTE_CARLO, contribution_step_up_amount=100),
+    "simulacaosp500_1": dict(
+        mode=2, initial_portfolio=20000, initial_monthly_contribution=400, target_portfolio=500000,
+        min_threshold=200000, upper_threshold=1000000, withdrawal_base=15000, contribution_step_up_amount=-50,
+        min_monthly_contribution=200, threshold_before_contribution=True,
+    ),
+    "simulacaosp500_2": dict(
+        mode=2, initial_portfolio=20000, target_portfolio=500000, min_threshold=400000, upper_threshold=800000,
+        withdrawal_base=60000, max_monthly_contribution=400, threshold_before_contribution=True,
+    ),
+}
+
+# Funções dos scripts: nome -> (script, função, argumentos, recebe n_paths)
+ENTRY_POINTS = {
+    "Simulacao10_1.monte_carlo_simulation_modified": ("Simulacao10_1", "monte_carlo_simulation_modified", {}, False),
+    "Simulacao10_1.monte_carlo_simulation_batch": ("Simulacao10_1", "monte_carlo_simulation_batch", {}, True),
+    "Simulacao10_2.monte_carlo_simulation_modified": ("Simulacao10_2", "monte_carlo_simulation_modified", {}, False),
+    "Simulacao10_2.monte_carlo_simulation_batch": ("Simulacao10_2", "monte_carlo_simulation_batch", {}, True),
+    "SimulacaoSP500_1.monte_carlo_simulation_modified": (
+        "SimulacaoSP500_1", "monte_carlo_simulation_modified", {}, False,
+    ),
+    "SimulacaoSP500_2.monte_carlo_simulation_modified": (
+        "SimulacaoSP500_2", "monte_carlo_simulation_modified", {}, False,
+    ),
+    **{
+        f"Simulacao_Interativa_3.simulation(mode={mode})": ("Simulacao_Interativa_3", "simulation", {"mode": mode}, False)
+        for mode in (1, 2, 3, 4, 5)
+    },
+}
+
+# Pasta dos scripts (acima do pacote)
+_SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Motores com núcleo alternativo (só os modos anuais)
+_ANNUAL_MODES = (1, 2, 4)
+
+_BATCH_DEFAULTS = {
+    name: parameter.default for name, parameter in inspect.signature(simulation_batch).parameters.items()
+}
+
+
+def available_engines():
+    """Motores disponíveis nesta instalação"""
+    return ("numpy", "numba") if NUMBA_AVAILABLE else ("numpy",)
+
+
+def _engines_for(params, engines):
+    return [engine for engine in engines if engine == "numpy" or params.get("mode", 1) in _ANNUAL_MODES]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure_startup(repeat=3):
+    """
+    Tempo de arranque num processo novo.
+
+    Returns:
+        Dicionário com `import_seconds` (só `import simulador`) e
+        `process_seconds` (interpretador + importação), o mínimo de `repeat`
+    """
+    code = "import time; start = time.perf_counter(); import simulador; print(time.perf_counter() - start)"
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    imports, processes = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", code], cwd=package_dir, capture_output=True, text=True, check=True
+        ).stdout
+        processes.append(time.perf_counter() - start)
+        imports.append(float(output))
+    return {"import_seconds": min(imports), "process_seconds": min(processes)}
+
+
+def _measure(run, n_paths, total_years, repeat):
+    """Latência, débito e pico de memória de `run()`"""
+    run()  # aquecimento (importações, compilação Numba, páginas do registo)
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latency = min(timings)
+    return {
+        "n_paths": n_paths,
+        "total_years": total_years,
+        "latency_seconds": latency,
+        "latency_median_seconds": statistics.median(timings),
+        "path_years_per_second": n_paths * total_years / latency,
+        "peak_memory_mb": peak / 2**20,
+    }
+
+
+def measure_case(params, n_paths, total_years, engine="numpy", repeat=3, seed=0):
+    """
+    Latência, débito e pico de memória de um cenário.
+
+    Returns:
+        Dicionário com as medições
+    """
+    run = lambda: simulation_batch(n_paths=n_paths, total_years=total_years, seed=seed, engine=engine, **params)
+    return _measure(run, n_paths, total_years, repeat)
+
+
+def available_entry_points():
+    """Nomes de `ENTRY_POINTS` cujos scripts existem nesta instalação"""
+    return [
+        name for name, (script, _, _, _) in ENTRY_POINTS.items()
+        if os.path.exists(os.path.join(_SCRIPTS_DIR, f"{script}.py"))
+    ]
+
+
+def load_entry_point(name):
+    """Função de um script de `ENTRY_POINTS`, importada do ficheiro (sem correr o `__main__`)"""
+    script, function, _, _ = ENTRY_POINTS[name]
+    module = sys.modules.get(f"_benchmark_{script}")
+    if module is None:
+        spec = importlib.util.spec_from_file_location(f"_benchmark_{script}", os.path.join(_SCRIPTS_DIR, f"{script}.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules[spec.name] = module
+    return getattr(module, function)
+
+
+def measure_entry_point(name, n_paths, total_years, engine="numpy", repeat=3, seed=0):
+    """
+    Latência, débito e pico de memória de uma função de um script.
+
+    As funções de uma trajetória (`n_paths` ignorado) são medidas com
+    `n_paths=1`.
+
+    Returns:
+        Dicionário com as medições
+    """
+    function = load_entry_point(name)
+    _, _, arguments, batched = ENTRY_POINTS[name]
+    arguments = dict(arguments, total_years=total_years, engine=engine)
+    if batched:
+        arguments["n_paths"] = n_paths
+    else:
+        n_paths = 1
+    if "seed" in inspect.signature(function).parameters:
+        arguments["seed"] = seed
+    return _measure(lambda: function(**arguments), n_paths, total_years, repeat)
+
+
+def _reference_returns(params, n_paths, total_years, rng):
+    """Retornos (períodos, trajetórias) partilhados pelo motor e pela referência"""
+    mode = params.get("mode", 1)
+    if mode == 1:
+        return rng.normal(params.get("mean_return", 0.07), params.get("std_return", 0.15), (total_years, n_paths))
+    if mode == 2:
+        annual = historico.annual_returns()
+        return np.repeat(annual[np.arange(total_years) % len(annual)][:, None], n_paths, axis=1)
+    monthly = historico.mode3_monthly_returns(total_years * 12)
+    return np.repeat(monthly[:, None], n_paths, axis=1)
+
+
+def check_equivalence(params, n_paths=256, total_years=55, engine="numpy", seed=0):
+    """
+    Compara o motor com o ciclo de referência, trajetória a trajetória.
+
+    Returns:
+        Dicionário com a maior diferença relativa (saldos e retiradas),
+        o número de anos de início diferentes e `ok`
+    """
+    mode = params.get("mode", 1)
+    returns = _reference_returns(params, n_paths, total_years, np.random.default_rng(seed))
+    result = simulation_batch(
+        n_paths=n_paths, total_years=total_years, returns=returns, record=True, engine=engine, **params
+    )
+
+    # A referência recebe os mesmos parâmetros efetivos (padrões de simulation_batch)
+    reference = reference_monte_carlo if params.get("threshold_before_contribution") else reference_simulation
+    effective = {**_BATCH_DEFAULTS, **params}
+    reference_params = {
+        name: effective[name] for name in inspect.signature(reference).parameters
+        if name in effective and name not in ("returns", "total_years")
+    }
+
+    error, mismatches = 0.0, 0
+    for path in range(n_paths):
+        expected = reference(returns[:, path], total_years=total_years, **reference_params)
+        for field in ("final_balance", "total_withdrawn"):
+            value = float(getattr(result, field)[path])
+            error = max(error, abs(value - expected[field]) / max(1.0, abs(expected[field])))
+        ends = result.table.end_balance[:, path]
+        error = max(error, float(np.max(np.abs(ends - expected["end_balance"]) / np.maximum(1.0, np.abs(ends)))))
+        mismatches += int(result.withdrawal_start_year[path]) != expected["withdrawal_start_year"]
+
+    return {
+        "mode": mode,
+        "n_paths": n_paths,
+        "total_years": total_years,
+        "max_relative_error": error,
+        "start_year_mismatches": mismatches,
+        "ok": error <= EQUIVALENCE_RTOL and mismatches == 0,
+    }
+
+
+def check_formatting(n_values=4096, seed=0):
+    """
+    Compara `format_pt` com `format_number_pt`, valor a valor.
+
+    Os valores misturam magnitudes de 1e-3 a 1e18, empates de
+    arredondamento, zeros com sinal, NaN e ±inf em posições aleatórias
+    (incluindo a primeira e a última).
+
+    Returns:
+        Dicionário com o número de valores comparados, de diferenças e `ok`
+    """
+    rng = np.random.default_rng(seed)
+    values = rng.choice([-1.0, 1.0], n_values) * 10.0 ** rng.uniform(-3, 18, n_values)
+    values[: n_values // 8] = np.round(values[: n_values // 8], 1) + 0.005  # empates
+    special = np.array([np.nan, np.inf, -np.inf, 0.0, -0.0, 2.0**53, -(2.0**63)])
+    values[rng.choice(n_values, 64, replace=False)] = rng.choice(special, 64)
+    values = np.concatenate(([np.nan, -np.inf], rng.permutation(values), [np.inf, np.nan]))
+
+    compared = mismatches = 0
+    for decimals in range(4):
+        for suffix in ("", " %"):
+            text = format_pt(values, decimals, suffix)
+            expected = [format_number_pt(float(value), decimals) + suffix for value in values]
+            mismatches += sum(actual != wanted for actual, wanted in zip(text.tolist(), expected))
+            compared += len(values)
+    return {"n_values": compared, "mismatches": mismatches, "ok": mismatches == 0}
+
+
+def check_cohorts(horizons=(30, 55)):
+    """
+    Compara a primeira coorte de cada backtest com `simulation_batch` com
+    os mesmos parâmetros (padrões de `simulation()`): a anual com o modo 2
+    e a mensal com o modo 3 (só até ao fim da série mensal, depois o modo 3
+    usa a aproximação anual).
+
+    Returns:
+        Dicionário com a maior diferença relativa (saldo final e total
+        retirado), o número de anos de início diferentes e `ok`
+    """
+    monthly_years = len(historico.monthly_returns()) // 12
+    cases = [(backtest_annual_cohorts, 2, total_years) for total_years in horizons]
+    cases += [(backtest_monthly_cohorts, 3, min(total_years, monthly_years)) for total_years in horizons]
+
+    error, mismatches = 0.0, 0
+    for backtest, mode, total_years in cases:
+        table, _ = backtest(total_years=total_years)
+        result = simulation_batch(n_paths=1, mode=mode, total_years=total_years)
+        first = table.iloc[0]
+        for column, value in (("Saldo final (€)", result.final_balance[0]),
+                              ("Total retirado (líquido) (€)", result.total_withdrawn[0])):
+            error = max(error, abs(float(first[column]) - float(value)) / max(1.0, abs(float(value))))
+        start_year = first["Ano de início das retiradas"]
+        mismatches += (0 if start_year is pd.NA else int(start_year)) != int(result.withdrawal_start_year[0])
+    return {
+        "cases": len(cases),
+        "max_relative_error": error,
+        "start_year_mismatches": mismatches,
+        "ok": error <= EQUIVALENCE_RTOL and mismatches == 0,
+    }
+
+
+def run_benchmarks(
+    paths=DEFAULT_PATHS,
+    horizons=DEFAULT_YEARS,
+    scenarios=None,
+    entry_points=None,
+    engines=None,
+    repeat=3,
+    equivalence_paths=256,
+    log=None,
+):
+    """
+    Corre o conjunto de benchmarks.
+
+    Args:
+        paths: Números de trajetórias a medir
+        horizons: Números de anos a medir
+        scenarios: Nomes de `SCENARIOS` (None = todos)
+        entry_points: Nomes de `ENTRY_POINTS` (None = todos os disponíveis)
+        engines: Motores a medir (None = os disponíveis)
+        repeat: Repetições de cada medição de latência
+        equivalence_paths: Trajetórias comparadas com a referência
+        log: Função chamada com uma linha de texto por medição
+
+    Returns:
+        Registo da execução (dicionário serializável em JSON)
+    """
+    scenarios = scenarios or list(SCENARIOS)
+    entry_points = available_entry_points() if entry_points is None else entry_points
+    engines = engines or available_engines()
+    log = log or (lambda line: None)
+
+    record = {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "startup": measure_startup(),
+        "cases": [],
+        "equivalence": [],
+        "formatting": check_formatting(),
+        "cohorts": check_cohorts(),
+    }
+    log(f"arranque: {record['startup']['process_seconds']:.3f} s "
+        f"(import simulador {record['startup']['import_seconds']:.3f} s)")
+    log(f"formatação: {record['formatting']['mismatches']} diferenças em {record['formatting']['n_values']} valores"
+        f"{'' if record['formatting']['ok'] else '  FALHOU'}")
+    log(f"coortes: erro relativo máximo {record['cohorts']['max_relative_error']:.1e} "
+        f"em {record['cohorts']['cases']} casos{'' if record['cohorts']['ok'] else '  FALHOU'}")
+
+    for name in scenarios:
+        params = SCENARIOS[name]
+        for engine in _engines_for(params, engines):
+            for total_years in horizons:
+                for n_paths in paths:
+                    case = measure_case(params, n_paths, total_years, engine=engine, repeat=repeat)
+                    record["cases"].append({"scenario": name, "engine": engine, **case})
+                    log(f"{name:18} {engine:6} {n_paths:>8} × {total_years:>2}: "
+                        f"{case['latency_seconds'] * 1e3:9.1f} ms  "
+                        f"{case['path_years_per_second'] / 1e6:7.2f} M traj×ano/s  "
+                        f"{case['peak_memory_mb']:8.1f} MiB")
+            if params.get("mode", 1) in (1, 2, 3) and equivalence_paths:
+                check = check_equivalence(params, n_paths=equivalence_paths, engine=engine)
+                record["equivalence"].append({"scenario": name, "engine": engine, **check})
+                log(f"{name:18} {engine:6} referência: erro relativo máximo {check['max_relative_error']:.1e}"
+                    f"{'' if check['ok'] else '  FALHOU'}")
+
+    for name in entry_points:
+        _, _, arguments, batched = ENTRY_POINTS[name]
+        for engine, total_years in itertools.product(_engines_for(arguments, engines), horizons):
+            for n_paths in paths if batched else (1,):
+                case = measure_entry_point(name, n_paths, total_years, engine=engine, repeat=repeat)
+                record["cases"].append({"scenario": name, "engine": engine, **case})
+                log(f"{name} {engine:6} {n_paths:>8} × {total_years:>2}: "
+                    f"{case['latency_seconds'] * 1e3:9.1f} ms  "
+                    f"{case['path_years_per_second'] / 1e6:7.2f} M traj×ano/s  "
+                    f"{case['peak_memory_mb']:8.1f} MiB")
+    return record
+
+
+def load_history(path):
+    """Execuções anteriores guardadas em `path` (lista vazia se não existir)"""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)["runs"]
+
+
+def append_history(record, path):
+    """Acrescenta uma execução ao ficheiro de histórico (escrita atómica)"""
+    runs = load_history(path) + [record]
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    write_atomic(
+        os.path.abspath(path),
+        lambda file: file.write((json.dumps({"runs": runs}, indent=2) + "\n").encode("utf-8")),
+    )
+
+
+def compare_runs(previous, current):
+    """
+    Variação do débito entre duas execuções, nos casos comuns.
+
+    Returns:
+        Lista de (cenário, motor, trajetórias, anos, razão atual/anterior)
+    """
+    key = lambda case: (case["scenario"], case["engine"], case["n_paths"], case["total_years"])
+    before = {key(case): case["path_years_per_second"] for case in previous["cases"]}
+    return [
+        (*key(case), case["path_years_per_second"] / before[key(case)])
+        for case in current["cases"] if key(case) in before
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m simulador.benchmark", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="ficheiro JSON do histórico")
+    parser.add_argument("--quick", action="store_true", help="menos trajetórias e horizontes")
+    parser.add_argument("--paths", type=int, nargs="+", help="números de trajetórias")
+    parser.add_argument("--years", type=int, nargs="+", help="horizontes (anos)")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), help="cenários a medir")
+    parser.add_argument("--entry-points", nargs="*", choices=list(ENTRY_POINTS),
+                        help="funções dos scripts a medir (sem nomes: nenhuma)")
+    parser.add_argument("--engines", nargs="+", choices=("numpy", "numba"), help="motores a medir")
+    parser.add_argument("--repeat", type=int, default=3, help="repetições por medição")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="queda máxima de débito face à execução anterior (0.2 = 20%%)")
+    parser.add_argument("--no-save", action="store_true", help="não acrescentar ao histórico")
+    args = parser.parse_args(argv)
+
+    record = run_benchmarks(
+        paths=args.paths or (QUICK_PATHS if args.quick else DEFAULT_PATHS),
+        horizons=args.years or (QUICK_YEARS if args.quick else DEFAULT_YEARS),
+        scenarios=args.scenarios,
+        entry_points=args.entry_points,
+        engines=args.engines,
+        repeat=args.repeat,
+        log=print,
+    )
+
+    history = load_history(args.history)
+    status = 0
+    if history:
+        changes = compare_runs(history[-1], record)
+        print(f"\nFace à execução anterior ({history[-1]['commit']}, {history[-1]['timestamp']}):")
+        for scenario, engine, n_paths, total_years, ratio in changes:
+            regression = args.max_regression is not None and ratio < 1 - args.max_regression
+            status = 1 if regression else status
+            print(f"  {scenario:18} {engine:6} {n_paths:>8} × {total_years:>2}: {(ratio - 1) * 100:+6.1f} %"
+                  f"{'  REGRESSÃO' if regression else ''}")
+    checks = [*record["equivalence"], record["formatting"], record["cohorts"]]
+    if not all(check["ok"] for check in checks):
+        status = 2
+    if not args.no_save:
+        append_history(record, args.history)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
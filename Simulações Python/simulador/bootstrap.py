@@ -0,0 +1,86 @@
+"""
+Retornos por bootstrap em blocos a partir das séries históricas.
+
+Em vez de sortear ano a ano, os índices de todas as trajetórias são
+construídos de uma vez, com forma (períodos, trajetórias), e os retornos
+recolhidos com uma única indexação (`series[indices]`). Os blocos contíguos
+preservam a autocorrelação e as caudas da série original.
+
+Variantes:
+- blocos móveis (`circular=False`): cada bloco cabe inteiro na série;
+- blocos circulares (`circular=True`): os blocos podem dar a volta à série;
+- bootstrap estacionário (`stationary=True`): blocos de comprimento
+  geométrico com média `block_length` (sempre circular).
+"""
+import numpy as np
+
+from simulador import historico
+
+
+def block_bootstrap_indices(n_obs, length, n_paths, block_length, rng, circular=True, stationary=False):
+    """
+    Índices do bootstrap em blocos.
+
+    Args:
+        n_obs: Número de observações da série
+        length: Períodos a gerar por trajetória
+        n_paths: Número de trajetórias
+        block_length: Comprimento (médio, no estacionário) dos blocos
+        rng: Gerador NumPy
+        circular: Permitir blocos que dão a volta ao fim da série
+        stationary: Usar o bootstrap estacionário de Politis-Romano
+
+    Returns:
+        Array (períodos, trajetórias) de índices
+    """
+    if block_length < 1:
+        raise ValueError("block_length tem de ser pelo menos 1")
+
+    if stationary:
+        periods = np.arange(length)[:, None]
+        new_block = rng.random((length, n_paths)) < 1 / block_length
+        new_block[0] = True
+        block_start = np.maximum.accumulate(np.where(new_block, periods, 0), axis=0)
+        starts = rng.integers(0, n_obs, size=(length, n_paths))
+        first = np.take_along_axis(starts, block_start, axis=0)
+        return (first + periods - block_start) % n_obs
+
+    if not circular and block_length > n_obs:
+        raise ValueError("block_length maior do que a série")
+
+    n_blocks = -(-length // block_length)
+    high = n_obs if circular else n_obs - block_length + 1
+    starts = rng.integers(0, high, size=(n_blocks, n_paths))
+    indices = starts[:, None, :] + np.arange(block_length)[None, :, None]
+    indices = indices.reshape(n_blocks * block_length, n_paths)[:length]
+    return indices % n_obs if circular else indices
+
+
+def bootstrap_returns(
+    series, length, n_paths, block_length=5, rng=None, seed=None, circular=True, stationary=False, dtype=np.float64
+):
+    """
+    Retornos reamostrados em blocos, (períodos, trajetórias).
+
+    Args:
+        series: Série histórica de retornos (frações)
+        rng: Gerador NumPy; se omitido é criado a partir de `seed`
+        dtype: Tipo dos retornos devolvidos
+    """
+    if rng is None:
+        rng = np.random.default_rng(seed)
+    series = np.asarray(series, dtype=dtype)
+    indices = block_bootstrap_indices(
+        len(series), length, n_paths, block_length, rng, circular=circular, stationary=stationary
+    )
+    return series[indices]
+
+
+def annual_bootstrap_returns(total_years, n_paths, block_length=5, **kwargs):
+    """Bootstrap dos retornos anuais do S&P500, (anos, trajetórias)"""
+    return bootstrap_returns(historico.annual_returns(), total_years, n_paths, block_length, **kwargs)
+
+
+def monthly_bootstrap_returns(total_years, n_paths, block_length=12, **kwargs):
+    """Bootstrap dos retornos mensais do S&P500, (meses, trajetórias)"""
+    return bootstrap_returns(historico.monthly_returns(), total_years * 12, n_paths, block_length, **kwargs)
@@ -0,0 +1,260 @@
+"""
+Cache de resultados endereçada pelo conteúdo dos parâmetros.
+
+As simulações históricas (modos 2 e 3) são determinísticas e as restantes
+são reprodutíveis para a mesma semente, por isso o resultado de
+`simulation_batch` fica identificado pelos parâmetros normalizados, pela
+semente, pela versão do motor e pelas versões das séries históricas no
+registo (`simulador.registo`). A chave é o SHA-256 dessa descrição
+canónica.
+
+A normalização remove o que não tem efeito no resultado (por exemplo
+`upper_threshold` e `withdrawal_base` com a estratégia 2, a média e o
+desvio padrão fora do modo 1, ou a semente nos modos históricos), para que
+cenários equivalentes partilhem a mesma entrada.
+
+Há dois níveis: um LRU em memória e, opcionalmente, um diretório de
+ficheiros `.npz` comprimidos com remoção dos menos usados quando o
+tamanho total passa do limite.
+"""
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+
+from simulador.modos import DAILY_MODES, MONTHLY_MODES, simulation_batch
+from simulador.registo import series_info
+from simulador.resultados import COLUMNS, YearlyResults
+from simulador.diario import DailyBatchResult
+from simulador.vetorizado import BatchResult
+
+# Incrementar sempre que uma alteração ao motor mude os resultados
+ENGINE_VERSION = 3
+
+DEFAULTS = {
+    name: parameter.default
+    for name, parameter in inspect.signature(simulation_batch).parameters.items()
+    if name not in ("rng", "engine", "returns", "instrumentation")
+}
+
+# Séries do registo usadas por cada modo histórico
+_SERIES_FREQUENCIES = {2: ("annual",), 3: ("annual", "monthly"), 4: ("annual",), 5: ("monthly",), 7: ("daily",)}
+
+_RESULT_FIELDS = ("final_balance", "withdrawal_start_year", "total_withdrawn", "total_contributions", "ruined", "ruin_year")
+
+
+def normalize_params(**params):
+    """
+    Parâmetros de `simulation_batch` completos e sem os que não têm efeito.
+
+    Returns:
+        Dicionário canónico (números como float, parâmetros irrelevantes
+        removidos)
+    """
+    unknown = set(params) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Parâmetros desconhecidos: {', '.join(sorted(unknown))}")
+    params = {**DEFAULTS, **params}
+    mode = params["mode"]
+
+    if params["withdrawal_strategy"] != 1:
+        for name in ("upper_threshold", "withdrawal_base", "withdrawal_growth_rate"):
+            del params[name]
+    if mode in (1, 6):
+        del params["series"]
+    else:
+        del params["mean_return"], params["std_return"]
+    if params["sampling"] == "random":
+        del params["sampling"]  # amostragem padrão: as chaves anteriores continuam válidas
+    if mode in (2, 3):
+        params["seed"] = None  # histórico: não há sorteios
+    if mode in (4, 5, 7):
+        params["block_length"] = params["block_length"] or {4: 5, 5: 12, 7: 21}[mode]
+    else:
+        del params["block_length"]
+    if mode in (4, 5):
+        if params["bootstrap_stationary"]:
+            del params["bootstrap_circular"]  # o estacionário é sempre circular
+    else:
+        del params["bootstrap_circular"], params["bootstrap_stationary"]
+    if mode in MONTHLY_MODES + DAILY_MODES:
+        # 12 meses + junho e dezembro; regras exclusivas do motor anual
+        del params["contribution_multiplier"], params["negative_years_cap"], params["threshold_before_contribution"]
+    if mode not in MONTHLY_MODES:
+        del params["monthly_rules"]
+    if mode in DAILY_MODES:
+        if params["withdrawal_months"] is not None:
+            params["withdrawal_months"] = sorted(params["withdrawal_months"])
+    else:
+        del params["withdrawal_months"], params["drawdown_limit"], params["chunk_days"]
+
+    params["dtype"] = np.dtype(params["dtype"]).name
+
+    for name, value in params.items():
+        if isinstance(value, (int, float, np.number)) and not isinstance(value, (bool, np.bool_)):
+            params[name] = float(value)
+    return params
+
+
+def cache_key(**params):
+    """Chave SHA-256 de um cenário (parâmetros normalizados, versões do motor e dos dados)"""
+    params = normalize_params(**params)
+    series = {}
+    if "series" in params:
+        names = [f"{params['series']}_{frequency}" for frequency in _SERIES_FREQUENCIES[params["mode"]]]
+        series = {name: series_info(name).version for name in names}
+    canonical = json.dumps(
+        {"engine_version": ENGINE_VERSION, "series": series, "params": params},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _freeze(result):
+    """Torna os arrays do resultado só de leitura (é partilhado entre chamadas)"""
+    arrays = [getattr(result, field) for field in _RESULT_FIELDS]
+    if isinstance(result, DailyBatchResult):
+        arrays.append(result.max_drawdown)
+    if result.table is not None:
+        arrays += [result.table.phase] + [getattr(result.table, column) for column in COLUMNS]
+    for array in arrays:
+        array.setflags(write=False)
+    return result
+
+
+class ResultCache:
+    """
+    Cache de resultados de `simulation_batch`.
+
+    Args:
+        maxsize: Número de resultados guardados em memória
+        directory: Diretório dos ficheiros `.npz` (None = só memória)
+        max_bytes: Tamanho máximo do diretório; os ficheiros usados há mais
+            tempo são apagados primeiro
+    """
+
+    def __init__(self, maxsize=128, directory=None, max_bytes=512 * 2**20):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def simulation_batch(self, **params):
+        """
+        `simulation_batch` com cache. Sem semente (modos aleatórios), com um
+        `rng` próprio ou com retornos explícitos o resultado não é guardado.
+
+        Returns:
+            BatchResult (arrays só de leitura quando vem da cache)
+        """
+        if "rng" in params or "returns" in params or (params.get("seed") is None and params.get("mode", 1) not in (2, 3)):
+            return simulation_batch(**params)
+
+        engine = params.pop("engine", "numpy")
+        instrumentation = params.pop("instrumentation", None)
+        key = cache_key(**params)
+        result = self.get(key)
+        if result is None:
+            self.misses += 1
+            result = _freeze(simulation_batch(engine=engine, instrumentation=instrumentation, **params))
+            self.put(key, result)
+        else:
+            self.hits += 1
+        return result
+
+    def get(self, key):
+        """Resultado guardado para `key`, ou None"""
+        result = self._memory.get(key)
+        if result is not None:
+            self._memory.move_to_end(key)
+            return result
+
+        path = self._path(key)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            result = _freeze(self._load(path))
+        except (OSError, ValueError, KeyError):
+            return None
+        os.utime(path)
+        self._remember(key, result)
+        return result
+
+    def put(self, key, result):
+        """Guarda um resultado em memória e, se configurado, no disco"""
+        self._remember(key, result)
+        path = self._path(key)
+        if path is not None:
+            self._save(path, result)
+            self._evict()
+
+    def clear(self):
+        """Esvazia a memória e apaga os ficheiros da cache"""
+        self._memory.clear()
+        if self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith(".npz"):
+                    os.remove(os.path.join(self.directory, name))
+
+    def _remember(self, key, result):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _path(self, key):
+        return None if self.directory is None else os.path.join(self.directory, f"{key}.npz")
+
+    def _save(self, path, result):
+        arrays = {field: getattr(result, field) for field in _RESULT_FIELDS}
+        if isinstance(result, DailyBatchResult):
+            arrays["max_drawdown"] = result.max_drawdown
+        if result.table is not None:
+            arrays["phase"] = result.table.phase
+            arrays.update({column: getattr(result.table, column) for column in COLUMNS})
+
+        # Escreve num ficheiro temporário e troca de nome (atómico)
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as file:
+                np.savez_compressed(file, **arrays)
+            os.replace(temporary, path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+    def _load(self, path):
+        with np.load(path) as data:
+            fields = {field: data[field] for field in _RESULT_FIELDS}
+            table = None
+            if "end_balance" in data:
+                total_years, n_paths = data["end_balance"].shape
+                table = YearlyResults(total_years, n_paths)
+                table.phase = data["phase"]
+                for column in COLUMNS:
+                    setattr(table, column, data[column])
+            if "max_drawdown" in data:
+                return DailyBatchResult(**fields, table=table, max_drawdown=data["max_drawdown"])
+        return BatchResult(**fields, table=table)
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
@@ -0,0 +1,364 @@
+"""
+Linha de comandos sem interação para a simulação de Simulacao_Interativa_3.py.
+
+Os parâmetros do questionário passam a opções (`--total-years 40`) ou a um
+ficheiro de configuração JSON ou TOML com os mesmos nomes (`total_years =
+40`); as opções da linha de comandos sobrepõem-se ao ficheiro. As taxas são
+indicadas em percentagem, como no questionário (`--mean-return 7` = 7%).
+
+    python Simulacao_Interativa_3.py --config cenario.toml --output tabela.csv
+    python -m simulador.comandos --mode 4 --paths 100000 --workers 4 --seed 1 --output resumo.json
+
+Com `--paths 1` (omissão) mostra ou grava a tabela anual de uma trajetória,
+como o questionário; com mais trajetórias corre `run_parallel` e mostra o
+resumo (probabilidades e percentis). `--output` aceita `.csv` (tabela anual
+ou uma linha por trajetória) e `.json` (parâmetros, resumo e tabela); `-`
+escreve CSV para a saída padrão.
+
+Códigos de saída: 0 = sucesso, 1 = erro durante a simulação ou a escrita,
+2 = opções ou configuração inválidas.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+
+import numpy as np
+
+from simulador.formatacao import format_number_pt, render_table
+from simulador.instrumentacao import profiled
+from simulador.memoria import parse_memory
+from simulador.modos import DAILY_MODES, single_path
+from simulador.paralelo import run_parallel
+from simulador.registo import write_atomic
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+EXIT_OK = 0
+EXIT_FAILURE = 1
+EXIT_USAGE = 2
+
+# (nome, tipo, em percentagem, ajuda); o nome é também a chave do ficheiro
+# de configuração e, com "-" em vez de "_", a opção da linha de comandos
+PARAMETERS = (
+    ("mode", int, False, "1 = retornos aleatórios, 2 = histórico anual, 3 = histórico mensal, "
+                         "4/5 = bootstrap anual/mensal, 6/7 = diário"),
+    ("withdrawal_strategy", int, False, "1 = valor fixo, 2 = 4%% anual líquido"),
+    ("total_years", int, False, "anos a simular"),
+    ("initial_portfolio", float, False, "capital inicial (€)"),
+    ("initial_monthly_contribution", float, False, "contribuição mensal inicial (€)"),
+    ("contribution_multiplier", float, False, "contribuições por ano (14 = 14 meses)"),
+    ("contribution_growth_rate", float, True, "crescimento anual das contribuições (%%)"),
+    ("target_portfolio", float, False, "target para começar a retirar (€)"),
+    ("min_threshold", float, False, "limite mínimo para poder retirar (€)"),
+    ("upper_threshold", float, False, "valor para dobrar as retiradas (€)"),
+    ("withdrawal_base", float, False, "valor líquido anual inicial a retirar (€)"),
+    ("withdrawal_growth_rate", float, True, "crescimento anual das retiradas (%%)"),
+    ("tax_rate_withdrawal", float, True, "imposto sobre mais-valias (%%)"),
+    ("contribution_step_up_interval", int, False, "intervalo entre aumentos da contribuição (anos)"),
+    ("contribution_step_up_amount", float, False, "aumento da contribuição mensal (€)"),
+    ("min_monthly_contribution", float, False, "limite mínimo da contribuição mensal (€)"),
+    ("max_monthly_contribution", float, False, "limite máximo da contribuição mensal (€)"),
+    ("mean_return", float, True, "retorno médio anual (%%, modos 1 e 6)"),
+    ("std_return", float, True, "desvio padrão do retorno anual (%%, modos 1 e 6)"),
+    ("management_fee", float, True, "taxa de gestão anual (%%)"),
+    ("block_length", int, False, "comprimento dos blocos do bootstrap (modos 4, 5 e 7)"),
+    ("continue_contributions_during_withdrawal", bool, False, "continuar a contribuir durante as retiradas"),
+    ("bootstrap_stationary", bool, False, "blocos de comprimento aleatório no bootstrap"),
+)
+
+# Opções de execução que também podem vir do ficheiro de configuração
+RUN_OPTIONS = ("paths", "workers", "seed", "output", "max_memory")
+
+
+class ConfigError(ValueError):
+    """Configuração ou opções inválidas (código de saída 2)"""
+
+
+def load_config(path):
+    """
+    Lê um ficheiro de configuração JSON ou TOML (pela extensão).
+
+    Returns:
+        Dicionário com os parâmetros (nomes de `PARAMETERS`) e as opções de
+        execução (`RUN_OPTIONS`)
+    """
+    try:
+        if path.lower().endswith(".toml"):
+            if tomllib is None:
+                raise ConfigError("Ficheiros TOML precisam de Python 3.11 ou superior (tomllib)")
+            with open(path, "rb") as file:
+                config = tomllib.load(file)
+        else:
+            with open(path, encoding="utf-8") as file:
+                config = json.load(file)
+    except OSError as error:
+        raise ConfigError(f"Não foi possível ler {path}: {error.strerror}") from error
+    except (ValueError, getattr(tomllib, "TOMLDecodeError", ValueError)) as error:
+        raise ConfigError(f"Configuração inválida em {path}: {error}") from error
+
+    if not isinstance(config, dict):
+        raise ConfigError(f"A configuração em {path} tem de ser um objeto/tabela")
+    known = {name for name, *_ in PARAMETERS} | set(RUN_OPTIONS)
+    unknown = sorted(set(config) - known)
+    if unknown:
+        raise ConfigError(f"Parâmetros desconhecidos em {path}: {', '.join(unknown)}")
+    return config
+
+
+_TRUE = ("true", "1", "s", "sim", "y", "yes")
+_FALSE = ("false", "0", "n", "nao", "não", "no")
+
+
+def _convert(name, kind, value):
+    """Valida o tipo de um valor da configuração (aceita texto, como nas células de um CSV)"""
+    if isinstance(value, str):
+        value = value.strip()
+        if value == "":
+            return None
+        if kind is bool:
+            if value.lower() not in _TRUE + _FALSE:
+                raise ConfigError(f"{name} tem de ser true ou false")
+            return value.lower() in _TRUE
+        try:
+            value = float(value)
+        except ValueError:
+            raise ConfigError(f"{name} tem de ser numérico") from None
+    if value is None:
+        return None
+    if kind is bool:
+        if not isinstance(value, bool):
+            raise ConfigError(f"{name} tem de ser true ou false")
+        return value
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ConfigError(f"{name} tem de ser numérico")
+    if kind is int and value != int(value):
+        raise ConfigError(f"{name} tem de ser inteiro")
+    return kind(value)
+
+
+def scenario_params(config):
+    """
+    Parâmetros de `simulation_batch` a partir de uma configuração.
+
+    Args:
+        config: Dicionário com nomes de `PARAMETERS` (taxas em %); as
+            restantes chaves são ignoradas
+
+    Returns:
+        Dicionário com as taxas em frações
+    """
+    params = {}
+    for name, kind, percent, _ in PARAMETERS:
+        value = _convert(name, kind, config.get(name))
+        if value is not None:
+            params[name] = value / 100 if percent else value
+
+    if params.get("mode", 1) not in range(1, 8):
+        raise ConfigError("mode tem de estar entre 1 e 7")
+    if params.get("withdrawal_strategy", 1) not in (1, 2):
+        raise ConfigError("withdrawal_strategy tem de ser 1 ou 2")
+    if params.get("total_years", 1) < 1:
+        raise ConfigError("total_years tem de ser positivo")
+    return params
+
+
+def build_parser(prog="python -m simulador.comandos"):
+    parser = argparse.ArgumentParser(
+        prog=prog,
+        description="Simulação de acumulação e retirada sem perguntas (taxas em %%).",
+    )
+    parser.add_argument("--config", metavar="FICHEIRO", help="configuração JSON ou TOML")
+    parser.add_argument("--paths", type=int, help="número de trajetórias (omissão: 1, com a tabela anual)")
+    parser.add_argument("--workers", type=int, help="processos para --paths > 1 (omissão: todos os núcleos)")
+    parser.add_argument("--seed", type=int, help="semente")
+    parser.add_argument("--output", metavar="FICHEIRO", help="resultado em .csv ou .json (- = CSV na saída padrão)")
+    parser.add_argument("--max-memory", metavar="TAMANHO", help="orçamento de memória (ex: 2GB) para --paths > 1")
+    parser.add_argument("--profile", action="store_true", help="correr dentro do cProfile (resumo em stderr)")
+    parser.add_argument("--quiet", action="store_true", help="não mostrar resultados (só com --output)")
+
+    group = parser.add_argument_group("parâmetros da simulação")
+    for name, kind, _, help_text in PARAMETERS:
+        flag = "--" + name.replace("_", "-")
+        if kind is bool:
+            group.add_argument(flag, action=argparse.BooleanOptionalAction, default=None, help=help_text)
+        else:
+            group.add_argument(flag, type=kind, default=None, help=help_text)
+    return parser
+
+
+def resolve(args):
+    """
+    Junta o ficheiro de configuração e as opções.
+
+    Returns:
+        (parâmetros de `simulation_batch`, com as taxas em frações; opções
+        de execução)
+    """
+    config = load_config(args.config) if args.config else {}
+    for name, *_ in PARAMETERS:
+        if getattr(args, name) is not None:
+            config[name] = getattr(args, name)
+    params = scenario_params(config)
+
+    options = {}
+    for name in RUN_OPTIONS:
+        value = getattr(args, name)
+        options[name] = value if value is not None else config.get(name)
+    options["paths"] = 1 if options["paths"] is None else options["paths"]
+    for name in ("paths", "workers"):
+        if options[name] is not None and (not isinstance(options[name], int) or options[name] < 1):
+            raise ConfigError(f"{name} tem de ser um inteiro positivo")
+    if options["seed"] is not None and not isinstance(options["seed"], int):
+        raise ConfigError("seed tem de ser inteiro")
+    if options["max_memory"] is not None:
+        # a trajetória única (questionário) não passa por run_parallel
+        if options["paths"] == 1 and params.get("mode", 1) not in DAILY_MODES:
+            raise ConfigError("max_memory só se aplica com paths > 1")
+        if isinstance(options["max_memory"], bool) or not isinstance(options["max_memory"], (str, int, float)):
+            raise ConfigError("max_memory tem de ser um tamanho (ex: 2GB)")
+        try:
+            options["max_memory"] = parse_memory(options["max_memory"])
+        except ValueError as error:
+            raise ConfigError(str(error)) from None
+    return params, options
+
+
+def summarize(result):
+    """Resumo de uma simulação com várias trajetórias (dicionário serializável)"""
+    reached = result.reached_target
+    percentiles = (5, 25, 50, 75, 95)
+    balances = np.percentile(result.final_balance, percentiles)
+    return {
+        "paths": result.n_paths,
+        "target_probability": result.target_probability(),
+        "ruin_probability": result.ruin_probability(),
+        "success_probability": result.success_probability(),
+        "final_balance_percentiles": {f"p{p}": float(value) for p, value in zip(percentiles, balances)},
+        "median_withdrawal_start_year": (
+            float(np.median(result.withdrawal_start_year[reached])) if reached.any() else None
+        ),
+        "median_total_withdrawn": float(np.median(result.total_withdrawn)),
+        "mean_total_contributions": float(np.mean(result.total_contributions)),
+    }
+
+
+def _path_rows(result):
+    """Uma linha por trajetória (CSV de --paths > 1)"""
+    import pandas as pd
+
+    return pd.DataFrame({
+        "path": np.arange(result.n_paths),
+        "final_balance": result.final_balance,
+        "withdrawal_start_year": result.withdrawal_start_year,
+        "total_withdrawn": result.total_withdrawn,
+        "total_contributions": result.total_contributions,
+        "ruined": result.ruined,
+        "ruin_year": result.ruin_year,
+    })
+
+
+def write_output(path, frame=None, document=None):
+    """
+    Grava o resultado: CSV com `frame` ou JSON com `document`.
+
+    Args:
+        path: Ficheiro de destino (`-` = saída padrão)
+    """
+    if path == "-":
+        frame.to_csv(sys.stdout, index=False)
+        return
+    if path.lower().endswith(".json"):
+        text = json.dumps(document, indent=2, ensure_ascii=False) + "\n"
+    else:
+        buffer = io.StringIO()
+        frame.to_csv(buffer, index=False)
+        text = buffer.getvalue()
+    write_atomic(os.path.abspath(path), lambda file: file.write(text.encode("utf-8")))
+
+
+def run(params, paths=1, workers=None, seed=None, output=None, max_memory=None, quiet=False):
+    """
+    Corre a simulação e mostra ou grava o resultado.
+
+    Args:
+        params: Parâmetros de `simulation_batch` (taxas em frações)
+        paths, workers, seed, output, max_memory: Ver `build_parser`
+        quiet: Não escrever os resultados na saída padrão
+    """
+    # os modos diários não têm a tabela de uma trajetória do questionário
+    if paths == 1 and params.get("mode", 1) not in DAILY_MODES:
+        table, withdrawal_start_year, total_withdrawn = single_path(
+            seed=seed, growth_formatter=None, **params
+        )
+        frame = table.to_frame()
+        if output is not None:
+            write_output(output, frame, {
+                "params": params,
+                "seed": seed,
+                "withdrawal_start_year": withdrawal_start_year,
+                "total_withdrawn": total_withdrawn,
+                "final_balance": float(table.end_balance[-1]),
+                "table": json.loads(frame.to_json(orient="records", force_ascii=False)),
+            })
+        if not quiet and output != "-":
+            render_table(frame, decimals=2, suffixes={table.labels["growth"]: " %"})
+            print()
+            print(f"Ano de início das retiradas: {withdrawal_start_year or 'Não atingido'}")
+            print(f"Total retirado (líquido): €{format_number_pt(total_withdrawn)}")
+            print(f"Saldo final: €{format_number_pt(table.end_balance[-1])}")
+        return EXIT_OK
+
+    result = run_parallel(paths, workers=workers, seed=seed, max_memory=max_memory, **params)
+    summary = summarize(result)
+    if output is not None:
+        write_output(output, _path_rows(result), {"params": params, "seed": seed, "summary": summary})
+    if not quiet and output != "-":
+        print(f"Trajetórias: {summary['paths']}")
+        print(f"Probabilidade de atingir o target: {summary['target_probability']:.2%}")
+        print(f"Probabilidade de esgotar o saldo: {summary['ruin_probability']:.2%}")
+        print(f"Probabilidade de sucesso: {summary['success_probability']:.2%}")
+        for name, value in summary["final_balance_percentiles"].items():
+            print(f"Saldo final {name}: €{format_number_pt(value)}")
+    return EXIT_OK
+
+
+def main(argv=None, prog=None):
+    """
+    Ponto de entrada da linha de comandos.
+
+    Args:
+        argv: Argumentos (omissão: `sys.argv[1:]`)
+        prog: Nome do programa nas mensagens de uso
+
+    Returns:
+        Código de saída (ver `EXIT_OK`, `EXIT_FAILURE`, `EXIT_USAGE`)
+    """
+    parser = build_parser(prog) if prog else build_parser()
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as exit:
+        return exit.code
+    try:
+        params, options = resolve(args)
+    except ConfigError as error:
+        print(f"erro: {error}", file=sys.stderr)
+        return EXIT_USAGE
+
+    try:
+        if args.profile:
+            return profiled(run, params, quiet=args.quiet, **options)
+        return run(params, quiet=args.quiet, **options)
+    except KeyboardInterrupt:
+        return 130
+    except (ValueError, KeyError, MemoryError, OSError) as error:
+        print(f"erro: {error}", file=sys.stderr)
+        return EXIT_FAILURE
+
+
+if __name__ == "__main__":
+    sys.exit(main())
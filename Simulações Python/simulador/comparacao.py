@@ -0,0 +1,260 @@
+"""
+Comparação de variantes com números aleatórios comuns.
+
+Todas as variantes (estratégias de retirada, planos de aportes, limiares,
+...) são avaliadas sobre os mesmos sorteios, como em `sweep`: a trajetória
+`i` de cada variante vê exatamente os mesmos retornos. Por isso a diferença
+entre duas variantes pode ser medida trajetória a trajetória (diferenças
+emparelhadas), e o ruído comum às duas anula-se.
+
+As variantes que diferem só em parâmetros por trajetória ou nos aportes são
+empilhadas numa só passagem vetorizada; as que diferem em parâmetros
+estruturais (ex: `withdrawal_strategy`) correm em passagens separadas, mas
+com os mesmos sorteios.
+
+    compare(
+        {"fixo": {"withdrawal_strategy": 1}, "4%": {"withdrawal_strategy": 2}},
+        n_paths=20000, seed=1,
+    )
+
+Para cada variante e métrica o resultado traz a diferença para a base, o
+intervalo de confiança, o erro padrão emparelhado, o erro padrão que se
+teria com sorteios independentes e o ganho de eficiência (quantas vezes
+mais trajetórias seriam precisas sem números comuns para a mesma precisão).
+
+`sampling_efficiency` faz a medição equivalente para os esquemas de
+amostragem do modo 1 (`simulador.amostragem`): o erro padrão da
+probabilidade de sucesso e do saldo final mediano com cada esquema.
+"""
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from simulador.amostragem import SAMPLING
+from simulador.grelha import DEFAULT_MAX_PATHS_PER_PASS, _simulate_cells, _with_draws, plan_passes
+from simulador.modos import simulation_batch
+
+# Lotes usados para o erro padrão das medianas (médias de lotes)
+MEDIAN_BATCHES = 32
+
+# Métrica -> (valor por trajetória, estatística)
+METRICS = {
+    "Atinge o target (%)": (lambda outcome: outcome["reached"] * 100.0, "mean"),
+    "Ruína (%)": (lambda outcome: outcome["ruined"] * 100.0, "mean"),
+    "Sucesso (%)": (lambda outcome: (outcome["reached"] & ~outcome["ruined"]) * 100.0, "mean"),
+    "Saldo final médio (€)": (lambda outcome: outcome["final_balance"], "mean"),
+    "Saldo final mediano (€)": (lambda outcome: outcome["final_balance"], "median"),
+    "Retirado líquido médio (€)": (lambda outcome: outcome["total_withdrawn"], "mean"),
+}
+
+
+def _variant_names(variants):
+    if isinstance(variants, dict):
+        return list(variants), [dict(cell) for cell in variants.values()]
+    return [f"Variante {index + 1}" for index in range(len(variants))], [dict(cell) for cell in variants]
+
+
+def _estimate(values, statistic):
+    """(estimativa, estimativas por lote) de uma estatística"""
+    if statistic == "mean":
+        return float(values.mean()), None
+    batches = np.array_split(values, min(MEDIAN_BATCHES, len(values)))
+    return float(np.median(values)), np.array([np.median(batch) for batch in batches])
+
+
+def _standard_error(values, batch_values):
+    """Erro padrão da média (ou, com lotes, da estatística por médias de lotes)"""
+    if batch_values is None:
+        return float(values.std(ddof=1) / np.sqrt(len(values))) if len(values) > 1 else np.nan
+    return float(batch_values.std(ddof=1) / np.sqrt(len(batch_values))) if len(batch_values) > 1 else np.nan
+
+
+def paired_difference(values, baseline, statistic="mean", confidence=0.95):
+    """
+    Diferença emparelhada de uma estatística entre duas amostras.
+
+    Args:
+        values, baseline: Valor por trajetória da variante e da base
+            (mesmos sorteios, mesma ordem)
+        statistic: "mean" ou "median" (erro padrão por médias de lotes)
+        confidence: Nível do intervalo de confiança
+
+    Returns:
+        Dicionário com value, baseline, difference, ci_low, ci_high, se,
+        se_independent e efficiency ((se_independent / se)²)
+    """
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    value, value_batches = _estimate(values, statistic)
+    base, base_batches = _estimate(baseline, statistic)
+    difference = value - base
+
+    if statistic == "mean":
+        se = _standard_error(values - baseline, None)
+        se_independent = float(np.hypot(_standard_error(values, None), _standard_error(baseline, None)))
+    else:
+        se = _standard_error(None, value_batches - base_batches)
+        se_independent = float(np.hypot(_standard_error(None, value_batches), _standard_error(None, base_batches)))
+
+    efficiency = (se_independent / se) ** 2 if se > 0 else np.inf if se_independent > 0 else np.nan
+    return {
+        "value": value,
+        "baseline": base,
+        "difference": difference,
+        "ci_low": difference - z * se,
+        "ci_high": difference + z * se,
+        "se": se,
+        "se_independent": se_independent,
+        "efficiency": efficiency,
+    }
+
+
+def simulate_variants(variants, n_paths=10000, seed=None, max_paths_per_pass=DEFAULT_MAX_PATHS_PER_PASS, **params):
+    """
+    Resultados por trajetória de cada variante, com os mesmos sorteios.
+
+    Args:
+        variants: Dicionário {nome: parâmetros} ou lista de dicionários
+        n_paths: Trajetórias por variante
+        seed: Semente dos sorteios partilhados (gerada se omitida)
+        max_paths_per_pass: Ver `sweep`
+        **params: Valores comuns a todas as variantes
+
+    Returns:
+        {nome: {"reached", "ruined", "final_balance", "total_withdrawn",
+        "total_contributions"}} com arrays (n_paths,)
+    """
+    names, cells = _variant_names(variants)
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    tasks, order = plan_passes(cells, n_paths, seed, max_paths_per_pass, **params)
+
+    outcomes = [None] * len(cells)
+    position = 0
+    for structural, full_cells, _, draws in _with_draws(tasks):
+        result = _simulate_cells(structural, full_cells, n_paths, draws)
+        shape = (len(full_cells), n_paths)
+        fields = {
+            "reached": result.reached_target.reshape(shape),
+            "ruined": result.ruined.reshape(shape),
+            "final_balance": result.final_balance.reshape(shape),
+            "total_withdrawn": result.total_withdrawn.reshape(shape),
+            "total_contributions": result.total_contributions.reshape(shape),
+        }
+        for row in range(len(full_cells)):
+            outcomes[order[position]] = {field: values[row] for field, values in fields.items()}
+            position += 1
+    return dict(zip(names, outcomes))
+
+
+def compare(
+    variants,
+    n_paths=10000,
+    seed=None,
+    baseline=None,
+    confidence=0.95,
+    metrics=tuple(METRICS),
+    max_paths_per_pass=DEFAULT_MAX_PATHS_PER_PASS,
+    **params
+):
+    """
+    Compara variantes com a base usando diferenças emparelhadas.
+
+    Args:
+        variants: Dicionário {nome: parâmetros} ou lista de dicionários
+            (nomes "Variante 1", ...); cada variante só indica o que muda
+        n_paths: Trajetórias por variante
+        seed: Semente dos sorteios partilhados
+        baseline: Nome da variante de referência (por omissão a primeira)
+        confidence: Nível dos intervalos de confiança
+        metrics: Métricas de `METRICS` a reportar
+        max_paths_per_pass: Ver `sweep`
+        **params: Valores comuns a todas as variantes
+
+    Returns:
+        DataFrame com uma linha por variante (exceto a base) e métrica:
+        valores da base e da variante, diferença, intervalo de confiança,
+        erros padrão (emparelhado e independente) e ganho de eficiência
+    """
+    outcomes = simulate_variants(variants, n_paths, seed, max_paths_per_pass, **params)
+    names = list(outcomes)
+    baseline = names[0] if baseline is None else baseline
+    if baseline not in outcomes:
+        raise ValueError(f"Variante base desconhecida: {baseline!r}")
+    unknown = set(metrics) - set(METRICS)
+    if unknown:
+        raise ValueError(f"Métricas desconhecidas: {', '.join(sorted(unknown))}")
+
+    rows = []
+    for name in names:
+        if name == baseline:
+            continue
+        for metric in metrics:
+            per_path, statistic = METRICS[metric]
+            stats = paired_difference(
+                per_path(outcomes[name]), per_path(outcomes[baseline]), statistic, confidence
+            )
+            rows.append({
+                "Variante": name,
+                "Métrica": metric,
+                "Base": stats["baseline"],
+                "Valor": stats["value"],
+                "Diferença": stats["difference"],
+                "IC inferior": stats["ci_low"],
+                "IC superior": stats["ci_high"],
+                "Erro padrão": stats["se"],
+                "Erro padrão (independente)": stats["se_independent"],
+                "Ganho de eficiência": stats["efficiency"],
+            })
+    return pd.DataFrame(rows)
+
+
+def sampling_efficiency(schemes=SAMPLING, n_paths=2000, replications=50, seed=None, **params):
+    """
+    Erro padrão da probabilidade de sucesso e do saldo final mediano por
+    esquema de amostragem, medido com réplicas independentes.
+
+    Cada réplica é um `simulation_batch(n_paths=n_paths, sampling=...)` com
+    a sua semente; o erro padrão é o desvio das estimativas entre réplicas
+    (o único válido para o Sobol e o hipercubo latino, em que as trajetórias
+    de uma réplica não são independentes).
+
+    Args:
+        schemes: Esquemas a comparar (de `SAMPLING`); "random" é a referência
+        n_paths: Trajetórias por réplica
+        replications: Réplicas por esquema
+        seed: Semente das réplicas (as mesmas para todos os esquemas)
+        **params: Parâmetros de `simulation_batch` (modo 1)
+
+    Returns:
+        DataFrame com uma linha por esquema: estimativa média, erro padrão e
+        fator de eficiência ((erro do "random" / erro)², ou seja, quantas
+        vezes menos trajetórias dão a mesma precisão) de cada métrica
+    """
+    if params.get("mode", 1) != 1:
+        raise ValueError("Os esquemas de amostragem só se aplicam ao modo 1")
+    schemes = list(dict.fromkeys(["random", *schemes]))
+    seeds = np.random.SeedSequence(seed).spawn(replications)
+
+    estimates = {}
+    for scheme in schemes:
+        success, median = np.empty(replications), np.empty(replications)
+        for index, seed_sequence in enumerate(seeds):
+            result = simulation_batch(
+                n_paths=n_paths, sampling=scheme, rng=np.random.default_rng(seed_sequence), **params
+            )
+            success[index] = result.success_probability() * 100
+            median[index] = np.median(result.final_balance)
+        estimates[scheme] = {"Sucesso (%)": success, "Saldo final mediano (€)": median}
+
+    reference = {metric: values.std(ddof=1) for metric, values in estimates["random"].items()}
+    rows = []
+    for scheme, metrics in estimates.items():
+        row = {"Amostragem": scheme}
+        for metric, values in metrics.items():
+            se = values.std(ddof=1)
+            row[metric] = values.mean()
+            row[f"Erro padrão - {metric}"] = se
+            row[f"Fator de eficiência - {metric}"] = (reference[metric] / se) ** 2 if se > 0 else np.nan
+        rows.append(row)
+    return pd.DataFrame(rows)
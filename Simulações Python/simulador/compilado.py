@@ -0,0 +1,234 @@
+"""
+Núcleo compilado (Numba) do motor anual, opcional.
+
+Algumas regras dependem do estado do ano anterior de cada trajetória (a
+mudança de fase, o contador de anos negativos, a retirada bruta calculada a
+partir do saldo). O motor NumPy trata-as com máscaras sobre todas as
+trajetórias; aqui cada trajetória percorre os seus anos num ciclo simples,
+compilado com `numba.njit`, e as trajetórias são distribuídas pelos núcleos
+com `prange`.
+
+Usa-se com `simulate_paths(..., engine="numba")` (ou "auto"); sem Numba
+instalado o pedido recua automaticamente para o motor NumPy. A compilação
+fica em cache no disco (`cache=True`), por isso só a primeira execução paga
+o tempo de compilação.
+"""
+import numpy as np
+
+from simulador.resultados import YearlyResults
+
+try:
+    import numba
+except ImportError:  # Numba é opcional
+    numba = None
+
+NUMBA_AVAILABLE = numba is not None
+
+ENGINES = ("numpy", "numba", "auto")
+
+
+def _paths_kernel(
+    returns,
+    contributions,
+    initial_portfolio,
+    management_fee,
+    target_portfolio,
+    min_threshold,
+    upper_threshold,
+    withdrawal_base,
+    withdrawal_growth_rate,
+    tax_rate_withdrawal,
+    continue_contributions_during_withdrawal,
+    negative_years_cap,
+    withdrawal_strategy,
+    threshold_before_contribution,
+    record,
+    final_balance,
+    withdrawal_start_year,
+    total_withdrawn,
+    total_contributions,
+    ruined,
+    ruin_year,
+    phase,
+    start_balance,
+    contribution,
+    withdrawal,
+    net_withdrawal,
+    growth,
+    end_balance,
+):
+    """
+    Ciclo ano a ano de cada trajetória, com as mesmas regras de `simulate_paths`.
+
+    Os resultados são escritos nos arrays de saída; as colunas da tabela só
+    são preenchidas com `record=True`. `negative_years_cap < 0` = sem limite.
+    """
+    total_years, n_paths = returns.shape
+    for path in prange(n_paths):
+        portfolio = initial_portfolio
+        in_withdrawal = False
+        current_withdrawal_net = withdrawal_base
+        path_withdrawn = 0.0
+        path_contributions = 0.0
+        negative_years = 0
+        path_ruined = False
+
+        for year_index in range(total_years):
+            year = year_index + 1
+            annual_contribution = contributions[year_index]
+            if record:
+                start_balance[year_index, path] = portfolio
+
+            # Muda para fase de retirada
+            if not in_withdrawal and portfolio >= target_portfolio:
+                in_withdrawal = True
+                withdrawal_start_year[path] = year
+
+            # Aportes (em retirada só se continue_contributions_during_withdrawal)
+            if continue_contributions_during_withdrawal:
+                can_withdraw = in_withdrawal and portfolio >= min_threshold
+                this_contribution = annual_contribution
+                portfolio += this_contribution
+                path_contributions += this_contribution
+                if not threshold_before_contribution:
+                    can_withdraw = in_withdrawal and portfolio >= min_threshold
+            else:
+                this_contribution = 0.0 if in_withdrawal else annual_contribution
+                portfolio += this_contribution
+                path_contributions += this_contribution
+                can_withdraw = in_withdrawal and portfolio >= min_threshold
+
+            # Define valor líquido desejado e calcula retirada bruta
+            gross_withdrawal = 0.0
+            net_withdrawal_year = 0.0
+            if can_withdraw:
+                if withdrawal_strategy == 1:
+                    desired_net = current_withdrawal_net
+                    if portfolio >= upper_threshold:
+                        desired_net = current_withdrawal_net * 2
+                else:  # 4% anual líquido
+                    desired_net = 0.04 * portfolio
+
+                capital_ratio = min(1.0, path_contributions / portfolio) if portfolio > 0 else 1.0
+                gross_withdrawal = desired_net / (1 - tax_rate_withdrawal * (1 - capital_ratio))
+                capital_withdrawn = gross_withdrawal * capital_ratio
+                gain_withdrawn = gross_withdrawal - capital_withdrawn
+                tax_paid = gain_withdrawn * tax_rate_withdrawal
+                net_withdrawal_year = gross_withdrawal - tax_paid
+
+                portfolio -= gross_withdrawal
+                path_withdrawn += net_withdrawal_year
+                if withdrawal_strategy == 1:
+                    current_withdrawal_net = current_withdrawal_net * (1 + withdrawal_growth_rate)
+
+            # Retorno do ano (com limite de anos negativos)
+            effective_return = returns[year_index, path] - management_fee
+            if negative_years_cap >= 0 and effective_return < 0:
+                if negative_years >= negative_years_cap:
+                    effective_return = 0.0
+                else:
+                    negative_years += 1
+
+            portfolio *= 1 + effective_return
+            if not path_ruined and portfolio <= 0:
+                path_ruined = True
+                ruin_year[path] = year
+
+            if record:
+                phase[year_index, path] = in_withdrawal
+                contribution[year_index, path] = this_contribution
+                withdrawal[year_index, path] = gross_withdrawal
+                net_withdrawal[year_index, path] = net_withdrawal_year
+                growth[year_index, path] = effective_return
+                end_balance[year_index, path] = portfolio
+
+        final_balance[path] = portfolio
+        total_withdrawn[path] = path_withdrawn
+        total_contributions[path] = path_contributions
+        ruined[path] = path_ruined
+
+
+if NUMBA_AVAILABLE:
+    prange = numba.prange
+    _paths_kernel = numba.njit(parallel=True, cache=True)(_paths_kernel)
+else:
+    prange = range
+
+
+def resolve_engine(engine):
+    """
+    Motor efetivo para `engine` ("numpy", "numba" ou "auto").
+
+    "numba" sem Numba instalado recua para "numpy"; "auto" usa Numba quando
+    disponível.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Motor desconhecido: {engine!r} (opções: {', '.join(ENGINES)})")
+    if engine == "numpy" or not NUMBA_AVAILABLE:
+        return "numpy"
+    return "numba"
+
+
+def compiled_paths(returns, contributions, n_paths=None, negative_years_cap=12, record=False, **params):
+    """
+    Corre o núcleo compilado (requer Numba).
+
+    Args:
+        returns: Retornos (anos, trajetórias) ou iterável de arrays por ano,
+            materializado numa matriz
+        **params: Restantes parâmetros de `simulate_paths`
+
+    Returns:
+        Dicionário com os campos por trajetória de `BatchResult`, tabela
+        (YearlyResults ou None)
+    """
+    if not NUMBA_AVAILABLE:
+        raise ImportError("O motor 'numba' requer o pacote numba")
+
+    contributions = np.ascontiguousarray(contributions, dtype=float)
+    total_years = len(contributions)
+    if isinstance(returns, np.ndarray):
+        returns = np.asarray(returns, dtype=float)
+    else:
+        returns = np.stack([np.broadcast_to(np.asarray(row, dtype=float), (n_paths,)) for row in returns])
+    if n_paths is None:
+        n_paths = returns.shape[1]
+    returns = np.ascontiguousarray(np.broadcast_to(returns, (total_years, n_paths)))
+
+    fields = dict(
+        final_balance=np.empty(n_paths),
+        withdrawal_start_year=np.zeros(n_paths, dtype=np.int32),
+        total_withdrawn=np.empty(n_paths),
+        total_contributions=np.empty(n_paths),
+        ruined=np.zeros(n_paths, dtype=bool),
+        ruin_year=np.zeros(n_paths, dtype=np.int32),
+    )
+    # Sem record o núcleo não toca nas colunas: bastam arrays vazios
+    table = YearlyResults(total_years, n_paths) if record else YearlyResults(0, 0)
+
+    _paths_kernel(
+        returns,
+        contributions,
+        float(params["initial_portfolio"]),
+        float(params["management_fee"]),
+        float(params["target_portfolio"]),
+        float(params["min_threshold"]),
+        float(params["upper_threshold"]),
+        float(params["withdrawal_base"]),
+        float(params["withdrawal_growth_rate"]),
+        float(params["tax_rate_withdrawal"]),
+        bool(params["continue_contributions_during_withdrawal"]),
+        -1 if negative_years_cap is None else int(negative_years_cap),
+        int(params["withdrawal_strategy"]),
+        bool(params["threshold_before_contribution"]),
+        bool(record),
+        *fields.values(),
+        table.phase,
+        table.start_balance,
+        table.contribution,
+        table.withdrawal,
+        table.net_withdrawal,
+        table.growth,
+        table.end_balance,
+    )
+    return fields, table if record else None
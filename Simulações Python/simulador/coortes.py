@@ -0,0 +1,185 @@
+"""
+Backtest por coortes sobre o histórico do S&P500.
+
+O modo 2 começa sempre no primeiro ano da série. Aqui cada ano (ou mês) de
+início possível é uma coorte: as janelas de retornos são vistas deslizantes
+(`sliding_window_view`) sobre a série, sem cópias, e todas as coortes são
+simuladas de uma só vez pelo motor vetorizado, uma coorte por trajetória.
+"""
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from simulador import historico
+from simulador.mensal import monthly_contribution_schedule, simulate_monthly_paths
+from simulador.vetorizado import contribution_schedule, simulate_paths
+
+
+def cohort_windows(series, length, wrap=True):
+    """
+    Janelas de `length` períodos para cada início possível da série.
+
+    Args:
+        series: Série de retornos (frações)
+        length: Duração de cada janela
+        wrap: Recomeçar a série no início quando se esgota (como o
+            `% len(sp500_returns)` do modo 2); sem `wrap` só entram as
+            coortes com a janela completa
+
+    Returns:
+        Vista (períodos, coortes) sobre a série
+    """
+    series = np.asarray(series, dtype=float)
+    if wrap:
+        series = np.resize(series, len(series) + length - 1)
+    if len(series) < length:
+        raise ValueError("A série é mais curta do que o horizonte da simulação")
+    return sliding_window_view(series, length).T
+
+
+def _cohort_table(labels, result, period_label):
+    """Tabela de sobrevivência por coorte"""
+    reached = result.withdrawal_start_year > 0
+    return pd.DataFrame({
+        period_label: labels,
+        "Ano de início das retiradas": pd.Series(result.withdrawal_start_year, dtype="Int64").where(reached),
+        "Saldo final (€)": result.final_balance,
+        "Total retirado (líquido) (€)": result.total_withdrawn,
+        "Ruína": result.ruined,
+        "Ano da ruína": pd.Series(result.ruin_year, dtype="Int64").where(result.ruined),
+    })
+
+
+def _cohort_summary(table, result, period_label):
+    """Estatísticas globais das coortes"""
+    final_balance = result.final_balance
+    worst = int(np.argmin(final_balance))
+    best = int(np.argmax(final_balance))
+    return {
+        "Coortes": result.n_paths,
+        "Atingem o target (%)": result.target_probability() * 100,
+        "Ruína (%)": result.ruin_probability() * 100,
+        "Sucesso (%)": result.success_probability() * 100,
+        "Saldo final mínimo (€)": float(final_balance[worst]),
+        "Saldo final P10 (€)": float(np.percentile(final_balance, 10)),
+        "Saldo final mediano (€)": float(np.median(final_balance)),
+        "Saldo final P90 (€)": float(np.percentile(final_balance, 90)),
+        "Saldo final máximo (€)": float(final_balance[best]),
+        "Pior coorte": table[period_label].iloc[worst],
+        "Melhor coorte": table[period_label].iloc[best],
+    }
+
+
+def backtest_annual_cohorts(
+    total_years=55,
+    returns=None,
+    first_year=historico.SP500_FIRST_YEAR,
+    wrap=True,
+    initial_portfolio=20000,
+    initial_monthly_contribution=200,
+    contribution_multiplier=14,
+    contribution_growth_rate=0.00,
+    contribution_step_interval=5,
+    contribution_step_amount=100,
+    min_monthly_contribution=None,
+    max_monthly_contribution=None,
+    target_portfolio=400000,
+    min_threshold=300000,
+    upper_threshold=600000,
+    withdrawal_base=20000,
+    negative_years_cap=None,
+    threshold_before_contribution=False,
+    **params
+):
+    """
+    Corre o modo 2 (histórico anual) para todos os anos de início.
+
+    Os padrões reproduzem `simulation()` (a coorte do primeiro ano é o
+    modo 2 de `simulation_batch`); para as regras de `SimulacaoSP500_*` use
+    `threshold_before_contribution=True` e um `contribution_step_amount`
+    negativo no caso do decrescimento.
+
+    Args:
+        returns: Série anual (frações); por omissão o S&P500 de `historico`
+        first_year: Ano civil do primeiro retorno da série
+        wrap: Ver `cohort_windows`
+        **params: Restantes parâmetros de `simulate_paths`
+
+    Returns:
+        DataFrame com uma linha por coorte, dicionário com o resumo
+    """
+    if returns is None:
+        returns = historico.annual_returns()
+    windows = cohort_windows(returns, total_years, wrap=wrap)
+    contributions = contribution_schedule(
+        total_years,
+        initial_monthly_contribution,
+        contribution_multiplier=contribution_multiplier,
+        contribution_growth_rate=contribution_growth_rate,
+        contribution_step_interval=contribution_step_interval,
+        contribution_step_amount=contribution_step_amount,
+        min_monthly_contribution=min_monthly_contribution,
+        max_monthly_contribution=max_monthly_contribution,
+    )
+    result = simulate_paths(
+        windows,
+        contributions,
+        initial_portfolio=initial_portfolio,
+        target_portfolio=target_portfolio,
+        min_threshold=min_threshold,
+        upper_threshold=upper_threshold,
+        withdrawal_base=withdrawal_base,
+        negative_years_cap=negative_years_cap,
+        threshold_before_contribution=threshold_before_contribution,
+        **params
+    )
+
+    table = _cohort_table(first_year + np.arange(windows.shape[1]), result, "Ano de início")
+    return table, _cohort_summary(table, result, "Ano de início")
+
+
+def backtest_monthly_cohorts(
+    total_years=40,
+    returns=None,
+    first_year=historico.SP500_MONTHLY_FIRST_YEAR,
+    wrap=True,
+    initial_portfolio=20000,
+    initial_monthly_contribution=200,
+    contribution_growth_rate=0.00,
+    contribution_step_up_interval=5,
+    contribution_step_up_amount=100,
+    max_monthly_contribution=None,
+    **params
+):
+    """
+    Corre o modo 3 (dados mensais) para todos os meses de início.
+
+    Com `wrap=True` as janelas que passam do fim da série recomeçam no
+    primeiro mês, em vez de usarem a aproximação anual do modo 3.
+
+    Args:
+        returns: Série mensal (frações); por omissão o S&P500 de `historico`
+        first_year: Ano civil do primeiro mês da série
+        wrap: Ver `cohort_windows`
+        **params: Restantes parâmetros de `simulate_monthly_paths`
+
+    Returns:
+        DataFrame com uma linha por coorte, dicionário com o resumo
+    """
+    if returns is None:
+        returns = historico.monthly_returns()
+    windows = cohort_windows(returns, total_years * 12, wrap=wrap)
+    contributions = monthly_contribution_schedule(
+        total_years,
+        initial_monthly_contribution,
+        contribution_growth_rate=contribution_growth_rate,
+        contribution_step_up_interval=contribution_step_up_interval,
+        contribution_step_up_amount=contribution_step_up_amount,
+        max_monthly_contribution=max_monthly_contribution,
+    )
+    result = simulate_monthly_paths(windows, contributions, initial_portfolio=initial_portfolio, **params)
+
+    start_months = np.arange(windows.shape[1])
+    labels = [f"{first_year + month // 12}-{month % 12 + 1:02d}" for month in start_months]
+    table = _cohort_table(labels, result, "Mês de início")
+    return table, _cohort_summary(table, result, "Mês de início")
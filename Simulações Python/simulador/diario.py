@@ -0,0 +1,353 @@
+"""
+Motor diário vetorizado, com o tempo percorrido em blocos.
+
+As datas são os dias úteis (segunda a sexta) de um calendário real. Os
+aportes entram na data de pagamento de cada mês (com as duas prestações
+extra de junho e dezembro, como no modo 3) e as retiradas nas datas de um
+calendário configurável (`withdrawal_months`). Entre duas datas com
+movimentos o saldo só é multiplicado pelos retornos diários, por isso cada
+troço é composto de uma vez com `np.cumprod` ao longo do tempo.
+
+Os retornos não são gerados para o horizonte inteiro: vêm de uma fonte
+(`normal_daily_returns`, `bootstrap_daily_returns` ou qualquer função
+`(início, dias) -> (dias, trajetórias)`) e são pedidos em blocos de
+`chunk_days` dias. O pico de memória depende de `chunk_days` × trajetórias e
+não do número de anos.
+
+A resolução diária permite acompanhar a queda máxima (drawdown) de cada
+trajetória e usar uma regra de retirada sensível a quedas: com
+`drawdown_limit`, as retiradas são suspensas enquanto o mercado estiver
+mais do que esse valor abaixo do máximo anterior.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from simulador.instrumentacao import stage_timer
+from simulador.resultados import YearlyResults
+from simulador.vetorizado import BatchResult
+
+DEFAULT_START_YEAR = 2025
+DEFAULT_CHUNK_DAYS = 64
+
+
+@dataclass
+class DailyBatchResult(BatchResult):
+    """
+    BatchResult do motor diário.
+
+    Attributes:
+        max_drawdown: Maior queda do mercado face ao máximo anterior, em
+            cada trajetória (fração, 0.3 = -30%)
+    """
+
+    max_drawdown: Optional[np.ndarray] = None
+
+
+def trading_calendar(total_years, start_year=DEFAULT_START_YEAR):
+    """Dias úteis (segunda a sexta) dos anos simulados, datetime64[D]"""
+    days = np.arange(np.datetime64(f"{start_year}-01-01"), np.datetime64(f"{start_year + total_years}-01-01"))
+    return days[np.is_busday(days)]
+
+
+def trading_days_per_year(dates):
+    """Número de dias úteis do ano de cada dia do calendário, (dias,)"""
+    years = dates.astype("datetime64[Y]").astype(np.int64)
+    years -= years[0]
+    return np.bincount(years)[years]
+
+
+def _payment_days(dates, total_years, start_year, day_of_month):
+    """Índice (no calendário) da data de pagamento de cada mês"""
+    months = np.arange(np.datetime64(f"{start_year}-01"), np.datetime64(f"{start_year + total_years}-01"))
+    last_day = (months + 1).astype("datetime64[D]") - 1
+    target = np.minimum(months.astype("datetime64[D]") + (day_of_month - 1), last_day)
+    # Dia útil seguinte; se o mês já acabou, o último dia útil do mês
+    index = np.searchsorted(dates, target)
+    past_month = (index >= len(dates)) | (dates[np.minimum(index, len(dates) - 1)] > last_day)
+    return np.where(past_month, index - 1, index)
+
+
+def normal_daily_returns(mean_return, std_return, n_paths, days_per_year, rng=None, seed=None, dtype=np.float64):
+    """
+    Fonte de retornos diários normais a partir da média e do desvio anuais.
+
+    A média diária é `(1 + mean_return) ** (1 / dias do ano) - 1` e o desvio
+    `std_return / sqrt(dias do ano)`. Os sorteios são sequenciais, por isso
+    o resultado não depende do tamanho dos blocos pedidos.
+
+    Args:
+        days_per_year: Número de dias úteis do ano de cada dia, (dias,)
+        rng: Gerador NumPy; se omitido é criado a partir de `seed`
+        dtype: Tipo dos retornos (np.float64 ou np.float32)
+
+    Returns:
+        Função (início, dias) -> array (dias, trajetórias)
+    """
+    rng = rng if rng is not None else np.random.default_rng(seed)
+    days_per_year = np.asarray(days_per_year, dtype=dtype)
+
+    def draw(start, n_days):
+        days = days_per_year[start:start + n_days, None]
+        daily_mean = (1 + mean_return) ** (1 / days) - 1
+        # Sorteios sempre em float64: a mesma semente dá as mesmas trajetórias em float32
+        draws = rng.standard_normal((n_days, n_paths))
+        return (daily_mean + (std_return / np.sqrt(days)) * draws).astype(dtype, copy=False)
+
+    return draw
+
+
+def bootstrap_daily_returns(series, n_paths, block_length=21, rng=None, seed=None, dtype=np.float64):
+    """
+    Fonte de retornos diários por bootstrap estacionário de uma série.
+
+    Cada dia continua o bloco do dia anterior ou, com probabilidade
+    `1 / block_length`, começa um bloco novo num dia ao acaso da série. Os
+    blocos continuam de um pedido para o seguinte e os sorteios são
+    sequenciais, por isso o resultado não depende do tamanho dos blocos
+    pedidos.
+
+    Args:
+        series: Retornos diários históricos (frações)
+        block_length: Comprimento médio dos blocos (dias)
+        dtype: Tipo dos retornos
+
+    Returns:
+        Função (início, dias) -> array (dias, trajetórias)
+    """
+    rng = rng if rng is not None else np.random.default_rng(seed)
+    series = np.asarray(series, dtype=dtype)
+    n_obs = len(series)
+    last = np.full(n_paths, -1, dtype=np.int64)
+
+    def draw(start, n_days):
+        uniforms = rng.random((n_days, n_paths, 2))
+        periods = np.arange(n_days)[:, None]
+        new_block = uniforms[..., 0] < 1 / block_length
+        if start == 0:
+            new_block[0] = True
+        block_start = np.maximum.accumulate(np.where(new_block, periods, -1), axis=0)
+        starts = (uniforms[..., 1] * n_obs).astype(np.int64)
+        opened = block_start >= 0
+        first = np.take_along_axis(starts, np.maximum(block_start, 0), axis=0) - block_start
+        indices = (np.where(opened, first, last + 1) + periods) % n_obs
+        last[:] = indices[-1]
+        return series[indices]
+
+    return draw
+
+
+def simulate_daily_paths(
+    returns,
+    contributions,
+    n_paths=None,
+    start_year=DEFAULT_START_YEAR,
+    contribution_day=1,
+    withdrawal_day=1,
+    withdrawal_months=None,
+    drawdown_limit=None,
+    chunk_days=DEFAULT_CHUNK_DAYS,
+    initial_portfolio=20000,
+    management_fee=0.005,
+    target_portfolio=400000,
+    min_threshold=300000,
+    upper_threshold=600000,
+    withdrawal_base=20000,
+    withdrawal_growth_rate=0.00,
+    tax_rate_withdrawal=0.198,
+    continue_contributions_during_withdrawal=False,
+    withdrawal_strategy=1,  # 1 = Valor fixo, 2 = 4% anual líquido
+    record=False,
+    dtype=np.float64,
+    instrumentation=None,
+):
+    """
+    Simula várias trajetórias em simultâneo, dia a dia.
+
+    As regras são as do motor mensal: a mudança de fase é verificada em cada
+    data com movimentos, as retiradas dividem o valor anual pelas datas de
+    retirada do ano e a taxa de gestão é cobrada por dia (taxa anual / dias
+    úteis do ano).
+
+    Args:
+        returns: Retornos diários brutos, (dias, trajetórias), ou uma fonte
+            `(início, dias) -> (dias, trajetórias)` (ver
+            `normal_daily_returns`)
+        contributions: Aporte de cada mês (ver `monthly_contribution_schedule`),
+            (meses,) ou (meses, trajetórias), pago em `contribution_day`
+        n_paths: Número de trajetórias (obrigatório com uma fonte)
+        start_year: Ano civil do primeiro ano (define os dias úteis)
+        contribution_day: Dia do mês dos aportes (dia útil seguinte)
+        withdrawal_day: Dia do mês das retiradas (dia útil seguinte)
+        withdrawal_months: Meses com retirada (None = todos; (12,) = uma vez
+            por ano, em dezembro)
+        drawdown_limit: Suspender as retiradas quando a queda face ao
+            máximo anterior passa este valor (fração; None = nunca)
+        chunk_days: Dias de retornos pedidos de cada vez
+        record: Guardar a tabela anual de cada trajetória
+        dtype: Tipo dos saldos e retornos (ver `simulate_paths`)
+        instrumentation: Ver `simulate_paths`
+
+    Returns:
+        DailyBatchResult
+    """
+    contributions = np.asarray(contributions, dtype=dtype)
+    total_years = len(contributions) // 12
+    if n_paths is None:
+        n_paths = np.shape(returns)[1]
+    if not callable(returns):
+        history = returns
+
+        def returns(start, n_days):
+            return np.asarray(history[start:start + n_days], dtype=dtype)
+
+    withdrawal_months = tuple(range(1, 13)) if withdrawal_months is None else tuple(withdrawal_months)
+    payments_per_year = len(withdrawal_months)
+
+    dates = trading_calendar(total_years, start_year)
+    total_days = len(dates)
+    years = dates.astype("datetime64[Y]").astype(np.int64) - (start_year - 1970)
+    days_per_year = np.bincount(years, minlength=total_years)
+    management_fee = np.asarray(management_fee, dtype=dtype)
+
+    # Datas com movimentos: aportes, retiradas e início de cada ano
+    contribution_days = _payment_days(dates, total_years, start_year, contribution_day)
+    month_numbers = np.tile(np.arange(1, 13), total_years)
+    withdrawal_days = _payment_days(dates, total_years, start_year, withdrawal_day)[np.isin(month_numbers, withdrawal_months)]
+    year_starts = np.searchsorted(years, np.arange(total_years))
+    boundaries = np.union1d(np.union1d(contribution_days, withdrawal_days), year_starts)
+    boundaries = np.append(boundaries, total_days).tolist()
+    year_starts = set(year_starts.tolist())
+    contribution_month = dict(zip(contribution_days.tolist(), range(len(contribution_days))))
+    withdrawal_set = set(withdrawal_days.tolist())
+
+    table = YearlyResults(total_years, n_paths, dtype=dtype) if record else None
+
+    portfolio = np.full(n_paths, initial_portfolio, dtype=dtype)
+    in_withdrawal = np.zeros(n_paths, dtype=bool)
+    withdrawal_start_year = np.zeros(n_paths, dtype=np.int32)
+    current_withdrawal_net = np.full(n_paths, withdrawal_base, dtype=dtype)
+    withdrew_this_year = np.zeros(n_paths, dtype=bool)
+    total_withdrawn = np.zeros(n_paths, dtype=dtype)
+    total_contributions = np.zeros(n_paths, dtype=dtype)
+    ruined = np.zeros(n_paths, dtype=bool)
+    ruin_year = np.zeros(n_paths, dtype=np.int32)
+    # Índice do mercado (retornos efetivos compostos) e o seu máximo
+    market = np.ones(n_paths, dtype=dtype)
+    peak = np.ones(n_paths, dtype=dtype)
+    max_drawdown = np.zeros(n_paths, dtype=dtype)
+    year_market_start = np.ones(n_paths, dtype=dtype)
+
+    buffer, buffer_start = np.empty((0, n_paths), dtype=dtype), 0
+    stage = stage_timer(instrumentation)
+
+    for day, next_day in zip(boundaries[:-1], boundaries[1:]):
+        year = int(years[day]) + 1
+
+        if day in year_starts:
+            if year > 1:
+                # Fim do ano anterior: atualiza o valor fixo a retirar
+                if withdrawal_strategy == 1 and np.any(withdrawal_growth_rate):
+                    current_withdrawal_net = np.where(
+                        withdrew_this_year, current_withdrawal_net * (1 + withdrawal_growth_rate), current_withdrawal_net
+                    )
+                withdrew_this_year[:] = False
+            if table is not None:
+                table.start_balance[year - 1] = portfolio
+            year_market_start = market.copy()
+
+        # Transição para fase de retirada
+        with stage("phase_transition"):
+            switch = ~in_withdrawal & (portfolio >= target_portfolio)
+            if switch.any():
+                in_withdrawal |= switch
+                withdrawal_start_year[switch] = year
+        if table is not None and day in year_starts:
+            table.phase[year - 1] = in_withdrawal
+
+        month = contribution_month.get(day)
+        if month is not None:
+            with stage("contributions"):
+                if continue_contributions_during_withdrawal:
+                    this_contribution = contributions[month]
+                else:
+                    this_contribution = contributions[month] * ~in_withdrawal
+                portfolio += this_contribution
+                total_contributions += this_contribution
+                if table is not None:
+                    table.contribution[year - 1] += this_contribution
+
+        if day in withdrawal_set:
+            with stage("withdrawal"):
+                can_withdraw = in_withdrawal & (portfolio >= min_threshold)
+                if drawdown_limit is not None:
+                    can_withdraw &= 1 - market / peak <= drawdown_limit
+                if can_withdraw.any():
+                    if withdrawal_strategy == 1:
+                        desired_net = current_withdrawal_net / payments_per_year
+                        desired_net = np.where(portfolio >= upper_threshold, desired_net * 2, desired_net)
+                    else:  # 4% anual líquido
+                        desired_net = (0.04 * portfolio) / payments_per_year
+
+                    capital_ratio = np.ones(n_paths, dtype=dtype)
+                    positive = portfolio > 0
+                    np.minimum(
+                        1.0, total_contributions / np.where(positive, portfolio, 1.0), out=capital_ratio, where=positive
+                    )
+                    gross_withdrawal = desired_net / (1 - tax_rate_withdrawal * (1 - capital_ratio))
+
+                    gross_withdrawal = np.where(can_withdraw, gross_withdrawal, 0.0)
+                    desired_net = np.where(can_withdraw, desired_net, 0.0)
+                    portfolio -= gross_withdrawal
+                    total_withdrawn += desired_net
+                    withdrew_this_year |= can_withdraw
+                    if table is not None:
+                        table.withdrawal[year - 1] += gross_withdrawal
+                        table.net_withdrawal[year - 1] += desired_net
+
+        # Retornos até à próxima data com movimentos, em blocos
+        position = day
+        while position < next_day:
+            if position >= buffer_start + len(buffer):
+                buffer_start = position
+                with stage("returns"):
+                    buffer = returns(position, min(chunk_days, total_days - position))
+                if not len(buffer):
+                    raise ValueError(f"Faltam retornos a partir do dia {position}")
+            with stage("growth"):
+                piece = buffer[position - buffer_start:min(next_day, buffer_start + len(buffer)) - buffer_start]
+                fee = (management_fee / days_per_year[years[position:position + len(piece)]][:, None]).astype(dtype)
+                growth = np.cumprod(1 + (np.asarray(piece, dtype=dtype) - fee), axis=0)
+
+                market_path = market * growth
+                running_peak = np.maximum(peak, np.maximum.accumulate(market_path, axis=0))
+                np.maximum(max_drawdown, np.max(1 - market_path / running_peak, axis=0), out=max_drawdown)
+                peak = running_peak[-1]
+                market = market * growth[-1]
+                portfolio *= growth[-1]
+            position += len(piece)
+
+        newly_ruined = ~ruined & (portfolio <= 0)
+        if newly_ruined.any():
+            ruined |= newly_ruined
+            ruin_year[newly_ruined] = year
+
+        if next_day == total_days or next_day in year_starts:
+            if table is not None:
+                with stage("materialization"):
+                    table.growth[year - 1] = market / year_market_start - 1
+                    table.end_balance[year - 1] = portfolio
+            if instrumentation is not None:
+                instrumentation.count_phases(year - 1, in_withdrawal, ruined, total_years)
+
+    return DailyBatchResult(
+        final_balance=portfolio,
+        withdrawal_start_year=withdrawal_start_year,
+        total_withdrawn=total_withdrawn,
+        total_contributions=total_contributions,
+        ruined=ruined,
+        ruin_year=ruin_year,
+        table=table,
+        max_drawdown=max_drawdown,
+    )
@@ -0,0 +1,244 @@
+"""
+Formatação de números e tabelas no padrão português (ponto nos milhares,
+vírgula nas casas decimais), coluna a coluna.
+
+As tabelas ficam numéricas (incluindo "Crescimento (%)", com
+`growth_formatter=None`) e só são convertidas em texto ao escrever, sem
+alterar `pd.options`: as opções de formatação são argumentos de cada chamada.
+
+- `format_pt`: um array de números em texto, com operações vetorizadas;
+- `format_number_pt`: um único número (resumos, mensagens);
+- `format_frame`: DataFrame com as colunas numéricas em texto;
+- `render_table`: escreve a tabela num ficheiro ou stream, com o mesmo
+  layout de `print(df.to_string(index=False))`, por blocos de linhas.
+
+    render_table(df, suffixes={LABELS["growth"]: " %"})
+    with open("tabela.txt", "w", encoding="utf-8") as file:
+        render_table(df, file, decimals=0)
+
+Os caracteres são escritos diretamente em matrizes de códigos UTF-32 (uma
+linha por valor), por isso o custo é de algumas operações NumPy por dígito
+e não uma formatação em Python por valor.
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+THOUSANDS = "."
+DECIMAL = ","
+
+# Linhas formatadas e escritas de cada vez por `render_table`
+RENDER_CHUNK_ROWS = 65536
+
+_PT = str.maketrans({",": THOUSANDS, ".": DECIMAL})
+_POWERS_OF_TEN = 10 ** np.arange(1, 19, dtype=np.int64)
+_SPACE = ord(" ")
+
+
+def format_number_pt(value, decimals=2):
+    """Formata números para o padrão português (vírgula como decimal, ponto como milhar)"""
+    try:
+        return f"{value:,.{decimals}f}".translate(_PT)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _codes(text):
+    """Códigos UTF-32 de um texto"""
+    return np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+
+
+def _layout(values, decimals):
+    """
+    Arredondamento e comprimento do texto de cada valor.
+
+    Os valores a meio caminho entre dois arredondamentos (em que o produto
+    em float pode arredondar para o lado errado), os não finitos e os
+    demasiado grandes para int64 ficam marcados como não `exact` e são
+    formatados um a um com `format_number_pt`.
+
+    Returns:
+        (parte inteira, casas decimais como inteiro, número de dígitos da
+        parte inteira, negativo, comprimento, exact)
+    """
+    scale = 10 ** decimals
+    with np.errstate(invalid="ignore", over="ignore"):
+        magnitude = np.abs(values) * scale
+        distance = np.abs(magnitude - np.floor(magnitude) - 0.5)
+        exact = np.isfinite(magnitude) & (magnitude < 2.0**53) & (distance > magnitude * 1e-15 + 1e-9)
+        rounded = np.where(exact, np.rint(magnitude), 0.0).astype(np.int64)
+    integer, fraction = np.divmod(rounded, scale)
+    n_digits = 1 + np.searchsorted(_POWERS_OF_TEN, integer, side="right")
+    negative = np.signbit(values)
+    lengths = (decimals + 1 if decimals > 0 else 0) + n_digits + (n_digits - 1) // 3 + negative
+    for index in np.flatnonzero(~exact):
+        lengths[index] = len(format_number_pt(float(values[index]), decimals))  # "nan" e "NaN" têm 3
+    return integer, fraction, n_digits, negative, lengths, exact
+
+
+def format_pt(values, decimals=2, suffix=""):
+    """
+    Formata um array de números no padrão português.
+
+    O resultado é igual, elemento a elemento, a `format_number_pt`.
+
+    Args:
+        values: Números (qualquer forma)
+        decimals: Casas decimais
+        suffix: Texto acrescentado a cada valor (ex: " %")
+
+    Returns:
+        Array de texto com a forma de `values`
+    """
+    values = np.asarray(values, dtype=np.float64)
+    shape = values.shape
+    values = values.ravel()
+    integer, fraction, n_digits, negative, lengths, exact = _layout(values, decimals)
+    suffix_codes = _codes(suffix)
+    width = int(lengths.max(initial=1)) + len(suffix_codes)
+
+    # cada valor é escrito da direita para a esquerda a partir do seu último
+    # carácter; os não `exact` têm outro comprimento ("nan", "inf") e são
+    # escritos no fim, por isso ficam fora destas escritas
+    matrix = np.zeros((len(values), width), dtype=np.uint32)
+    flat = matrix.reshape(-1)
+    rows = np.flatnonzero(exact)
+    integer, fraction, n_digits, negative = integer[rows], fraction[rows], n_digits[rows], negative[rows]
+    row_start = rows * width
+    end = row_start + lengths[rows] - 1
+    base = decimals + 1 if decimals > 0 else 0
+
+    for position in range(decimals):
+        flat[end - position] = 48 + fraction % 10
+        fraction //= 10
+    if decimals > 0:
+        flat[end - decimals] = ord(DECIMAL)
+    for digit in range(int(n_digits.max(initial=1))):
+        selected = np.flatnonzero(n_digits > digit)
+        offset = base + digit + digit // 3
+        flat[end[selected] - offset] = 48 + integer[selected] % 10
+        integer[selected] //= 10
+        if digit % 3 == 2:
+            selected = selected[n_digits[selected] > digit + 1]
+            flat[end[selected] - offset - 1] = ord(THOUSANDS)
+    flat[row_start[negative]] = ord("-")
+    for position, code in enumerate(suffix_codes):
+        flat[end + 1 + position] = code
+
+    text = matrix.view(f"U{width}").reshape(len(values))
+    for index in np.flatnonzero(~exact):
+        text[index] = format_number_pt(float(values[index]), decimals) + suffix
+    return text.reshape(shape)
+
+
+def _aligned_pt(values, decimals, suffix, width):
+    """Matriz de códigos (valores, width) com os valores alinhados à direita"""
+    integer, fraction, n_digits, negative, lengths, exact = _layout(values, decimals)
+    suffix_codes = _codes(suffix)
+    block = np.full((len(values), width), _SPACE, dtype=np.uint32)
+    last = width - 1 - len(suffix_codes)  # coluna do último dígito
+    if len(suffix_codes):
+        block[:, last + 1:] = suffix_codes
+    base = decimals + 1 if decimals > 0 else 0
+
+    for position in range(decimals):
+        block[:, last - position] = 48 + fraction % 10
+        fraction //= 10
+    if decimals > 0:
+        block[:, last - decimals] = ord(DECIMAL)
+    for digit in range(int(n_digits.max(initial=1))):
+        column = last - base - digit - digit // 3
+        block[:, column] = np.where(n_digits > digit, 48 + integer % 10, _SPACE)
+        integer //= 10
+        if digit % 3 == 2:
+            block[:, column - 1] = np.where(n_digits > digit + 1, ord(THOUSANDS), _SPACE)
+    rows = np.flatnonzero(negative)
+    block[rows, last + 1 - lengths[rows]] = ord("-")
+
+    for index in np.flatnonzero(~exact):
+        # "NaN" como em DataFrame.to_string
+        text = "NaN" if np.isnan(values[index]) else format_number_pt(float(values[index]), decimals)
+        block[index] = _codes((text + suffix).rjust(width))
+    return block
+
+
+def format_frame(frame, decimals=2, suffixes=None):
+    """
+    Cópia de `frame` com as colunas decimais formatadas no padrão português.
+
+    Args:
+        decimals: Casas decimais
+        suffixes: Texto a acrescentar por coluna ({rótulo: " %"})
+    """
+    suffixes = suffixes or {}
+    data = {}
+    for column in frame.columns:
+        suffix = suffixes.get(column, "")
+        values = frame[column].to_numpy()
+        if pd.api.types.is_float_dtype(values.dtype):
+            data[column] = format_pt(values, decimals, suffix)
+        else:
+            data[column] = np.char.add(values.astype(str), suffix) if suffix else values
+    return pd.DataFrame(data, index=frame.index)
+
+
+def render_table(frame, file=None, decimals=2, suffixes=None, chunk_rows=RENDER_CHUNK_ROWS):
+    """
+    Escreve `frame` como `print(frame.to_string(index=False))` com os
+    números no padrão português.
+
+    A largura das colunas é calculada numa primeira passagem (só os
+    comprimentos); depois cada bloco de `chunk_rows` linhas é montado numa
+    matriz de códigos e escrito de uma vez, por isso a memória não depende
+    do número de linhas.
+
+    Args:
+        frame: DataFrame (numérico, como devolvido por `YearlyResults.to_frame`)
+        file: Ficheiro ou stream de destino (por omissão a saída padrão)
+        decimals: Casas decimais das colunas decimais
+        suffixes: Texto a acrescentar por coluna ({rótulo: " %"}); estas
+            colunas são alinhadas como texto
+        chunk_rows: Linhas formatadas e escritas de cada vez
+    """
+    file = file if file is not None else sys.stdout
+    if len(frame) == 0 or len(frame.columns) == 0:
+        file.write(frame.to_string(index=False) + "\n")
+        return
+
+    suffixes = suffixes or {}
+    columns = []
+    for column in frame.columns:
+        values = frame[column].to_numpy()
+        suffix = suffixes.get(column, "")
+        decimal = pd.api.types.is_float_dtype(values.dtype)
+        width = 0
+        for start in range(0, len(values), chunk_rows):
+            chunk = values[start:start + chunk_rows]
+            if decimal:
+                lengths = _layout(chunk.astype(np.float64), decimals)[4]
+            else:
+                lengths = np.char.str_len(chunk.astype(str))
+            width = max(width, int(lengths.max()))
+        # DataFrame.to_string reserva um espaço para o sinal no título das colunas numéricas
+        numeric = pd.api.types.is_numeric_dtype(values.dtype) and not suffix
+        header = (" " if numeric else "") + str(column)
+        columns.append((values, suffix, decimal, header, max(len(header), width + len(suffix))))
+
+    file.write(" ".join(header.rjust(width) for _, _, _, header, width in columns) + "\n")
+    line_width = sum(width for *_, width in columns) + len(columns)  # separadores e fim de linha
+    for start in range(0, len(frame), chunk_rows):
+        rows = min(chunk_rows, len(frame) - start)
+        block = np.full((rows, line_width), _SPACE, dtype=np.uint32)
+        block[:, -1] = ord("\n")
+        column_start = 0
+        for values, suffix, decimal, _, width in columns:
+            chunk = values[start:start + rows]
+            if decimal:
+                cells = _aligned_pt(chunk.astype(np.float64), decimals, suffix, width)
+            else:
+                text = np.char.rjust(np.char.add(chunk.astype(str), suffix) if suffix else chunk.astype(str), width)
+                cells = np.ascontiguousarray(text).view(np.uint32).reshape(rows, width)
+            block[:, column_start:column_start + width] = cells
+            column_start += width + 1
+        file.write(block.tobytes().decode("utf-32-le"))
@@ -0,0 +1,306 @@
+"""
+Varrimento de uma grelha de parâmetros.
+
+Cada célula da grelha é uma combinação de parâmetros de `simulation_batch`
+(target, limiares, retirada base, aporte inicial, taxa de gestão, ...). Todas
+as células usam os mesmos sorteios (a mesma semente), por isso as diferenças
+entre células vêm só dos parâmetros e não do ruído de Monte Carlo.
+
+Os parâmetros numéricos são passados aos motores como arrays por trajetória:
+várias células são empilhadas no eixo das trajetórias e avaliadas numa só
+passagem vetorizada. Os blocos de células são distribuídos por processos.
+"""
+import inspect
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from simulador import historico
+from simulador.amostragem import standard_normal_draws
+from simulador.bootstrap import bootstrap_returns
+from simulador.mensal import monthly_contribution_schedule, simulate_monthly_paths
+from simulador.modos import DAILY_MODES, MONTHLY_MODES, simulation_batch
+from simulador.vetorizado import contribution_schedule, simulate_paths
+
+# Parâmetros com um valor por trajetória dentro de uma passagem
+PER_PATH_PARAMS = (
+    "initial_portfolio",
+    "management_fee",
+    "target_portfolio",
+    "min_threshold",
+    "upper_threshold",
+    "withdrawal_base",
+    "withdrawal_growth_rate",
+    "tax_rate_withdrawal",
+    "mean_return",
+    "std_return",
+)
+
+# Parâmetros do plano de aportes (um plano por célula)
+CONTRIBUTION_PARAMS = (
+    "initial_monthly_contribution",
+    "contribution_multiplier",
+    "contribution_growth_rate",
+    "contribution_step_up_interval",
+    "contribution_step_up_amount",
+    "min_monthly_contribution",
+    "max_monthly_contribution",
+)
+
+# Padrões de `simulation_batch`; os restantes parâmetros (modo, anos,
+# estratégia, bootstrap, ...) separam as células em grupos
+DEFAULTS = {
+    name: parameter.default
+    for name, parameter in inspect.signature(simulation_batch).parameters.items()
+    if name not in ("n_paths", "seed", "rng", "record", "engine", "returns", "instrumentation")
+}
+STRUCTURAL_PARAMS = tuple(name for name in DEFAULTS if name not in PER_PATH_PARAMS + CONTRIBUTION_PARAMS)
+
+DEFAULT_MAX_PATHS_PER_PASS = 262144
+
+# Parâmetros estruturais que definem os sorteios partilhados de um grupo
+DRAW_PARAMS = ("mode", "total_years", "block_length", "bootstrap_circular", "bootstrap_stationary", "series", "sampling")
+
+
+def expand_grid(grid):
+    """
+    Lista de células de uma grelha.
+
+    Args:
+        grid: Dicionário {parâmetro: valores} (produto cartesiano) ou lista
+            explícita de dicionários
+
+    Returns:
+        Lista de dicionários, um por célula
+    """
+    if isinstance(grid, dict):
+        names = list(grid)
+        return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+    return [dict(cell) for cell in grid]
+
+
+def _shared_draws(structural, n_paths, seed):
+    """
+    Sorteios comuns a todas as células de um grupo.
+
+    No modo 1 são normais padrão (o retorno de cada célula é
+    `mean_return + std_return * z`, igual ao de `simulation_batch` com a mesma
+    semente e a mesma amostragem); nos restantes modos são os próprios retornos
+    (nos modos 2 e 3, iguais em todas as trajetórias, uma só coluna).
+    """
+    mode, total_years, block_length, circular, stationary, series, sampling = (
+        structural[name] for name in DRAW_PARAMS
+    )
+    rng = np.random.default_rng(seed)
+    if mode == 1:
+        return standard_normal_draws(sampling, total_years, n_paths, rng)
+    if mode == 2:
+        annual = historico.annual_returns(series)
+        return annual[np.arange(total_years) % len(annual)][:, None]
+    if mode == 3:
+        return historico.mode3_monthly_returns(total_years * 12, series)[:, None]
+    if mode == 4:
+        return bootstrap_returns(
+            historico.annual_returns(series), total_years, n_paths, block_length or 5, rng=rng,
+            circular=circular, stationary=stationary
+        )
+    if mode == 5:
+        return bootstrap_returns(
+            historico.monthly_returns(series), total_years * 12, n_paths, block_length or 12, rng=rng,
+            circular=circular, stationary=stationary
+        )
+    raise ValueError(f"Modo {mode} não suportado")
+
+
+def _with_draws(tasks, draws=None):
+    """
+    Tarefas de `plan_passes` com os sorteios do grupo no lugar da semente.
+
+    Os sorteios de cada grupo são calculados uma vez e partilhados pelas
+    tarefas desse grupo; só ficam em memória enquanto o gerador existir
+    (uma chamada de `sweep` ou `simulate_variants`), ou enquanto existir o
+    dicionário `draws`, se indicado (para reutilizar entre chamadas).
+    """
+    draws = {} if draws is None else draws
+    for structural, cells, n_paths, seed in tasks:
+        key = (n_paths, seed, *(structural[name] for name in DRAW_PARAMS))
+        if key not in draws:
+            draws[key] = _shared_draws(structural, n_paths, seed)
+        yield structural, cells, n_paths, draws[key]
+
+
+def _simulate_cells(structural, cells, n_paths, draws):
+    """
+    Simula um bloco de células do mesmo grupo numa só passagem.
+
+    Args:
+        draws: Sorteios do grupo (ver `_with_draws`)
+
+    Returns:
+        BatchResult com `len(cells) * n_paths` trajetórias, célula a célula
+        (as trajetórias `i`, `n_paths + i`, ... usam os mesmos sorteios)
+    """
+    n_cells = len(cells)
+    mode = structural["mode"]
+    total_years = structural["total_years"]
+
+    draws = np.broadcast_to(draws, (len(draws), n_paths))
+    per_path = {name: np.repeat([cell[name] for cell in cells], n_paths) for name in PER_PATH_PARAMS}
+    if mode == 1:
+        returns = per_path.pop("mean_return") + per_path.pop("std_return") * np.tile(draws, n_cells)
+    else:
+        del per_path["mean_return"], per_path["std_return"]
+        returns = np.tile(draws, n_cells)
+    returns = returns.astype(structural["dtype"], copy=False)
+
+    if mode in MONTHLY_MODES:
+        schedules = [
+            monthly_contribution_schedule(
+                total_years,
+                cell["initial_monthly_contribution"],
+                contribution_growth_rate=cell["contribution_growth_rate"],
+                contribution_step_up_interval=cell["contribution_step_up_interval"],
+                contribution_step_up_amount=cell["contribution_step_up_amount"],
+                min_monthly_contribution=cell["min_monthly_contribution"],
+                max_monthly_contribution=cell["max_monthly_contribution"],
+            )
+            for cell in cells
+        ]
+        simulate, extra = simulate_monthly_paths, dict(monthly_rules=structural["monthly_rules"])
+    else:
+        schedules = [
+            contribution_schedule(
+                total_years,
+                cell["initial_monthly_contribution"],
+                contribution_multiplier=cell["contribution_multiplier"],
+                contribution_growth_rate=cell["contribution_growth_rate"],
+                contribution_step_interval=cell["contribution_step_up_interval"],
+                contribution_step_amount=cell["contribution_step_up_amount"],
+                min_monthly_contribution=cell["min_monthly_contribution"],
+                max_monthly_contribution=cell["max_monthly_contribution"],
+            )
+            for cell in cells
+        ]
+        simulate, extra = simulate_paths, dict(
+            negative_years_cap=structural["negative_years_cap"],
+            threshold_before_contribution=structural["threshold_before_contribution"],
+        )
+    contributions = np.repeat(np.column_stack(schedules), n_paths, axis=1)
+
+    return simulate(
+        returns,
+        contributions,
+        n_paths=n_cells * n_paths,
+        continue_contributions_during_withdrawal=structural["continue_contributions_during_withdrawal"],
+        withdrawal_strategy=structural["withdrawal_strategy"],
+        dtype=structural["dtype"],
+        **per_path,
+        **extra
+    )
+
+
+def _run_chunk(task):
+    """Avalia um bloco de células do mesmo grupo numa só passagem"""
+    structural, cells, n_paths, draws = task
+    result = _simulate_cells(structural, cells, n_paths, draws)
+    shape = (len(cells), n_paths)
+    reached = result.reached_target.reshape(shape)
+    ruined = result.ruined.reshape(shape)
+    return {
+        "Atinge o target (%)": reached.mean(axis=1) * 100,
+        "Ruína (%)": ruined.mean(axis=1) * 100,
+        "Sucesso (%)": (reached & ~ruined).mean(axis=1) * 100,
+        "Saldo final mediano (€)": np.median(result.final_balance.reshape(shape), axis=1),
+        "Retirado líquido mediano (€)": np.median(result.total_withdrawn.reshape(shape), axis=1),
+    }
+
+
+def plan_passes(cells, n_paths, seed, max_paths_per_pass=DEFAULT_MAX_PATHS_PER_PASS, **params):
+    """
+    Agrupa as células pelos parâmetros estruturais e divide-as em passagens.
+
+    Args:
+        cells: Lista de dicionários (ver `expand_grid`)
+        n_paths, seed, max_paths_per_pass: Ver `sweep`
+        **params: Valores fixos dos restantes parâmetros
+
+    Returns:
+        (tarefas (estruturais, células completas, n_paths, seed), índices
+        das células pela ordem das tarefas)
+    """
+    unknown = {name for cell in cells for name in cell} | set(params)
+    unknown -= set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Parâmetros desconhecidos: {', '.join(sorted(unknown))}")
+
+    base = {**DEFAULTS, **params}
+    full_cells = [{**base, **cell} for cell in cells]
+    if any(cell["mode"] in DAILY_MODES for cell in full_cells):
+        raise ValueError("Os modos diários não são suportados na grelha (use simulation_batch por célula)")
+
+    groups = {}
+    for index, cell in enumerate(full_cells):
+        key = tuple(cell[name] for name in STRUCTURAL_PARAMS)
+        groups.setdefault(key, []).append(index)
+
+    cells_per_pass = max(1, max_paths_per_pass // n_paths)
+    tasks, order = [], []
+    for key, indices in groups.items():
+        structural = dict(zip(STRUCTURAL_PARAMS, key))
+        for start in range(0, len(indices), cells_per_pass):
+            chunk = indices[start:start + cells_per_pass]
+            tasks.append((structural, [full_cells[index] for index in chunk], n_paths, seed))
+            order.extend(chunk)
+    return tasks, order
+
+
+def sweep(
+    grid,
+    n_paths=10000,
+    seed=None,
+    workers=None,
+    max_paths_per_pass=DEFAULT_MAX_PATHS_PER_PASS,
+    **params
+):
+    """
+    Corre todas as células de uma grelha com os mesmos sorteios.
+
+    Args:
+        grid: Dicionário {parâmetro: valores} (produto cartesiano) ou lista
+            explícita de dicionários (ver `expand_grid`)
+        n_paths: Trajetórias por célula
+        seed: Semente dos sorteios partilhados (gerada se omitida)
+        workers: Número de processos (None = todos os núcleos, 1 = sem pool)
+        max_paths_per_pass: Limite de células × trajetórias por passagem
+            (define o pico de memória de cada processo)
+        **params: Valores fixos dos restantes parâmetros de `simulation_batch`
+
+    Returns:
+        DataFrame com uma linha por célula: os parâmetros da grelha, a
+        probabilidade de atingir o target, de ruína e de sucesso, o saldo final
+        mediano e o total retirado (líquido) mediano
+    """
+    cells = expand_grid(grid)
+    names = list(dict.fromkeys(name for cell in cells for name in cell))
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    workers = workers or os.cpu_count() or 1
+    tasks, order = plan_passes(cells, n_paths, seed, max_paths_per_pass, **params)
+
+    if workers == 1 or len(tasks) == 1:
+        outputs = [_run_chunk(task) for task in _with_draws(tasks)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            outputs = list(executor.map(_run_chunk, _with_draws(tasks)))
+
+    metrics = {name: np.empty(len(cells)) for name in outputs[0]} if outputs else {}
+    for name, values in metrics.items():
+        values[order] = np.concatenate([output[name] for output in outputs])
+
+    table = pd.DataFrame({name: [cell.get(name) for cell in cells] for name in names})
+    for name, values in metrics.items():
+        table[name] = values
+    return table
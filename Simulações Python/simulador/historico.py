@@ -0,0 +1,72 @@
+"""
+Séries históricas usadas nos modos 2 a 5 e 7.
+
+Os retornos vêm do registo de séries (`simulador.registo`), em ficheiros
+`.npy` mapeados em memória: são lidos uma vez por processo e devolvidos
+como arrays só de leitura, sem cópias. `series` é o nome base no registo:
+os retornos anuais, mensais e diários são `<series>_annual`,
+`<series>_monthly` e `<series>_daily` (o formato criado por
+`simulador.ingestao.ingest_prices`; o S&P500 incluído não tem série diária).
+"""
+import functools
+
+import numpy as np
+
+from simulador.registo import load_series, series_info
+
+SP500 = "sp500"
+SP500_ANNUAL = "sp500_annual"
+SP500_MONTHLY = "sp500_monthly"
+
+SP500_FIRST_YEAR = 1969
+SP500_MONTHLY_FIRST_YEAR = 1985
+
+
+def annual_returns(series=SP500):
+    """Retornos anuais como frações (0.07 = 7%), só de leitura"""
+    return load_series(f"{series}_annual")
+
+
+def monthly_returns(series=SP500):
+    """Retornos mensais como frações, só de leitura"""
+    return load_series(f"{series}_monthly")
+
+
+def daily_returns(series=SP500):
+    """Retornos diários como frações, só de leitura (ver `ingest_prices`)"""
+    return load_series(f"{series}_daily")
+
+
+@functools.lru_cache(maxsize=8)
+def mode3_monthly_returns(total_months, series=SP500):
+    """
+    Série mensal usada pelo modo 3: os dados mensais reais e, depois de
+    esgotados, os anos seguintes da série anual (ciclicamente).
+
+    Os meses desses anos vêm dos dados mensais reais sempre que existem para
+    o mesmo ano civil; só os anos sem dados mensais usam o retorno anual
+    convertido para mensal (`(1 + r) ** (1 / 12) - 1`).
+
+    O resultado fica em cache e é só de leitura.
+    """
+    monthly = monthly_returns(series)
+    annual = annual_returns(series)
+    head = min(total_months, len(monthly))
+    months = np.arange(head, total_months)
+    years = (months // 12) % len(annual)
+
+    # Posição de cada mês na série mensal, pelo ano civil
+    annual_start = np.datetime64(series_info(f"{series}_annual").start, "Y")
+    monthly_start = np.datetime64(series_info(f"{series}_monthly").start, "M")
+    calendar_month = (annual_start + years).astype("datetime64[M]") + months % 12
+    index = (calendar_month - monthly_start).astype(np.int64)
+    real = (index >= 0) & (index < len(monthly))
+
+    fallback = np.where(
+        real,
+        monthly[np.clip(index, 0, len(monthly) - 1)],
+        (1 + annual[years]) ** (1 / 12) - 1,
+    )
+    returns = np.concatenate((monthly[:head], fallback))
+    returns.setflags(write=False)
+    return returns
@@ -0,0 +1,252 @@
+"""
+Importação de históricos de preços (CSV) para o registo de séries.
+
+O CSV é lido em blocos (`pd.read_csv(..., chunksize=...)`), por isso décadas
+de preços diários de muitos tickers não precisam de caber em memória. De
+cada bloco saem, de forma vetorizada:
+
+- os retornos diários (`preço / preço anterior - 1`);
+- os retornos mensais e anuais, compostos a partir dos diários com
+  `np.multiply.reduceat` sobre os fatores `1 + r` de cada período.
+
+O período ainda em aberto no fim de um bloco (o mês e o ano correntes) passa
+para o bloco seguinte. As três séries ficam no registo como
+`<nome>_daily`, `<nome>_monthly` e `<nome>_annual`; o primeiro mês e o
+primeiro ano são parciais (contam a partir do primeiro preço) e o último
+também, até chegarem mais dados. Meses ou anos sem nenhuma cotação entram
+com retorno 0.
+
+O estado de cada série (último preço, períodos em aberto) e a posição já
+lida de cada ficheiro ficam em `ingestao.json`, no diretório do registo.
+Voltar a importar um ficheiro a que foram acrescentadas linhas lê apenas as
+linhas novas; as datas já importadas são sempre ignoradas. Cada importação
+regista uma nova versão das séries alteradas e apaga as anteriores
+(`keep_versions`), para o registo não crescer a cada atualização.
+"""
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from simulador.registo import default_registry, write_atomic
+
+STATE_FILE = "ingestao.json"
+DEFAULT_CHUNKSIZE = 100_000
+
+# Frequência da série -> unidade das chaves de período
+PERIODS = {"monthly": "M", "annual": "Y"}
+
+
+class _ReturnsBuilder:
+    """Retornos diários, mensais e anuais de um ticker, bloco a bloco"""
+
+    def __init__(self, state=None, values=None):
+        state = state or {}
+        self.last_date = np.datetime64(state["last_date"]) if state.get("last_date") else None
+        self.last_price = state.get("last_price")
+        self.start = dict(state.get("start", {}))
+        # Período em aberto: [chave, fator acumulado]
+        self.open = {frequency: state.get("open", {}).get(frequency) for frequency in PERIODS}
+        self.values = {frequency: [] for frequency in ("daily", *PERIODS)}
+        for frequency, array in (values or {}).items():
+            self.values[frequency].append(np.asarray(array, dtype=float))
+
+    def feed(self, dates, prices):
+        """Acrescenta um bloco de cotações (datas crescentes)"""
+        if self.last_date is not None:
+            new = dates > self.last_date
+            dates, prices = dates[new], prices[new]
+        if not len(dates):
+            return
+        if np.any(np.diff(dates) <= np.timedelta64(0, "D")):
+            raise ValueError("As datas de cada ticker têm de estar em ordem crescente e sem repetições")
+        if not np.all(np.isfinite(prices) & (prices > 0)):
+            raise ValueError("Os preços têm de ser números positivos")
+
+        growth = np.empty(len(prices))
+        growth[1:] = prices[1:] / prices[:-1]
+        if self.last_price is None:
+            growth[0] = 1.0  # primeiro preço: base dos primeiros períodos
+            if len(dates) > 1:
+                self.start["daily"] = str(dates[1])
+                self.values["daily"].append(growth[1:] - 1)
+        else:
+            growth[0] = prices[0] / self.last_price
+            self.start.setdefault("daily", str(dates[0]))
+            self.values["daily"].append(growth - 1)
+
+        for frequency, unit in PERIODS.items():
+            self._compound(frequency, dates.astype(f"datetime64[{unit}]").astype(np.int64), growth)
+        self.last_date, self.last_price = dates[-1], float(prices[-1])
+
+    def _compound(self, frequency, keys, growth):
+        """Compõe os fatores por período; o último fica em aberto"""
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        products = np.multiply.reduceat(growth, starts)
+        period_keys = keys[starts]
+
+        open_period = self.open[frequency]
+        if open_period is None:
+            unit = PERIODS[frequency]
+            self.start[frequency] = str(np.datetime64(int(period_keys[0]), unit).astype("datetime64[D]"))
+            done_keys, done = period_keys[:-1], products[:-1] - 1
+        elif open_period[0] == period_keys[0]:
+            products[0] *= open_period[1]
+            done_keys, done = period_keys[:-1], products[:-1] - 1
+        else:
+            done_keys = np.r_[open_period[0], period_keys[:-1]]
+            done = np.r_[open_period[1] - 1, products[:-1] - 1]
+
+        if len(done_keys):
+            # Períodos sem cotações ficam com retorno 0
+            block = np.zeros(int(period_keys[-1] - done_keys[0]))
+            block[done_keys - done_keys[0]] = done
+            self.values[frequency].append(block)
+        self.open[frequency] = [int(period_keys[-1]), float(products[-1])]
+
+    def series(self):
+        """Séries completas (com os períodos em aberto no fim)"""
+        series = {}
+        for frequency, arrays in self.values.items():
+            if frequency in PERIODS and self.open[frequency] is not None:
+                arrays = arrays + [np.array([self.open[frequency][1] - 1])]
+            series[frequency] = np.concatenate(arrays) if arrays else np.empty(0)
+        return series
+
+    def state(self):
+        return {
+            "last_date": None if self.last_date is None else str(self.last_date),
+            "last_price": self.last_price,
+            "start": self.start,
+            "open": self.open,
+        }
+
+
+def _read_state(registry):
+    path = os.path.join(registry.directory, STATE_FILE)
+    if not os.path.exists(path):
+        return {"files": {}, "series": {}}
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _write_state(registry, state):
+    write_atomic(
+        os.path.join(registry.directory, STATE_FILE),
+        lambda file: file.write((json.dumps(state, indent=2, ensure_ascii=False) + "\n").encode("utf-8")),
+    )
+
+
+def _resume(registry, name, state):
+    """Construtor retomado a partir das séries já registadas"""
+    names = registry.names()
+    values = {}
+    if f"{name}_daily" in names:  # só existe a partir do segundo preço
+        values["daily"] = registry.load(f"{name}_daily")
+    for frequency in PERIODS:
+        values[frequency] = registry.load(f"{name}_{frequency}")[:-1]  # sem o período em aberto
+    return _ReturnsBuilder(state, values)
+
+
+def _chunks(path, columns, chunksize, offset):
+    """Blocos do CSV; com `offset` lê só a partir dessa posição (linhas novas)"""
+    if not offset:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunksize)
+        return
+    with open(path, "rb") as file:
+        names = pd.read_csv(file, nrows=0).columns
+        file.seek(offset)
+        yield from pd.read_csv(file, header=None, names=names, usecols=columns, chunksize=chunksize)
+
+
+def _series_name(name, ticker):
+    return f"{name}_{re.sub(r'[^0-9a-zA-Z]+', '_', str(ticker)).strip('_').lower()}"
+
+
+def ingest_prices(
+    path,
+    name,
+    date_column="Date",
+    price_column="Adj Close",
+    ticker_column=None,
+    currency="USD",
+    description="",
+    chunksize=DEFAULT_CHUNKSIZE,
+    rebuild=False,
+    registry=None,
+    keep_versions=1,
+):
+    """
+    Importa (ou atualiza) séries de retornos a partir de um CSV de preços.
+
+    Use preços ajustados (dividendos reinvestidos) para obter retornos
+    totais.
+
+    Args:
+        path: Ficheiro CSV
+        name: Nome da série no registo; com `ticker_column` é o prefixo
+            (`<nome>_<ticker>`)
+        date_column: Coluna das datas
+        price_column: Coluna dos preços
+        ticker_column: Coluna do ticker, para ficheiros com vários tickers
+        currency: Moeda dos preços
+        description: Descrição guardada nos metadados
+        chunksize: Linhas lidas de cada vez
+        rebuild: Ignorar o estado guardado e importar tudo de novo
+        registry: ReturnRegistry (por omissão o do utilizador, ver `default_registry`)
+        keep_versions: Versões de cada série a manter no registo (as mais
+            antigas são apagadas; None = manter todas)
+
+    Returns:
+        Dicionário {nome da série no registo: SeriesInfo} das séries criadas
+    """
+    registry = registry or default_registry()
+    os.makedirs(registry.directory, exist_ok=True)
+    state = _read_state(registry)
+    source = os.path.abspath(path)
+    offset = None if rebuild else state["files"].get(source)
+    size = os.path.getsize(path)
+    if offset is not None and offset > size:
+        offset = None  # o ficheiro foi reescrito: as datas repetidas são ignoradas
+
+    builders = {}
+
+    def builder_for(series_name):
+        if series_name not in builders:
+            saved = None if rebuild else state["series"].get(series_name)
+            builders[series_name] = _resume(registry, series_name, saved) if saved else _ReturnsBuilder()
+        return builders[series_name]
+
+    columns = [date_column, price_column] + ([ticker_column] if ticker_column else [])
+    for chunk in _chunks(path, columns, chunksize, offset):
+        dates = pd.to_datetime(chunk[date_column]).to_numpy().astype("datetime64[D]")
+        prices = chunk[price_column].to_numpy(dtype=float)
+        if ticker_column is None:
+            builder_for(name).feed(dates, prices)
+            continue
+        tickers = chunk[ticker_column].to_numpy()
+        for ticker in pd.unique(tickers):
+            rows = tickers == ticker
+            builder_for(_series_name(name, ticker)).feed(dates[rows], prices[rows])
+
+    created = {}
+    for series_name, builder in builders.items():
+        for frequency, values in builder.series().items():
+            if len(values):
+                created[f"{series_name}_{frequency}"] = registry.register(
+                    f"{series_name}_{frequency}", values, frequency, builder.start[frequency], currency,
+                    description or f"Retornos {frequency} de {os.path.basename(path)}",
+                )
+                if keep_versions is not None:
+                    registry.prune(f"{series_name}_{frequency}", keep_versions)
+        state["series"][series_name] = builder.state()
+
+    # A posição só é guardada se o ficheiro acaba numa linha completa
+    with open(path, "rb") as file:
+        file.seek(max(size - 1, 0))
+        complete = file.read(1) == b"\n"
+    state["files"][source] = size if complete else None
+    _write_state(registry, state)
+    return created
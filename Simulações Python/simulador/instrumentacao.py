@@ -0,0 +1,202 @@
+"""
+Instrumentação opcional dos motores.
+
+Um `Instrumentation` passado a `simulation_batch` (ou diretamente aos
+motores) regista:
+
+- o tempo de cada etapa: geração dos retornos ("returns"), plano e
+  aplicação dos aportes ("contributions"), transição de fase
+  ("phase_transition"), retiradas com o cálculo do bruto e do imposto
+  ("withdrawal"), aplicação dos retornos ("growth"), escrita da tabela e
+  do resultado ("materialization") e formatação ("formatting");
+- o número de trajetórias em acumulação, em retirada e arruinadas no fim de
+  cada ano (somado entre blocos, por isso serve também para
+  `chunked_batch` e `stream_simulation`);
+- com `trace_memory=True`, o pico de memória alocada em cada etapa e no
+  total (`tracemalloc`).
+
+Sem instrumentação os motores usam um contexto vazio partilhado, por isso o
+custo é uma chamada de função por etapa e por período. O núcleo Numba só
+regista a etapa "kernel" (sem contagens por ano).
+
+Os dados saem como dicionário (`to_dict`) ou JSON (`to_json`). Para um
+perfil completo com `cProfile` use `profiled` ou a linha de comandos
+(`simulador.perfil`):
+
+    python -m simulador.perfil --mode 4 --paths 100000 --json perfil.json
+    python -m simulador.perfil --mode 1 --profile
+"""
+import contextlib
+import cProfile
+import json
+import pstats
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+_NO_STAGE = contextlib.nullcontext()
+
+
+def _no_stage(name):
+    return _NO_STAGE
+
+
+def stage_timer(instrumentation):
+    """Função `stage(nome)` de `instrumentation`, ou uma que não mede nada"""
+    return instrumentation.stage if instrumentation is not None else _no_stage
+
+
+class Instrumentation:
+    """
+    Registo de tempos, contagens por fase e memória de uma ou mais simulações.
+
+    Args:
+        trace_memory: Medir os picos de memória com `tracemalloc` (mais lento)
+
+    Pode ser usado como contexto (`with Instrumentation(...) as probe:`),
+    que termina o `tracemalloc` à saída.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.paths = 0
+        self._phases = None
+        self._own_tracing = False
+        self._peak = 0
+        self._start = time.perf_counter()
+        self._elapsed = None
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._own_tracing = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Fecha o registo (para o relógio total e o `tracemalloc` próprio)"""
+        if self._elapsed is None:
+            self._elapsed = time.perf_counter() - self._start
+            if self.trace_memory and tracemalloc.is_tracing():
+                self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+            if self._own_tracing:
+                tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Contexto que acumula o tempo (e o pico de memória) da etapa `name`"""
+        entry = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0, "peak_bytes": 0})
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry["seconds"] += time.perf_counter() - start
+            entry["calls"] += 1
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1]
+                self._peak = max(self._peak, peak)
+                entry["peak_bytes"] = max(entry["peak_bytes"], peak - before)
+
+    def timed(self, name, iterable):
+        """Percorre `iterable` contando o tempo de cada elemento na etapa `name`"""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def count_phases(self, year_index, in_withdrawal, ruined, total_years):
+        """
+        Soma as trajetórias em cada fase no fim de um ano.
+
+        Args:
+            year_index: Ano (a partir de 0)
+            in_withdrawal, ruined: Máscaras (trajetórias,)
+            total_years: Número de anos simulados
+        """
+        if self._phases is None or len(self._phases) < total_years:
+            phases = np.zeros((total_years, 3), dtype=np.int64)
+            if self._phases is not None:
+                phases[:len(self._phases)] = self._phases
+            self._phases = phases
+        withdrawing = int(np.count_nonzero(in_withdrawal))
+        self._phases[year_index] += (len(in_withdrawal) - withdrawing, withdrawing, int(np.count_nonzero(ruined)))
+        if year_index == 0:
+            self.paths += len(in_withdrawal)
+
+    def to_dict(self):
+        """
+        Dados registados.
+
+        Returns:
+            Dicionário com `stages` ({etapa: seconds, calls, peak_bytes}),
+            `stage_seconds` (soma das etapas), `elapsed_seconds` (desde a
+            criação), `paths`, `phases` (listas por ano: accumulation,
+            withdrawal, ruined) e `peak_memory_bytes` (None sem
+            `trace_memory`)
+        """
+        elapsed = self._elapsed if self._elapsed is not None else time.perf_counter() - self._start
+        peak = self._peak
+        if self.trace_memory and self._elapsed is None and tracemalloc.is_tracing():
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+        phases = None
+        if self._phases is not None:
+            phases = {
+                "year": list(range(1, len(self._phases) + 1)),
+                "accumulation": self._phases[:, 0].tolist(),
+                "withdrawal": self._phases[:, 1].tolist(),
+                "ruined": self._phases[:, 2].tolist(),
+            }
+        return {
+            "stages": {name: dict(entry) for name, entry in self.stages.items()},
+            "stage_seconds": sum(entry["seconds"] for entry in self.stages.values()),
+            "elapsed_seconds": elapsed,
+            "paths": self.paths,
+            "phases": phases,
+            "peak_memory_bytes": peak if self.trace_memory else None,
+        }
+
+    def to_json(self, path=None, indent=2):
+        """JSON de `to_dict`; com `path` escreve também no ficheiro"""
+        text = json.dumps(self.to_dict(), indent=indent)
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(text + "\n")
+        return text
+
+
+def profiled(function, *args, output=None, sort="cumulative", limit=25, stream=None, **kwargs):
+    """
+    Chama `function(*args, **kwargs)` dentro do `cProfile`.
+
+    Args:
+        output: Ficheiro `.prof` onde guardar as estatísticas (para snakeviz,
+            `pstats`, ...)
+        sort, limit: Ordenação e número de linhas do resumo
+        stream: Onde escrever o resumo (por omissão stderr; None com
+            `output` = não escrever)
+
+    Returns:
+        O resultado de `function`
+    """
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(function, *args, **kwargs)
+    finally:
+        if output is not None:
+            profile.dump_stats(output)
+        if stream is not None or output is None:
+            pstats.Stats(profile, stream=stream or sys.stderr).sort_stats(sort).print_stats(limit)
@@ -0,0 +1,353 @@
+"""
+Execução em lote de cenários: um conjunto de parâmetros por linha de um
+ficheiro JSONL ou CSV (por exemplo, um perfil de cliente por linha).
+
+Os nomes e unidades são os da linha de comandos (`simulador.comandos`): as
+taxas vêm em percentagem e as chaves em falta ficam com os valores por
+omissão de `simulation_batch`. Cada linha pode ter ainda `scenario` (nome da
+partição; por omissão o número da linha), `paths` e `seed`.
+
+O ficheiro é lido linha a linha e os cenários são distribuídos por um
+conjunto de processos com um número limitado de tarefas pendentes. Cada
+processo grava a tabela anual do seu cenário numa partição própria e o
+processo principal acrescenta a linha de resumo ao ficheiro de resumo, por
+isso a memória não cresce com o número de cenários:
+
+    resultados/yearly/scenario=<nome>/part-<linha>.csv   (ou .parquet)
+    resultados/summary.csv                                (ou summary.parquet)
+
+O ficheiro de cada partição tem o número da linha do cenário, por isso
+nomes repetidos (ou que ficam iguais depois de limpos para o nome da
+pasta) não se sobrepõem: ficam na mesma partição, em ficheiros distintos,
+e a coluna `line` do resumo indica a linha de cada um.
+
+Com `paths = 1` a tabela anual é a de uma trajetória (como no questionário);
+com mais trajetórias é a tabela de `StreamingSummary` (medianas, médias,
+bandas, ruína) e as trajetórias nunca ficam todas em memória.
+
+    python -m simulador.lotes clientes.jsonl --output resultados --paths 10000 --workers 4
+    python -m simulador.lotes clientes.csv --output resultados --format parquet --seed 1
+
+O Parquet precisa do `pyarrow` (opcional); sem ele use `--format csv`.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from simulador.agregacao import stream_simulation
+from simulador.comandos import EXIT_FAILURE, EXIT_OK, EXIT_USAGE, PARAMETERS, ConfigError, scenario_params
+from simulador.memoria import parse_memory
+from simulador.modos import DAILY_MODES, single_path
+from simulador.registo import write_atomic
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    PARQUET_AVAILABLE = True
+except ImportError:
+    pa = pq = None
+    PARQUET_AVAILABLE = False
+
+FORMATS = ("csv", "parquet")
+
+# Chaves de um cenário além dos parâmetros da simulação
+SCENARIO_KEYS = ("scenario", "paths", "seed")
+
+QUANTILES = (5, 25, 50, 75, 95)
+
+SUMMARY_COLUMNS = (
+    "scenario", "line", "paths", "seed",
+    "target_probability", "ruin_probability", "median_withdrawal_start_year", "mean_total_withdrawn",
+) + tuple(f"final_balance_p{p}" for p in QUANTILES) + ("error",)
+
+# Linhas de resumo por grupo de linhas do Parquet (o que fica em memória)
+SUMMARY_ROW_GROUP = 1024
+
+
+def read_scenarios(path):
+    """
+    Lê os cenários um a um, sem carregar o ficheiro.
+
+    Args:
+        path: Ficheiro `.csv` (cabeçalho com os nomes dos parâmetros) ou
+            JSONL (um objeto por linha; linhas vazias e `#` são ignoradas)
+
+    Yields:
+        (número da linha, cenário): dicionário no CSV, texto no JSONL (é
+        interpretado em `run_scenario`, para que uma linha inválida falhe
+        sozinha)
+    """
+    with open(path, encoding="utf-8", newline="") as file:
+        if path.lower().endswith(".csv"):
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for number, line in enumerate(file, 1):
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    yield number, line
+
+
+def _scenario_seed(seed, line):
+    """Semente de um cenário derivada da semente do lote e da linha"""
+    if seed is None:
+        return None
+    return int(np.random.SeedSequence([seed, line]).generate_state(1)[0])
+
+
+def _partition_name(value):
+    return re.sub(r"[^\w.-]", "_", str(value)) or "_"
+
+
+def _write_frame(frame, path, fmt):
+    """Grava um DataFrame (CSV ou Parquet) de forma atómica"""
+    if fmt == "parquet":
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        write_atomic(path, lambda file: pq.write_table(table, file))
+    else:
+        buffer = io.StringIO()
+        frame.to_csv(buffer, index=False)
+        write_atomic(path, lambda file: file.write(buffer.getvalue().encode("utf-8")))
+
+
+def run_scenario(task):
+    """
+    Corre um cenário e grava a sua tabela anual.
+
+    Args:
+        task: (linha, cenário, diretório de saída, formato, trajetórias e
+            semente por omissão, max_memory)
+
+    Returns:
+        Linha de resumo (dicionário com `SUMMARY_COLUMNS`); erros no cenário
+        ficam na coluna `error`
+    """
+    line, raw, directory, fmt, default_paths, default_seed, max_memory = task
+    row = dict.fromkeys(SUMMARY_COLUMNS)
+    row.update(scenario=str(line), line=line)
+    try:
+        record = json.loads(raw) if isinstance(raw, str) else raw
+        if not isinstance(record, dict):
+            raise ConfigError("cada linha tem de ser um objeto")
+        unknown = sorted(set(record) - {name for name, *_ in PARAMETERS} - set(SCENARIO_KEYS))
+        if unknown:
+            raise ConfigError(f"parâmetros desconhecidos: {', '.join(unknown)}")
+        params = scenario_params(record)
+        scenario = _partition_name(record.get("scenario") or line)
+        paths = int(record.get("paths") or default_paths)
+        seed = record.get("seed")
+        seed = int(seed) if seed not in (None, "") else _scenario_seed(default_seed, line)
+        row.update(scenario=scenario, paths=paths, seed=seed)
+
+        if paths == 1 and params.get("mode", 1) not in DAILY_MODES:
+            table, withdrawal_start_year, total_withdrawn = single_path(seed=seed, growth_formatter=None, **params)
+            frame = table.to_frame()
+            final_balance = float(table.end_balance[-1])
+            row.update(
+                target_probability=float(withdrawal_start_year is not None),
+                ruin_probability=float((table.end_balance <= 0).any()),
+                median_withdrawal_start_year=withdrawal_start_year,
+                mean_total_withdrawn=total_withdrawn,
+                **{f"final_balance_p{p}": final_balance for p in QUANTILES},
+            )
+        else:
+            summary = stream_simulation(paths, seed=seed, max_memory=max_memory, **params)
+            summary.growth_formatter = None
+            frame = summary.summary()
+            starts = summary.withdrawal_start_distribution().to_numpy()
+            reached = np.cumsum(starts[1:])
+            row.update(
+                target_probability=float(1 - starts[0]),
+                ruin_probability=float(summary.ruin_probability()),
+                median_withdrawal_start_year=(
+                    float(np.searchsorted(reached, reached[-1] / 2) + 1) if reached[-1] > 0 else None
+                ),
+                mean_total_withdrawn=float(frame[summary.labels["net_withdrawal"]].sum()),
+                **{f"final_balance_p{p}": float(frame[f"Saldo final P{p} (€)"].iloc[-1]) for p in QUANTILES},
+            )
+
+        partition = os.path.join(directory, "yearly", f"scenario={scenario}")
+        os.makedirs(partition, exist_ok=True)
+        _write_frame(frame, os.path.join(partition, f"part-{line}.{fmt}"), fmt)
+    except Exception as error:  # um cenário inválido não interrompe o lote
+        row["error"] = f"{type(error).__name__}: {error}"
+    return row
+
+
+class SummaryWriter:
+    """
+    Ficheiro de resumo escrito à medida que os cenários terminam.
+
+    No CSV cada linha é escrita logo; no Parquet as linhas são agrupadas em
+    grupos de `SUMMARY_ROW_GROUP`.
+    """
+
+    def __init__(self, directory, fmt="csv"):
+        self.path = os.path.join(directory, f"summary.{fmt}")
+        self.fmt = fmt
+        self._rows = []
+        if fmt == "parquet":
+            self._schema = pa.schema(
+                [("scenario", pa.string()), ("line", pa.int64()), ("paths", pa.int64()), ("seed", pa.int64())]
+                + [(column, pa.float64()) for column in SUMMARY_COLUMNS[4:-1]]
+                + [("error", pa.string())]
+            )
+            self._writer = pq.ParquetWriter(self.path, self._schema)
+        else:
+            self._file = open(self.path, "w", encoding="utf-8", newline="")
+            self._writer = csv.DictWriter(self._file, fieldnames=SUMMARY_COLUMNS)
+            self._writer.writeheader()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, row):
+        if self.fmt == "parquet":
+            self._rows.append(row)
+            if len(self._rows) >= SUMMARY_ROW_GROUP:
+                self._flush()
+        else:
+            self._writer.writerow(row)
+            self._file.flush()
+
+    def _flush(self):
+        if self._rows:
+            self._writer.write_table(pa.Table.from_pylist(self._rows, schema=self._schema))
+            self._rows = []
+
+    def close(self):
+        if self.fmt == "parquet":
+            self._flush()
+            self._writer.close()
+        else:
+            self._file.close()
+
+
+def _bounded_map(function, tasks, workers, pending_per_worker=2):
+    """
+    `map` em processos com no máximo `workers * pending_per_worker` tarefas
+    pendentes (`Executor.map` consumiria o iterável todo de uma vez).
+    Os resultados saem pela ordem em que terminam.
+    """
+    if workers == 1:
+        for task in tasks:
+            yield function(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for task in tasks:
+            pending.add(executor.submit(function, task))
+            if len(pending) >= workers * pending_per_worker:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in wait(pending).done:
+            yield future.result()
+
+
+def run_batch(path, output, paths=1, workers=None, seed=None, fmt="csv", max_memory=None, progress=None):
+    """
+    Corre todos os cenários de `path` e grava os resultados em `output`.
+
+    Args:
+        path: Ficheiro de cenários (JSONL ou CSV)
+        output: Diretório de saída (criado se não existir)
+        paths: Trajetórias por cenário, se o cenário não indicar `paths`
+        workers: Número de processos (None = todos os núcleos, 1 = sem pool)
+        seed: Semente do lote; a de cada cenário é derivada da linha, por
+            isso não depende da ordem nem do número de processos
+        fmt: "csv" ou "parquet"
+        max_memory: Orçamento de memória por cenário (ver `stream_simulation`)
+        progress: Função chamada com cada linha de resumo
+
+    Returns:
+        (número de cenários, número de cenários com erro)
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato desconhecido: {fmt!r} (use {' ou '.join(FORMATS)})")
+    if fmt == "parquet" and not PARQUET_AVAILABLE:
+        raise ImportError("O formato parquet precisa do pyarrow (pip install pyarrow)")
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(output, exist_ok=True)
+
+    tasks = (
+        (line, raw, output, fmt, paths, seed, max_memory)
+        for line, raw in read_scenarios(path)
+    )
+    total = failed = 0
+    with SummaryWriter(output, fmt) as writer:
+        for row in _bounded_map(run_scenario, tasks, workers):
+            writer.write(row)
+            total += 1
+            failed += row["error"] is not None
+            if progress is not None:
+                progress(row)
+    return total, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m simulador.lotes",
+        description="Corre um ficheiro de cenários (JSONL ou CSV, taxas em %%) e grava tabelas e resumo.",
+    )
+    parser.add_argument("scenarios", help="ficheiro de cenários (.jsonl ou .csv)")
+    parser.add_argument("--output", required=True, metavar="DIRETÓRIO", help="diretório de resultados")
+    parser.add_argument("--paths", type=int, default=1, help="trajetórias por cenário (omissão: 1)")
+    parser.add_argument("--workers", type=int, default=None, help="processos (omissão: todos os núcleos)")
+    parser.add_argument("--seed", type=int, default=None, help="semente do lote")
+    parser.add_argument("--format", choices=FORMATS, default="csv", help="formato dos resultados")
+    parser.add_argument("--max-memory", metavar="TAMANHO", help="orçamento de memória por cenário (ex: 1GB)")
+    parser.add_argument("--quiet", action="store_true", help="não mostrar o progresso")
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as exit:
+        return exit.code
+    if args.paths < 1 or (args.workers is not None and args.workers < 1):
+        print("erro: --paths e --workers têm de ser positivos", file=sys.stderr)
+        return EXIT_USAGE
+    if not os.path.isfile(args.scenarios):
+        print(f"erro: ficheiro não encontrado: {args.scenarios}", file=sys.stderr)
+        return EXIT_USAGE
+    if args.max_memory is not None:
+        try:
+            args.max_memory = parse_memory(args.max_memory)
+        except ValueError as error:
+            print(f"erro: {error}", file=sys.stderr)
+            return EXIT_USAGE
+
+    def progress(row):
+        if row["error"] is not None:
+            print(f"{row['scenario']}: {row['error']}", file=sys.stderr)
+        elif not args.quiet:
+            print(f"{row['scenario']}: P50 final {row['final_balance_p50']:.2f}")
+
+    try:
+        total, failed = run_batch(
+            args.scenarios, args.output, paths=args.paths, workers=args.workers, seed=args.seed,
+            fmt=args.format, max_memory=args.max_memory, progress=progress,
+        )
+    except ImportError as error:
+        print(f"erro: {error}", file=sys.stderr)
+        return EXIT_USAGE
+    except KeyboardInterrupt:
+        return 130
+    if not args.quiet:
+        print(f"{total} cenários, {failed} com erro")
+    return EXIT_FAILURE if failed else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""
+Execução em blocos com um orçamento de memória.
+
+Em vez de escolher `block_size` à mão, indica-se quanta memória os arrays da
+simulação podem ocupar (`max_memory="2GB"`) e o número de trajetórias por
+bloco é calculado a partir de uma estimativa dos bytes por trajetória:
+
+- o conjunto de trabalho de um bloco (estado do motor, temporários, retornos
+  materializados pela fonte do modo e, com `record=True`, a tabela anual);
+- os resultados guardados de todas as trajetórias, que ficam em memória até
+  ao fim.
+
+Opcionalmente o bloco é limitado ao tamanho da cache do processador
+(`cache_size`), para que os vetores percorridos em cada período continuem na
+cache entre operações. Com `dtype=np.float32` os saldos e retornos ocupam
+metade, por isso cabem o dobro das trajetórias por bloco.
+
+A estimativa cobre só os arrays da simulação (não o interpretador nem as
+bibliotecas) e é deliberadamente folgada.
+"""
+import os
+import re
+
+import numpy as np
+
+from simulador.diario import DEFAULT_CHUNK_DAYS, DailyBatchResult
+from simulador.modos import DAILY_MODES, MONTHLY_MODES, simulation_batch
+from simulador.resultados import COLUMNS, LABELS, YearlyResults
+from simulador.vetorizado import BatchResult
+
+DEFAULT_MAX_MEMORY = "2GB"
+
+# Os blocos têm sempre um múltiplo deste número de trajetórias
+MIN_CHUNK_PATHS = 1024
+
+# Vetores por trajetória no estado do motor e nos temporários de um período
+_STATE_VECTORS = 24
+# Vetores percorridos em cada período (os que convém manter na cache)
+_HOT_VECTORS = 12
+# Matrizes (anos, trajetórias) em float64 de cada esquema de amostragem do
+# modo 1 (sorteios e temporários da inversa da normal), além dos retornos
+_SAMPLING_MATRICES = {"antithetic": 2, "lhs": 3, "sobol": 3}
+
+_UNITS = {
+    "": 1, "B": 1,
+    "KB": 10**3, "MB": 10**6, "GB": 10**9, "TB": 10**12,
+    "KIB": 2**10, "MIB": 2**20, "GIB": 2**30, "TIB": 2**40,
+}
+
+_CACHE_DIR = "/sys/devices/system/cpu/cpu0/cache"
+
+
+def parse_memory(value):
+    """
+    Converte um tamanho de memória em bytes.
+
+    Args:
+        value: Número de bytes ou texto como "2GB", "512 MiB", "1.5gb"
+            (KB/MB/GB são potências de 10, KiB/MiB/GiB potências de 2)
+
+    Returns:
+        Número de bytes (int)
+    """
+    if isinstance(value, str):
+        match = re.fullmatch(r"\s*([0-9]*\.?[0-9]+)\s*([A-Za-z]*)\s*", value)
+        if match is None or match.group(2).upper() not in _UNITS:
+            raise ValueError(f"Tamanho de memória inválido: {value!r}")
+        value = float(match.group(1)) * _UNITS[match.group(2).upper()]
+    if value <= 0:
+        raise ValueError("O orçamento de memória tem de ser positivo")
+    return int(value)
+
+
+def detect_cache_size(level=2):
+    """
+    Tamanho da cache de dados do processador, lido do sysfs (Linux).
+
+    Args:
+        level: Nível da cache (1, 2 ou 3)
+
+    Returns:
+        Bytes, ou None se não for possível determinar
+    """
+    try:
+        for entry in sorted(os.listdir(_CACHE_DIR)):
+            path = os.path.join(_CACHE_DIR, entry)
+            with open(os.path.join(path, "level")) as file:
+                if int(file.read()) != level:
+                    continue
+            with open(os.path.join(path, "type")) as file:
+                if file.read().strip() == "Instruction":
+                    continue
+            with open(os.path.join(path, "size")) as file:
+                return parse_memory(file.read().strip().replace("K", "KiB").replace("M", "MiB"))
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def bytes_per_path(
+    mode=1,
+    total_years=55,
+    record=False,
+    dtype=np.float64,
+    engine="numpy",
+    bootstrap_stationary=False,
+    chunk_days=DEFAULT_CHUNK_DAYS,
+    sampling="random",
+    **params
+):
+    """
+    Estimativa da memória ocupada por trajetória.
+
+    Args:
+        mode, total_years, record, dtype, engine, bootstrap_stationary,
+        chunk_days, sampling: Ver `simulation_batch`; os restantes
+            parâmetros não alteram a estimativa
+
+    Returns:
+        (bytes do conjunto de trabalho de um bloco, bytes dos resultados
+        guardados)
+    """
+    item = np.dtype(dtype).itemsize
+    periods = total_years * 12 if mode in MONTHLY_MODES else total_years
+    working = _STATE_VECTORS * item + 16
+
+    # Retornos materializados pela fonte de cada modo
+    if mode == 1 and sampling != "random":
+        # a matriz de sorteios é gerada de uma vez, com os temporários do esquema
+        working += total_years * (_SAMPLING_MATRICES.get(sampling, 3) * 8 + item)
+    elif mode == 1:
+        working += total_years * 8 if engine != "numpy" else 8 + item
+    elif mode in (4, 5):
+        # índices int64, temporários do sorteio e os retornos reamostrados
+        working += periods * ((5 if bootstrap_stationary else 2) * 8 + item)
+    elif mode in DAILY_MODES:
+        # sorteios em float64, bloco de retornos e o produto acumulado
+        working += chunk_days * (3 * 8 + 3 * item)
+    if engine != "numpy" and mode not in MONTHLY_MODES + DAILY_MODES:
+        working += total_years * 8  # o núcleo compilado trabalha em float64
+
+    kept = 3 * item + 9 + (item if mode in DAILY_MODES else 0)
+    if record:
+        table = total_years * (len(COLUMNS) * item + 1)
+        working += table
+        kept += table
+        if mode in MONTHLY_MODES:
+            working += total_years * 12 * 4 * item  # colunas mensais antes da agregação
+    return working, kept
+
+
+def chunk_size(n_paths, max_memory=DEFAULT_MAX_MEMORY, workers=1, copies=1, cache_size=None, **params):
+    """
+    Trajetórias por bloco que cabem no orçamento de memória.
+
+    Args:
+        n_paths: Número total de trajetórias
+        max_memory: Orçamento (bytes ou texto, ver `parse_memory`)
+        workers: Blocos simulados em simultâneo (processos)
+        copies: Cópias dos resultados de todas as trajetórias mantidas em
+            memória (0 = os blocos são agregados e descartados)
+        cache_size: Limitar o bloco à cache do processador: bytes,
+            "auto" (ver `detect_cache_size`) ou None (sem limite)
+        **params: Parâmetros de `simulation_batch` (ver `bytes_per_path`)
+
+    Returns:
+        Número de trajetórias por bloco
+    """
+    working, kept = bytes_per_path(**params)
+    available = (parse_memory(max_memory) - copies * kept * n_paths) // workers
+    if available < working * MIN_CHUNK_PATHS:
+        needed = copies * kept * n_paths + workers * working * MIN_CHUNK_PATHS
+        raise MemoryError(
+            f"O orçamento de {max_memory} não chega para {n_paths} trajetórias "
+            f"(mínimo estimado: {needed / 2**20:.0f} MiB)"
+        )
+
+    size = available // working
+    if cache_size == "auto":
+        cache_size = detect_cache_size()
+    if cache_size:
+        hot = _HOT_VECTORS * np.dtype(params.get("dtype", np.float64)).itemsize
+        size = min(size, cache_size // hot)
+    size = max(MIN_CHUNK_PATHS, size // MIN_CHUNK_PATHS * MIN_CHUNK_PATHS)
+    return int(min(size, max(n_paths, 1)))
+
+
+def chunked_batch(
+    n_paths,
+    max_memory=DEFAULT_MAX_MEMORY,
+    seed=None,
+    block_size=None,
+    cache_size=None,
+    record=False,
+    **params
+):
+    """
+    `simulation_batch` em blocos dimensionados pelo orçamento de memória.
+
+    Os resultados de todas as trajetórias são pré-alocados e cada bloco é
+    simulado com o seu gerador, criado com `SeedSequence(seed).spawn` como em
+    `run_parallel`. O resultado depende da semente e do tamanho do bloco;
+    para o fixar independentemente do orçamento passe `block_size`.
+
+    Args:
+        n_paths: Número total de trajetórias
+        max_memory: Orçamento dos arrays da simulação (ex: "2GB")
+        seed: Semente mestre
+        block_size: Trajetórias por bloco (None = calculado com `chunk_size`)
+        cache_size: Ver `chunk_size`
+        record: Guardar a tabela anual de todas as trajetórias
+        **params: Parâmetros de `simulation_batch` (mode, total_years,
+            dtype, ...)
+
+    Returns:
+        BatchResult (DailyBatchResult nos modos diários)
+    """
+    params.setdefault("total_years", 55)
+    mode = params.get("mode", 1)
+    dtype = np.dtype(params.get("dtype", np.float64))
+    if block_size is None:
+        block_size = chunk_size(n_paths, max_memory, cache_size=cache_size, record=record, **params)
+
+    fields = {
+        "final_balance": np.empty(n_paths, dtype=dtype),
+        "withdrawal_start_year": np.empty(n_paths, dtype=np.int32),
+        "total_withdrawn": np.empty(n_paths, dtype=dtype),
+        "total_contributions": np.empty(n_paths, dtype=dtype),
+        "ruined": np.empty(n_paths, dtype=bool),
+        "ruin_year": np.empty(n_paths, dtype=np.int32),
+    }
+    if mode in DAILY_MODES:
+        fields["max_drawdown"] = np.empty(n_paths, dtype=dtype)
+    table = YearlyResults(params["total_years"], n_paths, labels=LABELS, dtype=dtype) if record else None
+
+    starts = range(0, n_paths, block_size)
+    for start, seed_sequence in zip(starts, np.random.SeedSequence(seed).spawn(len(starts))):
+        stop = min(start + block_size, n_paths)
+        block = simulation_batch(
+            n_paths=stop - start,
+            rng=np.random.default_rng(seed_sequence),
+            record=record,
+            **params
+        )
+        for field, array in fields.items():
+            array[start:stop] = getattr(block, field)
+        if table is not None:
+            for column in ("phase",) + COLUMNS:
+                getattr(table, column)[:, start:stop] = getattr(block.table, column)
+        del block
+
+    if mode in DAILY_MODES:
+        return DailyBatchResult(**fields, table=table)
+    return BatchResult(**fields, table=table)
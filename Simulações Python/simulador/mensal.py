@@ -0,0 +1,432 @@
+"""
+Motor mensal vetorizado (regras do modo 3 de `simulation()`).
+
+Tal como o motor anual, simula várias trajetórias de uma vez, mês a mês:
+aportes mensais com as duas prestações extra de junho e dezembro, retiradas
+de 1/12 do valor anual e taxa de gestão mensal (taxa anual / 12).
+
+Os valores mensais ficam em arrays (meses, trajetórias) e a tabela anual é
+obtida com `reshape(anos, 12, trajetórias)` e reduções (somas e produtos),
+sem percorrer a lista de meses uma vez por ano.
+"""
+import numpy as np
+
+from simulador.instrumentacao import stage_timer
+from simulador.resultados import YearlyResults
+from simulador.vetorizado import BatchResult, contribution_schedule
+
+# Junho e dezembro recebem uma contribuição extra (14 meses por ano)
+EXTRA_CONTRIBUTION_MONTHS = (6, 12)
+
+# "original": regras do ciclo do modo 3 de `simulation()`; "consistent":
+# o valor fixo a retirar cresce como no motor anual e a tabela mostra os
+# fluxos efetivos de cada ano
+MONTHLY_RULES = ("original", "consistent")
+
+
+def monthly_contribution_schedule(
+    total_years,
+    initial_monthly_contribution,
+    contribution_growth_rate=0.00,
+    contribution_step_up_interval=5,
+    contribution_step_up_amount=100,
+    max_monthly_contribution=None,
+    min_monthly_contribution=None,
+):
+    """
+    Calcula o aporte de cada mês, incluindo as contribuições extra.
+
+    Returns:
+        Array (meses,) com o aporte mensal
+    """
+    monthly = contribution_schedule(
+        total_years,
+        initial_monthly_contribution,
+        contribution_multiplier=1,
+        contribution_growth_rate=contribution_growth_rate,
+        contribution_step_interval=contribution_step_up_interval,
+        contribution_step_amount=contribution_step_up_amount,
+        min_monthly_contribution=min_monthly_contribution,
+        max_monthly_contribution=max_monthly_contribution,
+    )
+    payments = np.ones(12)
+    payments[[month - 1 for month in EXTRA_CONTRIBUTION_MONTHS]] = 2
+    return (monthly[:, None] * payments).ravel()
+
+
+def simulate_monthly_paths(
+    returns,
+    contributions,
+    n_paths=None,
+    initial_portfolio=20000,
+    management_fee=0.005,
+    target_portfolio=400000,
+    min_threshold=300000,
+    upper_threshold=600000,
+    withdrawal_base=20000,
+    withdrawal_growth_rate=0.00,
+    tax_rate_withdrawal=0.198,
+    continue_contributions_during_withdrawal=False,
+    withdrawal_strategy=1,  # 1 = Valor fixo, 2 = 4% anual líquido
+    monthly_rules="original",
+    record=False,
+    dtype=np.float64,
+    instrumentation=None,
+):
+    """
+    Simula várias trajetórias em simultâneo, mês a mês.
+
+    Os parâmetros numéricos (saldo inicial, taxas, limiares, target e
+    retirada base) podem ser arrays (trajetórias,), com um valor por
+    trajetória; é assim que `simulador.grelha` avalia várias
+    combinações numa só passagem.
+
+    Com uma única trajetória e parâmetros escalares (o caso de
+    `single_path`), o ciclo corre sobre floats em vez de arrays de um
+    elemento; os resultados são os mesmos.
+
+    Args:
+        returns: Retornos mensais brutos, (meses, trajetórias), ou um iterável
+            que produza um array (trajetórias,) por mês
+        contributions: Aporte de cada mês (ver `monthly_contribution_schedule`),
+            (meses,) ou (meses, trajetórias)
+        n_paths: Número de trajetórias (obrigatório se `returns` for um iterável)
+        monthly_rules: Regras de `MONTHLY_RULES`. "original" reproduz o ciclo
+            do modo 3 de `simulation()`: o valor fixo a retirar não cresce e a
+            tabela mostra a fase do primeiro mês, os aportes previstos e a
+            retirada anual pretendida. "consistent" faz crescer o valor fixo
+            `withdrawal_growth_rate` no fim de cada ano com retiradas, como o
+            motor anual, e a tabela mostra a fase no fim do ano (Retirada
+            também no ano em que a fase começa), as somas dos fluxos efetivos
+            dos 12 meses e o retorno efetivo composto
+        record: Guardar a tabela anual de cada trajetória (colunas conforme
+            `monthly_rules`)
+        dtype: Tipo dos saldos e retornos (ver `simulate_paths`)
+        instrumentation: Ver `simulate_paths`
+
+    Returns:
+        BatchResult
+    """
+    if monthly_rules not in MONTHLY_RULES:
+        raise ValueError(f"Regras mensais desconhecidas: {monthly_rules!r} (use {', '.join(MONTHLY_RULES)})")
+    consistent = monthly_rules == "consistent"
+    contributions = np.asarray(contributions, dtype=dtype)
+    total_months = len(contributions)
+    total_years = total_months // 12
+    if n_paths is None:
+        n_paths = np.shape(returns)[1]
+
+    rules = dict(
+        initial_portfolio=initial_portfolio,
+        management_fee=management_fee,
+        target_portfolio=target_portfolio,
+        min_threshold=min_threshold,
+        upper_threshold=upper_threshold,
+        withdrawal_base=withdrawal_base,
+        withdrawal_growth_rate=withdrawal_growth_rate,
+        tax_rate_withdrawal=tax_rate_withdrawal,
+        continue_contributions_during_withdrawal=continue_contributions_during_withdrawal,
+        withdrawal_strategy=withdrawal_strategy,
+        consistent=consistent,
+    )
+    if (
+        n_paths == 1
+        and instrumentation is None
+        and np.dtype(dtype) == np.float64
+        and isinstance(returns, np.ndarray)
+        and all(np.ndim(value) == 0 for value in rules.values())
+    ):
+        return _simulate_single_path(returns, contributions, total_years, record, **rules)
+
+    table = None
+    if record:
+        table = YearlyResults(total_years, n_paths, dtype=dtype)
+        monthly = {
+            column: np.zeros((total_months, n_paths), dtype=dtype)
+            for column in ("contribution", "withdrawal", "net_withdrawal", "growth")
+        }
+
+    portfolio = np.full(n_paths, initial_portfolio, dtype=dtype)
+    in_withdrawal = np.zeros(n_paths, dtype=bool)
+    withdrawal_start_year = np.zeros(n_paths, dtype=np.int32)
+    current_withdrawal_net = np.full(n_paths, withdrawal_base, dtype=dtype)
+    withdrew_this_year = np.zeros(n_paths, dtype=bool)
+    total_withdrawn = np.zeros(n_paths, dtype=dtype)
+    total_contributions = np.zeros(n_paths, dtype=dtype)
+    ruined = np.zeros(n_paths, dtype=bool)
+    ruin_year = np.zeros(n_paths, dtype=np.int32)
+    monthly_management_fee = management_fee / 12
+
+    stage = stage_timer(instrumentation)
+    if instrumentation is not None:
+        returns = instrumentation.timed("returns", returns)
+
+    for month, monthly_return in zip(range(total_months), returns):
+        year = (month // 12) + 1
+        monthly_contribution = contributions[month]
+        if table is not None and consistent and month % 12 == 0:
+            table.start_balance[year - 1] = portfolio
+
+        # Transição para fase de retirada
+        with stage("phase_transition"):
+            switch = ~in_withdrawal & (portfolio >= target_portfolio)
+            if switch.any():
+                in_withdrawal |= switch
+                withdrawal_start_year[switch] = year
+
+        with stage("contributions"):
+            if continue_contributions_during_withdrawal:
+                this_contribution = monthly_contribution
+            else:
+                this_contribution = monthly_contribution * ~in_withdrawal
+            portfolio += this_contribution
+            total_contributions += this_contribution
+
+        # Retiradas mensais (dividir retirada anual por 12)
+        with stage("withdrawal"):
+            can_withdraw = in_withdrawal & (portfolio >= min_threshold)
+            if can_withdraw.any():
+                if withdrawal_strategy == 1:
+                    desired_net_monthly = current_withdrawal_net / 12
+                    desired_net_monthly = np.where(
+                        portfolio >= upper_threshold, desired_net_monthly * 2, desired_net_monthly
+                    )
+                else:  # 4% anual líquido
+                    desired_net_monthly = (0.04 * portfolio) / 12
+
+                capital_ratio = np.ones(n_paths, dtype=dtype)
+                positive = portfolio > 0
+                np.minimum(
+                    1.0, total_contributions / np.where(positive, portfolio, 1.0), out=capital_ratio, where=positive
+                )
+                gross_withdrawal_monthly = desired_net_monthly / (1 - tax_rate_withdrawal * (1 - capital_ratio))
+
+                gross_withdrawal_monthly = np.where(can_withdraw, gross_withdrawal_monthly, 0.0)
+                desired_net_monthly = np.where(can_withdraw, desired_net_monthly, 0.0)
+                portfolio -= gross_withdrawal_monthly
+                total_withdrawn += desired_net_monthly
+                withdrew_this_year |= can_withdraw
+                if table is not None:
+                    monthly["withdrawal"][month] = gross_withdrawal_monthly
+                    monthly["net_withdrawal"][month] = desired_net_monthly
+
+        with stage("growth"):
+            effective_return = np.asarray(monthly_return, dtype=dtype) - monthly_management_fee
+            portfolio *= 1 + effective_return
+
+        if table is not None:
+            with stage("materialization"):
+                monthly["contribution"][month] = this_contribution if consistent else monthly_contribution
+                monthly["growth"][month] = effective_return
+                if month % 12 == 0:
+                    if not consistent:
+                        table.phase[year - 1] = in_withdrawal
+                        table.start_balance[year - 1] = portfolio
+                elif month % 12 == 11:
+                    if consistent:
+                        table.phase[year - 1] = in_withdrawal
+                    table.end_balance[year - 1] = portfolio
+
+        newly_ruined = ~ruined & (portfolio <= 0)
+        if newly_ruined.any():
+            ruined |= newly_ruined
+            ruin_year[newly_ruined] = year
+
+        # Fim do ano: atualiza o valor fixo a retirar
+        if month % 12 == 11:
+            if consistent and withdrawal_strategy == 1 and np.any(withdrawal_growth_rate):
+                current_withdrawal_net = np.where(
+                    withdrew_this_year, current_withdrawal_net * (1 + withdrawal_growth_rate), current_withdrawal_net
+                )
+            withdrew_this_year[:] = False
+            if instrumentation is not None:
+                instrumentation.count_phases(year - 1, in_withdrawal, ruined, total_years)
+
+    if table is not None:
+        with stage("materialization"):
+            _fill_table(
+                table, monthly, consistent, withdrawal_strategy, upper_threshold, withdrawal_base, withdrawal_growth_rate
+            )
+
+    return BatchResult(
+        final_balance=portfolio,
+        withdrawal_start_year=withdrawal_start_year,
+        total_withdrawn=total_withdrawn,
+        total_contributions=total_contributions,
+        ruined=ruined,
+        ruin_year=ruin_year,
+        table=table,
+    )
+
+
+def _simulate_single_path(
+    returns,
+    contributions,
+    total_years,
+    record,
+    initial_portfolio,
+    management_fee,
+    target_portfolio,
+    min_threshold,
+    upper_threshold,
+    withdrawal_base,
+    withdrawal_growth_rate,
+    tax_rate_withdrawal,
+    continue_contributions_during_withdrawal,
+    withdrawal_strategy,
+    consistent,
+):
+    """
+    `simulate_monthly_paths` para uma só trajetória, com floats.
+
+    As operações são as mesmas, pela mesma ordem, por isso os resultados
+    coincidem com os do ciclo sobre arrays; só se evita o custo fixo das
+    operações NumPy em cada mês.
+    """
+    total_months = total_years * 12
+    returns = np.reshape(returns, (total_months, -1))[:, 0].tolist()
+    contributions = np.reshape(contributions, (total_months, -1))[:, 0].tolist()
+    initial_portfolio, management_fee, target_portfolio, min_threshold, upper_threshold = (
+        float(value) for value in (initial_portfolio, management_fee, target_portfolio, min_threshold, upper_threshold)
+    )
+    withdrawal_base, withdrawal_growth_rate, tax_rate_withdrawal = (
+        float(value) for value in (withdrawal_base, withdrawal_growth_rate, tax_rate_withdrawal)
+    )
+
+    portfolio = initial_portfolio
+    in_withdrawal = False
+    withdrawal_start_year = 0
+    current_withdrawal_net = withdrawal_base
+    withdrew_this_year = False
+    total_withdrawn = 0.0
+    total_contributions = 0.0
+    ruin_year = 0
+    monthly_management_fee = management_fee / 12
+    monthly = {column: [0.0] * total_months for column in ("contribution", "withdrawal", "net_withdrawal", "growth")}
+    phase = [False] * total_years
+    start_balance = [0.0] * total_years
+    end_balance = [0.0] * total_years
+
+    for month in range(total_months):
+        year = (month // 12) + 1
+        monthly_contribution = contributions[month]
+        if consistent and month % 12 == 0:
+            start_balance[year - 1] = portfolio
+
+        # Transição para fase de retirada
+        if not in_withdrawal and portfolio >= target_portfolio:
+            in_withdrawal = True
+            withdrawal_start_year = year
+
+        if continue_contributions_during_withdrawal or not in_withdrawal:
+            this_contribution = monthly_contribution
+            portfolio += this_contribution
+            total_contributions += this_contribution
+        else:
+            this_contribution = 0.0
+
+        # Retiradas mensais (dividir retirada anual por 12)
+        if in_withdrawal and portfolio >= min_threshold:
+            if withdrawal_strategy == 1:
+                desired_net_monthly = current_withdrawal_net / 12
+                if portfolio >= upper_threshold:
+                    desired_net_monthly = desired_net_monthly * 2
+            else:  # 4% anual líquido
+                desired_net_monthly = (0.04 * portfolio) / 12
+
+            capital_ratio = min(1.0, total_contributions / portfolio) if portfolio > 0 else 1.0
+            gross_withdrawal_monthly = desired_net_monthly / (1 - tax_rate_withdrawal * (1 - capital_ratio))
+
+            portfolio -= gross_withdrawal_monthly
+            total_withdrawn += desired_net_monthly
+            withdrew_this_year = True
+            monthly["withdrawal"][month] = gross_withdrawal_monthly
+            monthly["net_withdrawal"][month] = desired_net_monthly
+
+        effective_return = returns[month] - monthly_management_fee
+        portfolio *= 1 + effective_return
+
+        monthly["contribution"][month] = this_contribution if consistent else monthly_contribution
+        monthly["growth"][month] = effective_return
+        if month % 12 == 0:
+            if not consistent:
+                phase[year - 1] = in_withdrawal
+                start_balance[year - 1] = portfolio
+        elif month % 12 == 11:
+            if consistent:
+                phase[year - 1] = in_withdrawal
+            end_balance[year - 1] = portfolio
+
+        if not ruin_year and portfolio <= 0:
+            ruin_year = year
+
+        # Fim do ano: atualiza o valor fixo a retirar
+        if month % 12 == 11:
+            if consistent and withdrawal_strategy == 1 and withdrew_this_year:
+                current_withdrawal_net *= 1 + withdrawal_growth_rate
+            withdrew_this_year = False
+
+    table = None
+    if record:
+        table = YearlyResults(total_years, 1)
+        table.phase[:, 0] = phase
+        table.start_balance[:, 0] = start_balance
+        table.end_balance[:, 0] = end_balance
+        monthly = {column: np.array(values)[:, None] for column, values in monthly.items()}
+        _fill_table(
+            table, monthly, consistent, withdrawal_strategy, upper_threshold, withdrawal_base, withdrawal_growth_rate
+        )
+
+    return BatchResult(
+        final_balance=np.array([portfolio]),
+        withdrawal_start_year=np.array([withdrawal_start_year], dtype=np.int32),
+        total_withdrawn=np.array([total_withdrawn]),
+        total_contributions=np.array([total_contributions]),
+        ruined=np.array([ruin_year > 0]),
+        ruin_year=np.array([ruin_year], dtype=np.int32),
+        table=table,
+    )
+
+
+def _fill_table(table, monthly, consistent, withdrawal_strategy, upper_threshold, withdrawal_base, withdrawal_growth_rate):
+    """
+    Agregação anual: (meses, trajetórias) -> (anos, 12, trajetórias).
+
+    Com as regras originais, `table.start_balance` traz o saldo depois do
+    crescimento do primeiro mês, que é convertido no saldo de início como no
+    ciclo original, e as retiradas são as pretendidas para o ano.
+    """
+    total_years, n_paths = table.end_balance.shape
+    by_year = {column: values.reshape(total_years, 12, n_paths) for column, values in monthly.items()}
+    table.contribution[:] = _sum_months(by_year["contribution"])
+    if consistent:
+        table.withdrawal[:] = _sum_months(by_year["withdrawal"])
+        table.net_withdrawal[:] = _sum_months(by_year["net_withdrawal"])
+        table.growth[:] = np.prod(1 + by_year["growth"], axis=1) - 1
+        return
+
+    table.start_balance[:] = np.round(table.start_balance / (1 + by_year["growth"][:, 0]), 2)
+    if withdrawal_strategy == 1:
+        # O valor mostrado cresce a cada linha de Retirada, sem afetar as retiradas
+        display_net = np.full(n_paths, withdrawal_base, dtype=table.withdrawal.dtype)
+        for row in range(total_years):
+            desired_net = np.where(table.end_balance[row] >= upper_threshold, display_net * 2, display_net)
+            table.withdrawal[row] = np.where(table.phase[row], desired_net, 0.0)
+            display_net = np.where(table.phase[row], display_net * (1 + withdrawal_growth_rate), display_net)
+    else:
+        table.withdrawal[:] = np.where(table.phase, 0.04 * table.end_balance, 0.0)
+    table.net_withdrawal[:] = table.withdrawal
+    table.growth[:] = table.end_balance / table.start_balance - 1
+
+
+def _sum_months(values):
+    """
+    Soma dos 12 meses de cada ano, mês a mês e pela ordem do calendário.
+
+    `sum(axis=1)` usa somas por pares quando o eixo é contíguo (uma só
+    trajetória), o que mudaria os últimos bits face ao lote.
+    """
+    total = values[:, 0].copy()
+    for month in range(1, 12):
+        total += values[:, month]
+    return total
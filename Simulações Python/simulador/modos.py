@@ -0,0 +1,375 @@
+"""
+Ponto de entrada comum das simulações.
+
+Cada modo define apenas a origem dos retornos; as regras de acumulação e
+retirada vêm do motor anual (`simulate_paths`, modos 1, 2 e 4), do motor
+mensal (`simulate_monthly_paths`, modos 3 e 5) ou do motor diário
+(`simulate_daily_paths`, modos 6 e 7). `simulation_batch` simula
+muitas trajetórias; `single_path` é a versão de uma trajetória usada pelos
+scripts `Simulacao*.py`, que passam a ser apenas a interface.
+"""
+import numpy as np
+
+from simulador import historico
+from simulador.amostragem import standard_normal_draws
+from simulador.bootstrap import bootstrap_returns
+from simulador.diario import (
+    DEFAULT_CHUNK_DAYS,
+    bootstrap_daily_returns,
+    normal_daily_returns,
+    simulate_daily_paths,
+    trading_calendar,
+    trading_days_per_year,
+)
+from simulador.instrumentacao import stage_timer
+from simulador.mensal import monthly_contribution_schedule, simulate_monthly_paths
+from simulador.resultados import LABELS, format_growth
+from simulador.vetorizado import contribution_schedule, simulate_paths
+
+MONTHLY_MODES = (3, 5)
+DAILY_MODES = (6, 7)
+
+
+def simulation_batch(
+    n_paths=100000,
+    mode=1,
+    total_years=55,
+    initial_portfolio=20000,
+    initial_monthly_contribution=200,
+    contribution_multiplier=14,
+    contribution_growth_rate=0.00,
+    mean_return=0.07,
+    std_return=0.15,
+    management_fee=0.005,
+    target_portfolio=400000,
+    min_threshold=300000,
+    upper_threshold=600000,
+    withdrawal_base=20000,
+    withdrawal_growth_rate=0.00,
+    tax_rate_withdrawal=0.198,
+    continue_contributions_during_withdrawal=False,
+    contribution_step_up_interval=5,
+    contribution_step_up_amount=100,
+    min_monthly_contribution=None,
+    max_monthly_contribution=None,
+    withdrawal_strategy=1,  # 1 = Valor fixo, 2 = 4% anual líquido
+    negative_years_cap=None,
+    threshold_before_contribution=False,
+    block_length=None,
+    bootstrap_circular=True,
+    bootstrap_stationary=False,
+    series=historico.SP500,
+    withdrawal_months=None,
+    drawdown_limit=None,
+    chunk_days=DEFAULT_CHUNK_DAYS,
+    monthly_rules="original",
+    sampling="random",
+    returns=None,
+    seed=None,
+    rng=None,
+    record=False,
+    engine="numpy",
+    dtype=np.float64,
+    instrumentation=None,
+):
+    """
+    Versão em lote de `simulation()` (Simulacao_Interativa_3.py) e motor comum
+    a todos os scripts.
+
+    Os padrões reproduzem `simulation()`. As variantes dos outros scripts são
+    opções: aporte decrescente (`contribution_step_up_amount` negativo com
+    `min_monthly_contribution`, Simulacao10_1), limite de anos negativos
+    (`negative_years_cap=12`, Simulacao10_*) e `min_threshold` verificado
+    antes do aporte (`threshold_before_contribution=True`, Simulacao10_* e
+    SimulacaoSP500_*).
+
+    Args:
+        mode: 1 = Retornos aleatórios, 2 = Histórico real do S&P500 (anual),
+            3 = Dados mensais reais, 4 = Bootstrap em blocos do histórico anual,
+            5 = Bootstrap em blocos do histórico mensal, 6 = Retornos diários
+            aleatórios (média e desvio anuais), 7 = Bootstrap estacionário do
+            histórico diário (`<series>_daily`)
+        contribution_step_up_amount: Variação do aporte mensal a cada
+            `contribution_step_up_interval` anos (negativo = decrescimento)
+        negative_years_cap: Anos negativos a partir dos quais os retornos
+            negativos passam a 0% (None = sem limite; só modos anuais)
+        threshold_before_contribution: Ver `simulate_paths` (só modos anuais)
+        block_length: Comprimento dos blocos do bootstrap (padrão: 5 anos no
+            modo 4, 12 meses no modo 5, 21 dias no modo 7)
+        bootstrap_circular: Permitir blocos que dão a volta ao fim da série
+        bootstrap_stationary: Blocos de comprimento aleatório (média block_length)
+        series: Série histórica dos modos 2 a 5 e 7 (nome base no registo,
+            ex: "sp500" ou uma série importada com `ingest_prices`)
+        withdrawal_months, drawdown_limit, chunk_days: Ver
+            `simulate_daily_paths` (só modos diários)
+        monthly_rules: Regras dos modos mensais ("original" ou "consistent",
+            ver `simulate_monthly_paths`)
+        sampling: Esquema de amostragem dos retornos do modo 1 ("random",
+            "antithetic", "lhs" ou "sobol", ver `simulador.amostragem`)
+        returns: Retornos já gerados, (anos, trajetórias) ou, nos modos
+            mensais, (meses, trajetórias); substituem a origem do modo
+        rng: Gerador NumPy a usar; se omitido é criado a partir de `seed`
+        engine: Motor dos modos anuais ("numpy", "numba" ou "auto", ver
+            `simulate_paths`); os modos mensais e diários usam sempre o NumPy
+        dtype: Tipo dos saldos e retornos (np.float64 ou np.float32, ver
+            `simulate_paths`)
+        instrumentation: `simulador.instrumentacao.Instrumentation` que
+            regista os tempos por etapa e as trajetórias por fase
+
+    Returns:
+        BatchResult
+    """
+    if rng is None:
+        rng = np.random.default_rng(seed)
+    if sampling != "random" and mode != 1:
+        raise ValueError("Os esquemas de amostragem só se aplicam ao modo 1")
+    if mode in DAILY_MODES:
+        return _daily_batch(
+            n_paths, mode, total_years, initial_monthly_contribution, contribution_growth_rate,
+            contribution_step_up_interval, contribution_step_up_amount, min_monthly_contribution,
+            max_monthly_contribution, mean_return, std_return, block_length or 21, series, returns, rng,
+            record=record,
+            dtype=dtype,
+            instrumentation=instrumentation,
+            withdrawal_months=withdrawal_months,
+            drawdown_limit=drawdown_limit,
+            chunk_days=chunk_days,
+            initial_portfolio=initial_portfolio,
+            management_fee=management_fee,
+            target_portfolio=target_portfolio,
+            min_threshold=min_threshold,
+            upper_threshold=upper_threshold,
+            withdrawal_base=withdrawal_base,
+            withdrawal_growth_rate=withdrawal_growth_rate,
+            tax_rate_withdrawal=tax_rate_withdrawal,
+            continue_contributions_during_withdrawal=continue_contributions_during_withdrawal,
+            withdrawal_strategy=withdrawal_strategy,
+        )
+    if mode in MONTHLY_MODES:
+        return _monthly_batch(
+            n_paths, mode, total_years, initial_portfolio, initial_monthly_contribution,
+            contribution_growth_rate, contribution_step_up_interval, contribution_step_up_amount,
+            min_monthly_contribution, max_monthly_contribution, block_length or 12,
+            bootstrap_circular, bootstrap_stationary, series, returns, rng,
+            record=record,
+            dtype=dtype,
+            instrumentation=instrumentation,
+            monthly_rules=monthly_rules,
+            management_fee=management_fee,
+            target_portfolio=target_portfolio,
+            min_threshold=min_threshold,
+            upper_threshold=upper_threshold,
+            withdrawal_base=withdrawal_base,
+            withdrawal_growth_rate=withdrawal_growth_rate,
+            tax_rate_withdrawal=tax_rate_withdrawal,
+            continue_contributions_during_withdrawal=continue_contributions_during_withdrawal,
+            withdrawal_strategy=withdrawal_strategy,
+        )
+
+    stage = stage_timer(instrumentation)
+    with stage("contributions"):
+        contributions = contribution_schedule(
+            total_years,
+            initial_monthly_contribution,
+            contribution_multiplier=contribution_multiplier,
+            contribution_growth_rate=contribution_growth_rate,
+            contribution_step_interval=contribution_step_up_interval,
+            contribution_step_amount=contribution_step_up_amount,
+            min_monthly_contribution=min_monthly_contribution,
+            max_monthly_contribution=max_monthly_contribution,
+        )
+    if returns is None:
+        with stage("returns"):
+            returns = _annual_returns(
+                n_paths, mode, total_years, mean_return, std_return, block_length, bootstrap_circular,
+                bootstrap_stationary, series, sampling, rng, dtype
+            )
+
+    result = simulate_paths(
+        returns,
+        contributions,
+        n_paths=n_paths,
+        initial_portfolio=initial_portfolio,
+        management_fee=management_fee,
+        target_portfolio=target_portfolio,
+        min_threshold=min_threshold,
+        upper_threshold=upper_threshold,
+        withdrawal_base=withdrawal_base,
+        withdrawal_growth_rate=withdrawal_growth_rate,
+        tax_rate_withdrawal=tax_rate_withdrawal,
+        continue_contributions_during_withdrawal=continue_contributions_during_withdrawal,
+        negative_years_cap=negative_years_cap,
+        withdrawal_strategy=withdrawal_strategy,
+        threshold_before_contribution=threshold_before_contribution,
+        record=record,
+        engine=engine,
+        dtype=dtype,
+        instrumentation=instrumentation,
+    )
+    if result.table is not None:
+        result.table.labels = LABELS
+    return result
+
+
+def _annual_returns(
+    n_paths,
+    mode,
+    total_years,
+    mean_return,
+    std_return,
+    block_length,
+    bootstrap_circular,
+    bootstrap_stationary,
+    series,
+    sampling,
+    rng,
+    dtype,
+):
+    """
+    Modos 1, 2 e 4: retornos anuais (anos, trajetórias); no modo 1 com a
+    amostragem padrão, um gerador que produz um array por ano
+    """
+    if mode == 1 and sampling == "random":
+        # Gerados ano a ano dentro do motor
+        return (rng.normal(mean_return, std_return, n_paths) for _ in range(total_years))
+    if mode == 1:
+        draws = standard_normal_draws(sampling, total_years, n_paths, rng)
+        return (mean_return + std_return * draws).astype(dtype, copy=False)
+    if mode == 2:
+        annual = historico.annual_returns(series)
+        return np.broadcast_to(annual[np.arange(total_years) % len(annual)][:, None], (total_years, n_paths))
+    if mode == 4:
+        return bootstrap_returns(
+            historico.annual_returns(series), total_years, n_paths, block_length or 5, rng=rng,
+            circular=bootstrap_circular, stationary=bootstrap_stationary, dtype=dtype
+        )
+    raise ValueError(f"Modo {mode} não suportado em simulation_batch")
+
+
+def _monthly_batch(
+    n_paths,
+    mode,
+    total_years,
+    initial_portfolio,
+    initial_monthly_contribution,
+    contribution_growth_rate,
+    contribution_step_up_interval,
+    contribution_step_up_amount,
+    min_monthly_contribution,
+    max_monthly_contribution,
+    block_length,
+    bootstrap_circular,
+    bootstrap_stationary,
+    series,
+    returns,
+    rng,
+    **params
+):
+    """Modos 3 e 5: retornos mensais (meses, trajetórias) e motor mensal"""
+    stage = stage_timer(params["instrumentation"])
+    total_months = total_years * 12
+    if returns is None:
+        with stage("returns"):
+            if mode == 3:
+                monthly = historico.mode3_monthly_returns(total_months, series)
+                returns = np.broadcast_to(monthly[:, None], (total_months, n_paths))
+            else:
+                returns = bootstrap_returns(
+                    historico.monthly_returns(series), total_months, n_paths, block_length, rng=rng,
+                    circular=bootstrap_circular, stationary=bootstrap_stationary, dtype=params["dtype"]
+                )
+
+    with stage("contributions"):
+        contributions = monthly_contribution_schedule(
+            total_years,
+            initial_monthly_contribution,
+            contribution_growth_rate=contribution_growth_rate,
+            contribution_step_up_interval=contribution_step_up_interval,
+            contribution_step_up_amount=contribution_step_up_amount,
+            min_monthly_contribution=min_monthly_contribution,
+            max_monthly_contribution=max_monthly_contribution,
+        )
+    return simulate_monthly_paths(returns, contributions, n_paths=n_paths, initial_portfolio=initial_portfolio, **params)
+
+
+def _daily_batch(
+    n_paths,
+    mode,
+    total_years,
+    initial_monthly_contribution,
+    contribution_growth_rate,
+    contribution_step_up_interval,
+    contribution_step_up_amount,
+    min_monthly_contribution,
+    max_monthly_contribution,
+    mean_return,
+    std_return,
+    block_length,
+    series,
+    returns,
+    rng,
+    **params
+):
+    """Modos 6 e 7: fonte de retornos diários e motor diário, em blocos"""
+    if returns is None:
+        # Só cria a fonte: os retornos são gerados dentro do motor, bloco a bloco
+        if mode == 6:
+            days_per_year = trading_days_per_year(trading_calendar(total_years))
+            returns = normal_daily_returns(
+                mean_return, std_return, n_paths, days_per_year, rng=rng, dtype=params["dtype"]
+            )
+        else:
+            returns = bootstrap_daily_returns(
+                historico.daily_returns(series), n_paths, block_length, rng=rng, dtype=params["dtype"]
+            )
+
+    with stage_timer(params["instrumentation"])("contributions"):
+        contributions = monthly_contribution_schedule(
+            total_years,
+            initial_monthly_contribution,
+            contribution_growth_rate=contribution_growth_rate,
+            contribution_step_up_interval=contribution_step_up_interval,
+            contribution_step_up_amount=contribution_step_up_amount,
+            min_monthly_contribution=min_monthly_contribution,
+            max_monthly_contribution=max_monthly_contribution,
+        )
+    return simulate_daily_paths(returns, contributions, n_paths=n_paths, **params)
+
+
+def single_path(
+    mode=1,
+    seed=None,
+    labels=LABELS,
+    decimals=None,
+    growth_formatter=format_growth,
+    **params
+):
+    """
+    Uma única trajetória, com a tabela anual, para os scripts interativos.
+
+    No modo 1 os retornos vêm do gerador global (`np.random.seed(seed)` e um
+    `np.random.normal` por ano), como nos scripts originais, por isso a mesma
+    semente dá os mesmos resultados de sempre.
+
+    Args:
+        mode: Ver `simulation_batch`
+        labels, decimals, growth_formatter: Formatação da tabela (ver
+            `YearlyResults`)
+        **params: Restantes parâmetros de `simulation_batch`
+
+    Returns:
+        YearlyResults, ano de início das retiradas (None se não atingido),
+        total retirado (líquido)
+    """
+    if seed is not None:
+        np.random.seed(seed)
+    if mode == 1 and params.get("returns") is None:
+        total_years = params.get("total_years", 55)
+        draws = np.random.normal(params.get("mean_return", 0.07), params.get("std_return", 0.15), total_years)
+        params["returns"] = draws[:, None]
+
+    result = simulation_batch(n_paths=1, mode=mode, seed=seed, record=True, **params)
+    with stage_timer(params.get("instrumentation"))("materialization"):
+        table = result.table.path(0, decimals=decimals, growth_formatter=growth_formatter)
+    table.labels = labels
+    return table, int(result.withdrawal_start_year[0]) or None, float(result.total_withdrawn[0])
@@ -0,0 +1,216 @@
+"""
+Procura por objetivo (goal seek) sobre simulações em lote.
+
+Responde a duas perguntas frequentes:
+
+- qual a maior retirada base (`withdrawal_base`) que mantém a probabilidade
+  de ruína abaixo de um limite;
+- qual o menor aporte mensal inicial (`initial_monthly_contribution`) que
+  atinge o target até um dado ano com uma dada probabilidade.
+
+A procura é por bisseção. Os sorteios são gerados uma única vez por
+procura (mesma semente) e reutilizados em todas as iterações, por isso cada
+iteração custa apenas uma passagem vetorizada e a probabilidade estimada é
+monótona no parâmetro procurado.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from simulador.grelha import DEFAULTS, _simulate_cells, _with_draws, plan_passes
+
+
+@dataclass
+class GoalSeekResult:
+    """
+    Resultado de uma procura por objetivo.
+
+    Attributes:
+        value: Valor encontrado para o parâmetro (NaN se o objetivo é impossível
+            no intervalo procurado)
+        probability: Probabilidade estimada nesse valor (fração)
+        iterations: Número de passagens da simulação
+        converged: Se o intervalo final ficou abaixo da tolerância
+    """
+
+    value: float
+    probability: float
+    iterations: int
+    converged: bool
+
+
+def _simulator(name, n_paths, seed, **params):
+    """
+    Função valor -> BatchResult da célula `{name: valor}`.
+
+    Os sorteios são calculados na primeira chamada e reutilizados nas
+    seguintes; são libertados com a função.
+    """
+    draws = {}
+
+    def simulate(value):
+        tasks, _ = plan_passes([{name: value}], n_paths, seed, n_paths, **params)
+        ((structural, cells, _, cell_draws),) = _with_draws(tasks, draws)
+        return _simulate_cells(structural, cells, n_paths, cell_draws)
+
+    return simulate
+
+
+def _bisect(probability_at, feasible, low, high, tolerance, max_iterations, largest):
+    """
+    Bisseção da fronteira entre valores que cumprem e não cumprem o objetivo.
+
+    Args:
+        probability_at: Função valor -> probabilidade estimada
+        feasible: Função probabilidade -> cumpre o objetivo
+        low, high: Intervalo inicial; o lado aberto é duplicado até a
+            fronteira ficar dentro do intervalo
+        largest: Procurar o maior valor que cumpre (True) ou o menor (False)
+
+    Returns:
+        GoalSeekResult
+    """
+    iterations = 0
+
+    def evaluate(value):
+        nonlocal iterations
+        iterations += 1
+        return probability_at(value)
+
+    # `good` cumpre o objetivo, `bad` não; o lado aberto é duplicado até o
+    # intervalo conter a fronteira
+    if largest:
+        good, bad = low, high
+        good_probability = evaluate(good)
+        if not feasible(good_probability):
+            return GoalSeekResult(np.nan, good_probability, iterations, False)
+        bad_probability = evaluate(bad)
+        while feasible(bad_probability) and iterations < max_iterations:
+            good, good_probability = bad, bad_probability
+            bad = max(2 * bad, tolerance)
+            bad_probability = evaluate(bad)
+        if feasible(bad_probability):
+            return GoalSeekResult(good, good_probability, iterations, False)
+    else:
+        good, bad = high, low
+        bad_probability = evaluate(bad)
+        if feasible(bad_probability):
+            return GoalSeekResult(bad, bad_probability, iterations, True)
+        good_probability = evaluate(good)
+        while not feasible(good_probability) and iterations < max_iterations:
+            bad = good
+            good = max(2 * good, tolerance)
+            good_probability = evaluate(good)
+        if not feasible(good_probability):
+            return GoalSeekResult(np.nan, good_probability, iterations, False)
+
+    while abs(bad - good) > tolerance and iterations < max_iterations:
+        middle = (good + bad) / 2
+        middle_probability = evaluate(middle)
+        if feasible(middle_probability):
+            good, good_probability = middle, middle_probability
+        else:
+            bad = middle
+
+    return GoalSeekResult(good, good_probability, iterations, abs(bad - good) <= tolerance)
+
+
+def max_safe_withdrawal(
+    max_ruin_probability=0.05,
+    n_paths=10000,
+    seed=None,
+    low=0.0,
+    high=None,
+    tolerance=1.0,
+    max_iterations=60,
+    **params
+):
+    """
+    Maior `withdrawal_base` com probabilidade de ruína até `max_ruin_probability`.
+
+    Args:
+        max_ruin_probability: Probabilidade de ruína máxima (fração, 0.05 = 5%)
+        n_paths: Trajetórias por iteração
+        seed: Semente dos sorteios partilhados (gerada se omitida)
+        low, high: Intervalo inicial (€); por omissão `high` é o dobro de
+            `withdrawal_base` e é alargado se necessário
+        tolerance: Largura final do intervalo (€)
+        **params: Restantes parâmetros de `simulation_batch` (total_years, ...)
+
+    Returns:
+        GoalSeekResult com a retirada base anual (líquida)
+    """
+    if params.get("withdrawal_strategy", 1) != 1:
+        raise ValueError("withdrawal_base só se aplica à estratégia de valor fixo (withdrawal_strategy=1)")
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    if high is None:
+        high = 2 * params.pop("withdrawal_base", 20000)
+    else:
+        params.pop("withdrawal_base", None)
+
+    simulate = _simulator("withdrawal_base", n_paths, seed, **params)
+
+    def ruin_probability(value):
+        return float(simulate(value).ruined.mean())
+
+    return _bisect(
+        ruin_probability,
+        lambda probability: probability <= max_ruin_probability,
+        low, high, tolerance, max_iterations, largest=True,
+    )
+
+
+def min_required_contribution(
+    target_year,
+    probability=0.9,
+    n_paths=10000,
+    seed=None,
+    low=0.0,
+    high=None,
+    tolerance=1.0,
+    max_iterations=60,
+    **params
+):
+    """
+    Menor `initial_monthly_contribution` que atinge o target até `target_year`.
+
+    O target conta como atingido quando o saldo chega a `target_portfolio`
+    até ao fim do ano `target_year`: retiradas iniciadas nesse ano ou antes,
+    ou saldo no fim desse ano (o saldo final, só os primeiros `target_year`
+    anos são simulados) igual ou acima do target.
+
+    Args:
+        target_year: Ano limite para atingir `target_portfolio`
+        probability: Probabilidade mínima de o atingir (fração)
+        n_paths: Trajetórias por iteração
+        seed: Semente dos sorteios partilhados (gerada se omitida)
+        low, high: Intervalo inicial (€ por mês); por omissão `high` é o dobro
+            de `initial_monthly_contribution` e é alargado se necessário
+        tolerance: Largura final do intervalo (€ por mês)
+        **params: Restantes parâmetros de `simulation_batch`
+
+    Returns:
+        GoalSeekResult com o aporte mensal inicial
+    """
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    params["total_years"] = target_year
+    if high is None:
+        high = 2 * params.pop("initial_monthly_contribution", 200)
+    else:
+        params.pop("initial_monthly_contribution", None)
+
+    simulate = _simulator("initial_monthly_contribution", n_paths, seed, **params)
+
+    target_portfolio = params.get("target_portfolio", DEFAULTS["target_portfolio"])
+
+    def target_probability(value):
+        result = simulate(value)
+        return float((result.reached_target | (result.final_balance >= target_portfolio)).mean())
+
+    return _bisect(
+        target_probability,
+        lambda reached: reached >= probability,
+        low, high, tolerance, max_iterations, largest=False,
+    )
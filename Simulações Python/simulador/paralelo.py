@@ -0,0 +1,155 @@
+"""
+Execução paralela do modo 1 (retornos aleatórios) em vários processos.
+
+O trabalho é dividido em blocos de tamanho fixo. Cada bloco tem o seu próprio
+gerador, criado a partir de `SeedSequence(seed).spawn(n_blocks)`, por isso o
+resultado depende apenas da semente e do tamanho do bloco — não do número de
+processos. Os processos escrevem diretamente em arrays em memória partilhada
+(`multiprocessing.shared_memory`), sem enviar DataFrames de volta.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from simulador.memoria import chunk_size
+from simulador.modos import simulation_batch
+from simulador.resultados import COLUMNS, LABELS, YearlyResults
+from simulador.vetorizado import BatchResult
+
+DEFAULT_BLOCK_SIZE = 65536
+
+# Campos por trajetória devolvidos pelos processos (None = `dtype` da simulação)
+_RESULT_FIELDS = (
+    ("final_balance", None),
+    ("withdrawal_start_year", np.int32),
+    ("total_withdrawn", None),
+    ("total_contributions", None),
+    ("ruined", np.bool_),
+    ("ruin_year", np.int32),
+)
+
+# Colunas da tabela anual, (anos, trajetórias), quando record=True
+_TABLE_FIELDS = (("phase", np.bool_),) + tuple((column, None) for column in COLUMNS)
+
+
+def _attach(name, shape, dtype):
+    """Abre um bloco de memória partilhada e devolve (shm, array)"""
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _run_block(task):
+    """Corre um bloco de trajetórias e escreve o resultado na memória partilhada"""
+    start, stop, seed_sequence, buffers, n_paths, params = task
+    result = simulation_batch(
+        n_paths=stop - start,
+        rng=np.random.default_rng(seed_sequence),
+        record="end_balance" in buffers,
+        **params
+    )
+    float_dtype = params.get("dtype", np.float64)
+
+    for field, dtype in _RESULT_FIELDS:
+        shm, array = _attach(buffers[field], (n_paths,), dtype or float_dtype)
+        array[start:stop] = getattr(result, field)
+        del array
+        shm.close()
+
+    if result.table is not None:
+        for column, dtype in _TABLE_FIELDS:
+            shm, array = _attach(buffers[column], (params["total_years"], n_paths), dtype or float_dtype)
+            array[:, start:stop] = getattr(result.table, column)
+            del array
+            shm.close()
+
+    return stop - start
+
+
+def run_parallel(
+    n_paths,
+    workers=None,
+    seed=None,
+    block_size=DEFAULT_BLOCK_SIZE,
+    record=False,
+    max_memory=None,
+    **params
+):
+    """
+    Corre `n_paths` trajetórias do modo 1 de `simulation()` em paralelo.
+
+    Args:
+        n_paths: Número total de trajetórias
+        workers: Número de processos (None = todos os núcleos, 1 = sem pool)
+        seed: Semente mestre; o resultado é o mesmo para qualquer `workers`
+        block_size: Trajetórias por bloco (cada bloco tem o seu gerador)
+        record: Guardar a tabela anual completa de cada trajetória
+        max_memory: Orçamento de memória (ex: "2GB"); se indicado, substitui
+            `block_size` pelo maior bloco que cabe no orçamento, repartido
+            pelos processos (ver `simulador.memoria.chunk_size`)
+        **params: Parâmetros de `simulation_batch` (total_years, mean_return, ...)
+
+    Returns:
+        BatchResult
+    """
+    params.setdefault("total_years", 55)
+    total_years = params["total_years"]
+    workers = workers or os.cpu_count() or 1
+    float_dtype = params.get("dtype", np.float64)
+    if max_memory is not None:
+        # memória partilhada + cópia final dos resultados
+        block_size = chunk_size(n_paths, max_memory, workers=workers, copies=2, record=record, **params)
+
+    starts = list(range(0, n_paths, block_size))
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(starts))
+
+    shapes = {field: ((n_paths,), dtype or float_dtype) for field, dtype in _RESULT_FIELDS}
+    if record:
+        for column, dtype in _TABLE_FIELDS:
+            shapes[column] = ((total_years, n_paths), dtype or float_dtype)
+
+    segments = {}
+    try:
+        for field, (shape, dtype) in shapes.items():
+            size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+            segments[field] = shared_memory.SharedMemory(create=True, size=size)
+        buffers = {field: shm.name for field, shm in segments.items()}
+
+        tasks = [
+            (start, min(start + block_size, n_paths), seed_sequence, buffers, n_paths, params)
+            for start, seed_sequence in zip(starts, seed_sequences)
+        ]
+        if workers == 1 or len(tasks) == 1:
+            for task in tasks:
+                _run_block(task)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for _ in executor.map(_run_block, tasks):
+                    pass
+
+        # Copia os resultados para fora da memória partilhada antes de a libertar
+        arrays = {
+            field: np.ndarray(shape, dtype=dtype, buffer=segments[field].buf).copy()
+            for field, (shape, dtype) in shapes.items()
+        }
+    finally:
+        for shm in segments.values():
+            shm.close()
+            shm.unlink()
+
+    table = None
+    if record:
+        table = YearlyResults(total_years, n_paths, labels=LABELS, dtype=float_dtype)
+        for column, _ in _TABLE_FIELDS:
+            setattr(table, column, arrays[column])
+
+    return BatchResult(
+        final_balance=arrays["final_balance"],
+        withdrawal_start_year=arrays["withdrawal_start_year"],
+        total_withdrawn=arrays["total_withdrawn"],
+        total_contributions=arrays["total_contributions"],
+        ruined=arrays["ruined"],
+        ruin_year=arrays["ruin_year"],
+        table=table,
+    )
@@ -0,0 +1,64 @@
+"""
+Linha de comandos da instrumentação: corre `simulation_batch` com um
+`Instrumentation` e mostra o tempo de cada etapa, opcionalmente dentro do
+`cProfile`.
+
+    python -m simulador.perfil --mode 4 --paths 100000 --json perfil.json
+    python -m simulador.perfil --mode 1 --record --memory
+    python -m simulador.perfil --mode 1 --profile --profile-output run.prof
+"""
+import argparse
+import sys
+
+from simulador.instrumentacao import Instrumentation, profiled
+from simulador.modos import simulation_batch
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m simulador.perfil",
+        description="Corre simulation_batch com instrumentação e mostra onde se gasta o tempo.",
+    )
+    parser.add_argument("--mode", type=int, default=1, help="modo de simulation_batch")
+    parser.add_argument("--paths", type=int, default=100_000, help="número de trajetórias")
+    parser.add_argument("--years", type=int, default=55, help="anos simulados")
+    parser.add_argument("--seed", type=int, default=None, help="semente")
+    parser.add_argument("--engine", default="numpy", choices=("numpy", "numba", "auto"))
+    parser.add_argument("--record", action="store_true", help="guardar e formatar a tabela anual")
+    parser.add_argument("--memory", action="store_true", help="medir os picos de memória (tracemalloc)")
+    parser.add_argument("--json", metavar="FICHEIRO", help="guardar os dados em JSON")
+    parser.add_argument("--profile", action="store_true", help="correr dentro do cProfile")
+    parser.add_argument("--profile-output", metavar="FICHEIRO", help="guardar as estatísticas do cProfile")
+    args = parser.parse_args(argv)
+
+    with Instrumentation(trace_memory=args.memory) as probe:
+        def run():
+            result = simulation_batch(
+                n_paths=args.paths, mode=args.mode, total_years=args.years, seed=args.seed,
+                engine=args.engine, record=args.record, instrumentation=probe,
+            )
+            if args.record:
+                with probe.stage("formatting"):
+                    result.table.to_frame(path=0).to_string()
+            return result
+
+        if args.profile or args.profile_output:
+            profiled(run, output=args.profile_output, stream=sys.stderr if args.profile else None)
+        else:
+            run()
+
+    data = probe.to_dict()
+    print(f"{'Etapa':18} {'Tempo (s)':>10} {'%':>6} {'Chamadas':>9}")
+    for name, entry in sorted(data["stages"].items(), key=lambda item: -item[1]["seconds"]):
+        share = entry["seconds"] / data["elapsed_seconds"] * 100 if data["elapsed_seconds"] else 0.0
+        print(f"{name:18} {entry['seconds']:10.4f} {share:6.1f} {entry['calls']:9}")
+    print(f"{'total':18} {data['elapsed_seconds']:10.4f}")
+    if data["peak_memory_bytes"] is not None:
+        print(f"Pico de memória: {data['peak_memory_bytes'] / 2**20:.1f} MiB")
+    if args.json:
+        probe.to_json(args.json)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
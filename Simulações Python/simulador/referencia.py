@@ -0,0 +1,260 @@
+"""
+Ciclos de referência: uma trajetória, em Python puro, ano a ano (ou mês a
+mês), com as mesmas regras dos scripts originais.
+
+São a especificação executável dos motores vetorizados: `simulador.benchmark`
+compara-os com `simulate_paths` e `simulate_monthly_paths` sobre os mesmos
+retornos. Os retornos são sempre passados explicitamente (frações), por isso
+não há sorteios aqui.
+
+- `reference_simulation`: `simulation()` de Simulacao_Interativa_3.py
+  (modos 1 e 2 anuais, modo 3 mensal, com as regras mensais originais ou
+  a variante "consistent" de `simulate_monthly_paths`);
+- `reference_monte_carlo`: `monte_carlo_simulation_modified` de
+  Simulacao10_* e SimulacaoSP500_* (limite de anos negativos e
+  `min_threshold` verificado antes do aporte).
+"""
+
+
+def _monthly_contribution(
+    year, initial_monthly_contribution, step_interval, step_amount, min_monthly_contribution, max_monthly_contribution
+):
+    """Aporte mensal do ano, com subida (ou descida) por escalões"""
+    adjusted = initial_monthly_contribution + step_amount * ((year - 1) // step_interval)
+    if min_monthly_contribution is not None:
+        adjusted = max(adjusted, min_monthly_contribution)
+    if max_monthly_contribution is not None:
+        adjusted = min(adjusted, max_monthly_contribution)
+    return adjusted
+
+
+def _gross_up(desired_net, portfolio, total_contributions, tax_rate_withdrawal):
+    """Retirada bruta e líquida tal que o imposto incide só sobre as mais-valias"""
+    capital_ratio = min(1.0, total_contributions / portfolio) if portfolio > 0 else 1.0
+    gross_withdrawal = desired_net / (1 - tax_rate_withdrawal * (1 - capital_ratio))
+    capital_withdrawn = gross_withdrawal * capital_ratio
+    gain_withdrawn = gross_withdrawal - capital_withdrawn
+    tax_paid = gain_withdrawn * tax_rate_withdrawal
+    return gross_withdrawal, gross_withdrawal - tax_paid
+
+
+def reference_simulation(
+    returns,
+    mode=1,
+    total_years=55,
+    initial_portfolio=20000,
+    initial_monthly_contribution=200,
+    contribution_multiplier=14,
+    contribution_growth_rate=0.00,
+    management_fee=0.005,
+    target_portfolio=400000,
+    min_threshold=300000,
+    upper_threshold=600000,
+    withdrawal_base=20000,
+    withdrawal_growth_rate=0.00,
+    tax_rate_withdrawal=0.198,
+    continue_contributions_during_withdrawal=False,
+    contribution_step_up_interval=5,
+    contribution_step_up_amount=100,
+    min_monthly_contribution=None,
+    max_monthly_contribution=None,
+    withdrawal_strategy=1,
+    monthly_rules="original",
+):
+    """
+    Ciclo de `simulation()` para uma trajetória.
+
+    No modo 3, com as regras "original", o valor fixo a retirar nunca cresce,
+    como no ciclo mensal de `simulation()`; com "consistent" cresce
+    `withdrawal_growth_rate` no fim de cada ano em que houve retirada.
+
+    Args:
+        returns: Retornos anuais (modos 1 e 2) ou mensais (modo 3), frações
+        mode: 1 ou 2 (anual) ou 3 (mensal)
+        monthly_rules: Regras do modo 3 ("original" ou "consistent", ver
+            `simulate_monthly_paths`)
+
+    Returns:
+        Dicionário com final_balance, withdrawal_start_year (0 se não
+        atingido), total_withdrawn, total_contributions e end_balance (saldo
+        no fim de cada ano)
+    """
+    portfolio = initial_portfolio
+    in_withdrawal = False
+    current_withdrawal_net = withdrawal_base
+    withdrawal_start_year = 0
+    total_withdrawn = 0.0
+    total_contributions = 0.0
+    end_balance = []
+
+    if mode == 3:
+        withdrew_this_year = False
+        for month in range(total_years * 12):
+            year = month // 12 + 1
+            adjusted = _monthly_contribution(
+                year, initial_monthly_contribution, contribution_step_up_interval, contribution_step_up_amount,
+                min_monthly_contribution, max_monthly_contribution,
+            )
+            monthly_contribution = adjusted * (1 + contribution_growth_rate) ** (year - 1)
+            if month % 12 + 1 in (6, 12):
+                monthly_contribution *= 2
+
+            if not in_withdrawal and portfolio >= target_portfolio:
+                in_withdrawal = True
+                withdrawal_start_year = year
+
+            if not in_withdrawal or continue_contributions_during_withdrawal:
+                portfolio += monthly_contribution
+                total_contributions += monthly_contribution
+            if in_withdrawal and portfolio >= min_threshold:
+                if withdrawal_strategy == 1:
+                    desired_net = current_withdrawal_net / 12
+                    if portfolio >= upper_threshold:
+                        desired_net *= 2
+                else:
+                    desired_net = 0.04 * portfolio / 12
+                capital_ratio = min(1.0, total_contributions / portfolio) if portfolio > 0 else 1.0
+                portfolio -= desired_net / (1 - tax_rate_withdrawal * (1 - capital_ratio))
+                total_withdrawn += desired_net
+                withdrew_this_year = True
+
+            portfolio *= 1 + (returns[month] - management_fee / 12)
+            if month % 12 == 11:
+                end_balance.append(portfolio)
+                if monthly_rules == "consistent" and withdrawal_strategy == 1 and withdrew_this_year:
+                    current_withdrawal_net *= 1 + withdrawal_growth_rate
+                withdrew_this_year = False
+    else:
+        for year in range(1, total_years + 1):
+            adjusted = _monthly_contribution(
+                year, initial_monthly_contribution, contribution_step_up_interval, contribution_step_up_amount,
+                min_monthly_contribution, max_monthly_contribution,
+            )
+            annual_contribution = adjusted * contribution_multiplier * (1 + contribution_growth_rate) ** (year - 1)
+
+            if not in_withdrawal and portfolio >= target_portfolio:
+                in_withdrawal = True
+                withdrawal_start_year = year
+
+            if not in_withdrawal or continue_contributions_during_withdrawal:
+                portfolio += annual_contribution
+                total_contributions += annual_contribution
+            if in_withdrawal and portfolio >= min_threshold:
+                if withdrawal_strategy == 1:
+                    desired_net = current_withdrawal_net
+                    if portfolio >= upper_threshold:
+                        desired_net *= 2
+                else:
+                    desired_net = 0.04 * portfolio
+                gross_withdrawal, net_withdrawal = _gross_up(
+                    desired_net, portfolio, total_contributions, tax_rate_withdrawal
+                )
+                portfolio -= gross_withdrawal
+                total_withdrawn += net_withdrawal
+                if withdrawal_strategy == 1:
+                    current_withdrawal_net *= 1 + withdrawal_growth_rate
+
+            portfolio *= 1 + (returns[year - 1] - management_fee)
+            end_balance.append(portfolio)
+
+    return {
+        "final_balance": portfolio,
+        "withdrawal_start_year": withdrawal_start_year,
+        "total_withdrawn": total_withdrawn,
+        "total_contributions": total_contributions,
+        "end_balance": end_balance,
+    }
+
+
+def reference_monte_carlo(
+    returns,
+    total_years=55,
+    initial_portfolio=2500,
+    initial_monthly_contribution=200,
+    contribution_multiplier=14,
+    contribution_growth_rate=0.00,
+    management_fee=0.005,
+    target_portfolio=400000,
+    min_threshold=100000,
+    upper_threshold=550000,
+    withdrawal_base=30000,
+    withdrawal_growth_rate=0.00,
+    tax_rate_withdrawal=0.198,
+    continue_contributions_during_withdrawal=False,
+    contribution_step_up_interval=5,
+    contribution_step_up_amount=-50,
+    min_monthly_contribution=None,
+    max_monthly_contribution=None,
+    negative_years_cap=12,
+):
+    """
+    Ciclo de `monte_carlo_simulation_modified` para uma trajetória.
+
+    Simulacao10_1 e SimulacaoSP500_1 usam `contribution_step_up_amount`
+    negativo com `min_monthly_contribution`; Simulacao10_2 e
+    SimulacaoSP500_2 positivo com `max_monthly_contribution`. Os scripts
+    SimulacaoSP500_* não têm limite de anos negativos
+    (`negative_years_cap=None`).
+
+    Args:
+        returns: Retornos anuais (frações)
+
+    Returns:
+        Dicionário como em `reference_simulation`
+    """
+    portfolio = initial_portfolio
+    in_withdrawal = False
+    current_withdrawal_net = withdrawal_base
+    withdrawal_start_year = 0
+    total_withdrawn = 0.0
+    total_contributions = 0.0
+    negative_years = 0
+    end_balance = []
+
+    for year in range(1, total_years + 1):
+        adjusted = _monthly_contribution(
+            year, initial_monthly_contribution, contribution_step_up_interval, contribution_step_up_amount,
+            min_monthly_contribution, max_monthly_contribution,
+        )
+        annual_contribution = adjusted * contribution_multiplier * (1 + contribution_growth_rate) ** (year - 1)
+
+        if not in_withdrawal and portfolio >= target_portfolio:
+            in_withdrawal = True
+            withdrawal_start_year = year
+
+        if not in_withdrawal:
+            portfolio += annual_contribution
+            total_contributions += annual_contribution
+        else:
+            # min_threshold é verificado antes do aporte
+            can_withdraw = portfolio >= min_threshold
+            if continue_contributions_during_withdrawal:
+                portfolio += annual_contribution
+                total_contributions += annual_contribution
+            if can_withdraw:
+                desired_net = current_withdrawal_net
+                if portfolio >= upper_threshold:
+                    desired_net *= 2
+                gross_withdrawal, net_withdrawal = _gross_up(
+                    desired_net, portfolio, total_contributions, tax_rate_withdrawal
+                )
+                portfolio -= gross_withdrawal
+                total_withdrawn += net_withdrawal
+                current_withdrawal_net *= 1 + withdrawal_growth_rate
+
+        effective_return = returns[year - 1] - management_fee
+        if negative_years_cap is not None and effective_return < 0:
+            if negative_years < negative_years_cap:
+                negative_years += 1
+            else:
+                effective_return = 0.0
+        portfolio *= 1 + effective_return
+        end_balance.append(portfolio)
+
+    return {
+        "final_balance": portfolio,
+        "withdrawal_start_year": withdrawal_start_year,
+        "total_withdrawn": total_withdrawn,
+        "total_contributions": total_contributions,
+        "end_balance": end_balance,
+    }
@@ -0,0 +1,281 @@
+"""
+Registo de séries de retornos em ficheiros binários.
+
+Cada série (índice, ETF, ...) é guardada num ficheiro `.npy` com os retornos
+em frações (0.07 = 7%), e os metadados (frequência, data de início, moeda,
+descrição) ficam em `series.json` no mesmo diretório. Registar de novo uma
+série cria uma nova versão num ficheiro novo; os ficheiros antigos não são
+alterados, por isso resultados guardados com uma versão continuam
+reprodutíveis enquanto essa versão não for apagada com `prune`.
+
+O registo por omissão (`default_registry`) escreve no diretório de dados do
+utilizador (`$SIMULADOR_DATA_DIR`, ou `~/.local/share/simulador`,
+`%LOCALAPPDATA%\\simulador`, ...) e lê as séries incluídas no pacote
+(`simulador/dados`, só de leitura) quando não as tem.
+
+Os ficheiros são abertos com `np.load(..., mmap_mode="r")` uma única vez por
+processo: os dados não são copiados para a memória do processo e as páginas
+do ficheiro são partilhadas pelo sistema operativo entre todos os processos
+que leem a mesma série (por exemplo os trabalhadores de `run_parallel`). Os
+arrays devolvidos são só de leitura.
+"""
+import functools
+import json
+import os
+import re
+import sys
+import tempfile
+from dataclasses import asdict, dataclass
+
+import numpy as np
+
+# Séries incluídas no pacote (só de leitura)
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados")
+DATA_DIR_ENV = "SIMULADOR_DATA_DIR"
+METADATA_FILE = "series.json"
+
+FREQUENCIES = ("daily", "monthly", "annual")
+
+
+@dataclass(frozen=True)
+class SeriesInfo:
+    """
+    Metadados de uma versão de uma série.
+
+    Attributes:
+        name: Nome da série no registo (ex: "sp500_annual")
+        version: Número da versão (1, 2, ...)
+        frequency: "daily", "monthly" ou "annual"
+        start: Data do primeiro período (ISO, ex: "1985-01-01")
+        currency: Moeda dos retornos (ex: "USD")
+        length: Número de períodos
+        file: Nome do ficheiro `.npy` no diretório do registo
+        description: Texto livre (fonte, índice, ...)
+    """
+
+    name: str
+    version: int
+    frequency: str
+    start: str
+    currency: str
+    length: int
+    file: str
+    description: str = ""
+
+
+def write_atomic(path, write):
+    """Escreve num ficheiro temporário e troca de nome (atómico)"""
+    directory = os.path.dirname(path)
+    handle, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as file:
+            write(file)
+        os.chmod(temporary, 0o644)  # mkstemp cria o ficheiro só para o dono
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def user_data_dir():
+    """Diretório do registo do utilizador (`$SIMULADOR_DATA_DIR` ou o da plataforma)"""
+    directory = os.environ.get(DATA_DIR_ENV)
+    if directory:
+        return directory
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser(os.path.join("~", "AppData", "Local"))
+    elif sys.platform == "darwin":
+        base = os.path.expanduser(os.path.join("~", "Library", "Application Support"))
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.expanduser(os.path.join("~", ".local", "share"))
+    return os.path.join(base, "simulador")
+
+
+class ReturnRegistry:
+    """
+    Registo de séries de retornos num diretório.
+
+    Args:
+        directory: Diretório com `series.json` e os ficheiros `.npy`
+            (por omissão o do utilizador, ver `user_data_dir`)
+        fallback: Registo consultado (só para leitura) para as séries ou
+            versões que este não tem
+    """
+
+    def __init__(self, directory=None, fallback=None):
+        self.directory = user_data_dir() if directory is None else directory
+        self.fallback = fallback
+        self._metadata = None
+        self._arrays = {}
+
+    def names(self):
+        """Nomes das séries registadas"""
+        names = set(self._entries())
+        if self.fallback is not None:
+            names.update(self.fallback.names())
+        return sorted(names)
+
+    def info(self, name, version=None):
+        """
+        Metadados de uma série.
+
+        Args:
+            name: Nome da série
+            version: Versão pedida (None = a mais recente)
+
+        Returns:
+            SeriesInfo
+        """
+        _, entry = self._find(name, version)
+        return SeriesInfo(name=name, **entry)
+
+    def load(self, name, version=None):
+        """
+        Retornos de uma série (frações), mapeados do ficheiro.
+
+        O ficheiro é aberto só na primeira chamada; as seguintes devolvem o
+        mesmo array, sem cópias.
+
+        Returns:
+            Array 1-D só de leitura
+        """
+        registry, entry = self._find(name, version)
+        key = (name, entry["version"])
+        values = registry._arrays.get(key)
+        if values is None:
+            values = np.load(os.path.join(registry.directory, entry["file"]), mmap_mode="r").view(np.ndarray)
+            values.setflags(write=False)
+            registry._arrays[key] = values
+        return values
+
+    def register(self, name, values, frequency, start, currency, description=""):
+        """
+        Guarda uma nova versão de uma série.
+
+        Args:
+            name: Nome da série (letras, números e "_")
+            values: Retornos em frações
+            frequency: "daily", "monthly" ou "annual"
+            start: Data do primeiro período (ISO)
+            currency: Moeda dos retornos
+
+        Returns:
+            SeriesInfo da versão criada (numerada a seguir à mais recente,
+            também no registo de recurso)
+        """
+        if frequency not in FREQUENCIES:
+            raise ValueError(f"Frequência desconhecida: {frequency!r} (opções: {', '.join(FREQUENCIES)})")
+        if not name.replace("_", "").isalnum():
+            raise ValueError(f"Nome de série inválido: {name!r}")
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        if values.ndim != 1 or not len(values):
+            raise ValueError("A série tem de ser um array 1-D não vazio")
+
+        os.makedirs(self.directory, exist_ok=True)
+        metadata = self._read_metadata()
+        versions = metadata.setdefault(name, [])
+        latest = versions[-1]["version"] if versions else 0
+        if self.fallback is not None and name in self.fallback.names():
+            latest = max(latest, self.fallback.info(name).version)
+        version = latest + 1
+        info = SeriesInfo(
+            name=name,
+            version=version,
+            frequency=frequency,
+            start=str(start),
+            currency=currency,
+            length=len(values),
+            file=f"{name}.v{version}.npy",
+            description=description,
+        )
+        write_atomic(os.path.join(self.directory, info.file), lambda file: np.save(file, values))
+
+        entry = asdict(info)
+        del entry["name"]
+        versions.append(entry)
+        self._write_metadata(metadata)
+        return info
+
+    def prune(self, name, keep=1):
+        """
+        Apaga as versões mais antigas de uma série (só neste registo).
+
+        Resultados guardados com uma versão apagada deixam de ser
+        reprodutíveis, e as entradas da cache calculadas com ela deixam de
+        ser encontradas.
+
+        Args:
+            name: Nome da série
+            keep: Número de versões mais recentes a manter (pelo menos 1)
+
+        Returns:
+            Lista das versões apagadas
+        """
+        if keep < 1:
+            raise ValueError("keep tem de ser pelo menos 1")
+        metadata = self._read_metadata()
+        versions = metadata.get(name, [])
+        removed, kept = versions[:-keep], versions[-keep:]
+        if removed:
+            metadata[name] = kept
+            self._write_metadata(metadata)
+        for entry in removed:
+            self._arrays.pop((name, entry["version"]), None)
+
+        # Apaga também ficheiros que ficaram de limpezas anteriores
+        kept_files = {entry["file"] for entry in kept}
+        pattern = re.compile(rf"{re.escape(name)}\.v\d+\.npy")
+        for file in os.listdir(self.directory) if os.path.isdir(self.directory) else ():
+            if pattern.fullmatch(file) and file not in kept_files:
+                try:
+                    os.remove(os.path.join(self.directory, file))
+                except OSError:
+                    pass  # ainda mapeado noutro processo (Windows): fica para a próxima limpeza
+        return [entry["version"] for entry in removed]
+
+    def _find(self, name, version):
+        """(registo, entrada dos metadados) da versão pedida"""
+        versions = self._entries().get(name, [])
+        for entry in reversed(versions):
+            if version is None or entry["version"] == version:
+                return self, entry
+        if self.fallback is not None and name in self.fallback.names():
+            return self.fallback._find(name, version)
+        if not versions:
+            raise KeyError(f"Série desconhecida: {name!r} (registadas: {', '.join(self.names())})")
+        raise KeyError(f"A série {name!r} não tem a versão {version}")
+
+    def _write_metadata(self, metadata):
+        write_atomic(
+            os.path.join(self.directory, METADATA_FILE),
+            lambda file: file.write((json.dumps(metadata, indent=2, ensure_ascii=False) + "\n").encode("utf-8")),
+        )
+        self._metadata = metadata
+
+    def _entries(self):
+        if self._metadata is None:
+            self._metadata = self._read_metadata()
+        return self._metadata
+
+    def _read_metadata(self):
+        path = os.path.join(self.directory, METADATA_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)
+
+
+@functools.lru_cache(maxsize=None)
+def default_registry():
+    """Registo do utilizador, com as séries do pacote como recurso (um por processo)"""
+    return ReturnRegistry(fallback=ReturnRegistry(DATA_DIR))
+
+
+def load_series(name, version=None):
+    """Retornos de uma série do registo por omissão (ver `ReturnRegistry.load`)"""
+    return default_registry().load(name, version)
+
+
+def series_info(name, version=None):
+    """Metadados de uma série do registo por omissão"""
+    return default_registry().info(name, version)
@@ -0,0 +1,140 @@
+"""
+Tabela anual de resultados em colunas pré-alocadas.
+
+Os motores escrevem cada coluna num array NumPy numérico alocado de uma vez
+(um valor por ano, ou (anos, trajetórias) em simulações em lote). Os nomes
+das colunas, o arredondamento e o texto "Crescimento (%)" só são aplicados
+quando alguém pede o DataFrame (`to_frame`), fora do ciclo principal.
+"""
+import numpy as np
+import pandas as pd
+
+ACUMULACAO = "Acumulação"
+RETIRADA = "Retirada"
+
+# Colunas numéricas guardadas pelos motores, pela ordem da tabela final
+COLUMNS = (
+    "start_balance",
+    "contribution",
+    "withdrawal",
+    "net_withdrawal",
+    "growth",
+    "end_balance",
+)
+
+# Nomes das colunas em simulation() (Simulacao_Interativa*.py)
+LABELS = {
+    "year": "Ano",
+    "phase": "Fase",
+    "start_balance": "Saldo inicio (€)",
+    "contribution": "Contribuição (€)",
+    "withdrawal": "Retirada (€)",
+    "net_withdrawal": "Retirada líquida (€)",
+    "growth": "Crescimento (%)",
+    "end_balance": "Saldo final (€)",
+}
+
+# Nomes das colunas em monte_carlo_simulation_modified (Simulacao10_*, SimulacaoSP500_*)
+LABELS_MONTE_CARLO = dict(
+    LABELS,
+    net_withdrawal="Retirada Real após imposto (€)",
+    growth="Crescimento anual (%)",
+)
+
+# Valor por omissão de `YearlyResults.path` (manter a formatação da tabela)
+_INHERIT = object()
+
+
+def format_growth(value):
+    """Formato original de "Crescimento anual (%)": 2 casas decimais"""
+    return f"{value:.2f} %"
+
+
+class YearlyResults:
+    """
+    Resultados anuais guardados por coluna.
+
+    Cada coluna numérica é um atributo com forma (anos,) ou, em lote,
+    (anos, trajetórias). `phase` guarda True nos anos em fase de Retirada e
+    `growth` guarda o retorno efetivo como fração (0.07 = 7%).
+
+    Args:
+        total_years: Número de anos (linhas)
+        n_paths: Número de trajetórias (None = uma única trajetória)
+        labels: Nomes das colunas do DataFrame
+        decimals: Casas decimais no DataFrame (None = sem arredondamento)
+        growth_formatter: Converte o crescimento (em %) em texto (None =
+            coluna numérica, em %)
+        dtype: Tipo das colunas numéricas
+    """
+
+    def __init__(
+        self, total_years, n_paths=None, labels=LABELS, decimals=None, growth_formatter=format_growth, dtype=np.float64
+    ):
+        shape = (total_years,) if n_paths is None else (total_years, n_paths)
+        self.total_years = total_years
+        self.n_paths = n_paths
+        self.labels = labels
+        self.decimals = decimals
+        self.growth_formatter = growth_formatter
+
+        self.phase = np.zeros(shape, dtype=bool)
+        for column in COLUMNS:
+            setattr(self, column, np.zeros(shape, dtype=dtype))
+
+    def paths_view(self, column):
+        """Coluna com forma (trajetórias, anos), sem cópia"""
+        return getattr(self, column).T
+
+    def path(self, index, decimals=None, growth_formatter=_INHERIT):
+        """
+        Tabela de uma única trajetória de uma simulação em lote.
+
+        Args:
+            index: Trajetória a extrair
+            decimals, growth_formatter: Formatação da nova tabela (por
+                omissão a desta)
+        """
+        single = YearlyResults(
+            self.total_years,
+            labels=self.labels,
+            decimals=self.decimals if decimals is None else decimals,
+            growth_formatter=self.growth_formatter if growth_formatter is _INHERIT else growth_formatter,
+        )
+        single.phase = self.phase[:, index].copy()
+        for column in COLUMNS:
+            setattr(single, column, getattr(self, column)[:, index].copy())
+        return single
+
+    def to_frame(self, path=None):
+        """
+        Constrói o DataFrame com o mesmo formato das tabelas originais.
+
+        Args:
+            path: Trajetória a mostrar (obrigatório em simulações em lote)
+        """
+        if self.n_paths is not None:
+            if path is None:
+                raise ValueError("Indique a trajetória (path) a mostrar")
+            select = lambda column: getattr(self, column)[:, path]
+        else:
+            select = lambda column: getattr(self, column)
+
+        data = {
+            self.labels["year"]: np.arange(1, self.total_years + 1),
+            self.labels["phase"]: np.where(select("phase"), RETIRADA, ACUMULACAO),
+        }
+        for column in COLUMNS:
+            values = select(column)
+            if column == "growth" and self.growth_formatter is None:
+                data[self.labels[column]] = values * 100
+            elif column == "growth":
+                data[self.labels[column]] = [self.growth_formatter(value) for value in values * 100]
+            elif self.decimals is None:
+                data[self.labels[column]] = values
+            elif self.decimals == 0:
+                data[self.labels[column]] = np.round(values).astype(np.int64)
+            else:
+                data[self.labels[column]] = np.round(values, self.decimals)
+
+        return pd.DataFrame(data)
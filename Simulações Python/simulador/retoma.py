@@ -0,0 +1,326 @@
+"""
+Simulação em duas fases com ponto de retoma na mudança de fase.
+
+Na fase de acumulação o saldo só depende dos retornos, dos aportes, da taxa
+de gestão e do target; os parâmetros de retirada (`WITHDRAWAL_PARAMS`) só
+contam depois de a trajetória entrar em "Retirada". `phase_checkpoint`
+simula a acumulação uma vez e guarda o estado de cada trajetória no ano em
+que muda de fase (saldo, contribuições, anos negativos, ano de início) e os
+retornos dos anos seguintes; `PhaseCheckpoint.resume` simula só os anos de
+retirada com novos parâmetros:
+
+    checkpoint = phase_checkpoint(n_paths=100000, seed=1)
+    for base in (20000, 25000, 30000):
+        result = checkpoint.resume(withdrawal_base=base)
+
+O resultado é igual ao de `simulation_batch` com os mesmos parâmetros e a
+mesma semente, sem voltar a sortear retornos nem a simular a acumulação.
+Só os modos anuais (1, 2 e 4) e o motor NumPy; sem tabela anual.
+"""
+import inspect
+from dataclasses import dataclass
+
+import numpy as np
+
+from simulador.modos import _annual_returns, simulation_batch
+from simulador.vetorizado import BatchResult, contribution_schedule, withdrawal_amounts
+
+# Parâmetros que só contam na fase de retirada
+WITHDRAWAL_PARAMS = (
+    "min_threshold",
+    "upper_threshold",
+    "withdrawal_base",
+    "withdrawal_growth_rate",
+    "tax_rate_withdrawal",
+    "withdrawal_strategy",
+    "continue_contributions_during_withdrawal",
+    "threshold_before_contribution",
+)
+
+_DEFAULTS = {
+    name: parameter.default for name, parameter in inspect.signature(simulation_batch).parameters.items()
+}
+# Parâmetros sem efeito nos modos anuais
+_IGNORED = ("withdrawal_months", "drawdown_limit", "chunk_days", "instrumentation")
+
+
+@dataclass
+class PhaseCheckpoint:
+    """
+    Estado de cada trajetória no início do ano em que muda para "Retirada".
+
+    As trajetórias que nunca atingem o target guardam o estado final.
+
+    Attributes:
+        balance: Saldo no início do ano de mudança de fase (ou saldo final)
+        total_contributions: Contribuições acumuladas até esse ponto
+        phase: Trajetórias que entram em retirada
+        withdrawal_start_year: Ano de início das retiradas (0 = não atingido)
+        negative_years: Anos negativos contados até esse ponto
+        ruined, ruin_year: Ruína durante a acumulação (mantém-se se a
+            trajetória recuperar e mudar de fase)
+        switched: Índices das trajetórias que mudam de fase, por ano de início
+        returns: Retornos (anos, `switched`) dessas trajetórias
+        contributions: Aporte anual de cada ano
+        management_fee, negative_years_cap, dtype: Parâmetros fixos da
+            simulação
+        withdrawal: Parâmetros de retirada usados por omissão em `resume`
+    """
+
+    balance: np.ndarray
+    total_contributions: np.ndarray
+    phase: np.ndarray
+    withdrawal_start_year: np.ndarray
+    negative_years: np.ndarray
+    ruined: np.ndarray
+    ruin_year: np.ndarray
+    switched: np.ndarray
+    returns: np.ndarray
+    contributions: np.ndarray
+    management_fee: float
+    negative_years_cap: object
+    dtype: object
+    withdrawal: dict
+
+    @property
+    def n_paths(self):
+        return len(self.balance)
+
+    def resume(self, **changes):
+        """
+        Simula a fase de retirada a partir do ponto de retoma.
+
+        Args:
+            **changes: Novos valores de `WITHDRAWAL_PARAMS` (os restantes
+                ficam como em `phase_checkpoint`)
+
+        Returns:
+            BatchResult (sem tabela), igual ao de `simulation_batch` com os
+            mesmos parâmetros e a mesma semente
+        """
+        unknown = set(changes) - set(WITHDRAWAL_PARAMS)
+        if unknown:
+            raise ValueError(
+                f"Só os parâmetros de retirada podem mudar na retoma (não {', '.join(sorted(unknown))})"
+            )
+        params = {**self.withdrawal, **changes}
+        dtype = self.dtype
+
+        final_balance = self.balance.copy()
+        total_contributions = self.total_contributions.copy()
+        total_withdrawn = np.zeros(self.n_paths, dtype=dtype)
+        ruined = self.ruined.copy()
+        ruin_year = self.ruin_year.copy()
+
+        switched = self.switched
+        if switched.size:
+            state = _withdrawal_phase(self, **params)
+            final_balance[switched], total_contributions[switched], total_withdrawn[switched] = state[:3]
+            ruined[switched], ruin_year[switched] = state[3:]
+
+        return BatchResult(
+            final_balance=final_balance,
+            withdrawal_start_year=self.withdrawal_start_year.copy(),
+            total_withdrawn=total_withdrawn,
+            total_contributions=total_contributions,
+            ruined=ruined,
+            ruin_year=ruin_year,
+        )
+
+
+def _withdrawal_phase(
+    checkpoint,
+    min_threshold,
+    upper_threshold,
+    withdrawal_base,
+    withdrawal_growth_rate,
+    tax_rate_withdrawal,
+    withdrawal_strategy,
+    continue_contributions_during_withdrawal,
+    threshold_before_contribution,
+):
+    """
+    Anos de retirada das trajetórias que mudam de fase, com as regras de
+    `simulate_paths`.
+
+    As trajetórias estão ordenadas pelo ano de início, por isso as que já
+    estão em retirada num ano são um prefixo dos arrays e cada ano só
+    trabalha sobre elas (fatias contíguas, sem máscaras).
+
+    Returns:
+        (saldo final, contribuições, total retirado, arruinada, ano da ruína),
+        pela ordem de `checkpoint.switched`
+    """
+    dtype = checkpoint.dtype
+    switched = checkpoint.switched
+    total_years = len(checkpoint.contributions)
+    start = checkpoint.withdrawal_start_year[switched]
+    active_paths = np.searchsorted(start, np.arange(1, total_years + 1), side="right")
+
+    portfolio = checkpoint.balance[switched]
+    total_contributions = checkpoint.total_contributions[switched]
+    negative_years = checkpoint.negative_years[switched]
+    current_withdrawal_net = np.full(len(switched), withdrawal_base, dtype=dtype)
+    total_withdrawn = np.zeros(len(switched), dtype=dtype)
+    ruined = checkpoint.ruined[switched]  # ruína durante a acumulação
+    ruin_year = checkpoint.ruin_year[switched]
+    cap = checkpoint.negative_years_cap
+
+    for year_index in range(int(start[0]) - 1, total_years):
+        year = year_index + 1
+        active = slice(0, active_paths[year_index])
+        balance = portfolio[active]
+        contributed = total_contributions[active]
+
+        if continue_contributions_during_withdrawal:
+            if threshold_before_contribution:
+                can_withdraw = balance >= min_threshold
+            balance += checkpoint.contributions[year_index]
+            contributed += checkpoint.contributions[year_index]
+            if not threshold_before_contribution:
+                can_withdraw = balance >= min_threshold
+        else:
+            can_withdraw = balance >= min_threshold
+
+        if can_withdraw.any():
+            withdrawal_net = current_withdrawal_net[active]
+            gross_withdrawal, net_withdrawal = withdrawal_amounts(
+                balance, contributed, withdrawal_net, can_withdraw,
+                withdrawal_strategy, upper_threshold, tax_rate_withdrawal, dtype,
+            )
+            balance -= gross_withdrawal
+            total_withdrawn[active] += net_withdrawal
+            if withdrawal_strategy == 1:
+                withdrawal_net[:] = np.where(can_withdraw, withdrawal_net * (1 + withdrawal_growth_rate), withdrawal_net)
+
+        effective_return = np.asarray(checkpoint.returns[year_index, active], dtype=dtype) - checkpoint.management_fee
+        if cap is not None:
+            negative = effective_return < 0
+            capped = negative & (negative_years[active] >= cap)
+            negative_years[active] += negative & ~capped
+            effective_return = np.where(capped, 0.0, effective_return)
+
+        balance *= 1 + effective_return
+        newly_ruined = ~ruined[active] & (balance <= 0)
+        if newly_ruined.any():
+            ruined[active] |= newly_ruined
+            ruin_year[active][newly_ruined] = year
+
+    return portfolio, total_contributions, total_withdrawn, ruined, ruin_year
+
+
+def phase_checkpoint(n_paths=100000, seed=None, rng=None, **params):
+    """
+    Simula a fase de acumulação e guarda o ponto de retoma de cada trajetória.
+
+    Args:
+        n_paths: Número de trajetórias
+        seed, rng: Ver `simulation_batch` (a mesma semente dá os mesmos
+            retornos que `simulation_batch`)
+        **params: Parâmetros de `simulation_batch` (modos 1, 2 e 4); os de
+            `WITHDRAWAL_PARAMS` ficam como padrão de `resume`
+
+    Returns:
+        PhaseCheckpoint
+    """
+    unknown = set(params) - set(_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Parâmetros desconhecidos: {', '.join(sorted(unknown))}")
+    if params.get("returns") is not None or params.get("record"):
+        raise ValueError("returns e record não são suportados no ponto de retoma")
+    if params.get("engine", "numpy") != "numpy":
+        raise ValueError("O ponto de retoma usa sempre o motor NumPy")
+    params = {**_DEFAULTS, **params}
+    for name in _IGNORED:
+        del params[name]
+    if params["mode"] not in (1, 2, 4):
+        raise ValueError("O ponto de retoma só suporta os modos anuais (1, 2 e 4)")
+    if params["sampling"] != "random" and params["mode"] != 1:
+        raise ValueError("Os esquemas de amostragem só se aplicam ao modo 1")
+
+    if rng is None:
+        rng = np.random.default_rng(seed)
+    dtype = params["dtype"]
+    total_years = params["total_years"]
+    contributions = np.asarray(
+        contribution_schedule(
+            total_years,
+            params["initial_monthly_contribution"],
+            contribution_multiplier=params["contribution_multiplier"],
+            contribution_growth_rate=params["contribution_growth_rate"],
+            contribution_step_interval=params["contribution_step_up_interval"],
+            contribution_step_amount=params["contribution_step_up_amount"],
+            min_monthly_contribution=params["min_monthly_contribution"],
+            max_monthly_contribution=params["max_monthly_contribution"],
+        ),
+        dtype=dtype,
+    )
+    returns = _annual_returns(
+        n_paths, params["mode"], total_years, params["mean_return"], params["std_return"],
+        params["block_length"], params["bootstrap_circular"], params["bootstrap_stationary"],
+        params["series"], params["sampling"], rng, dtype,
+    )
+    if not isinstance(returns, np.ndarray):
+        returns = np.stack(list(returns))  # mesmos sorteios, materializados
+
+    management_fee = params["management_fee"]
+    cap = params["negative_years_cap"]
+    portfolio = np.full(n_paths, params["initial_portfolio"], dtype=dtype)
+    total_contributions = np.zeros(n_paths, dtype=dtype)
+    negative_years = np.zeros(n_paths, dtype=np.int32)
+    ruined = np.zeros(n_paths, dtype=bool)
+    ruin_year = np.zeros(n_paths, dtype=np.int32)
+    in_withdrawal = np.zeros(n_paths, dtype=bool)
+    withdrawal_start_year = np.zeros(n_paths, dtype=np.int32)
+    balance = np.empty(n_paths, dtype=dtype)
+    contributed = np.empty(n_paths, dtype=dtype)
+    negative_at_switch = np.empty(n_paths, dtype=np.int32)
+
+    for year_index in range(total_years):
+        year = year_index + 1
+        switch = ~in_withdrawal & (portfolio >= params["target_portfolio"])
+        if switch.any():
+            in_withdrawal |= switch
+            withdrawal_start_year[switch] = year
+            balance[switch] = portfolio[switch]
+            contributed[switch] = total_contributions[switch]
+            negative_at_switch[switch] = negative_years[switch]
+            if in_withdrawal.all():
+                break
+
+        # Só as trajetórias em acumulação interessam daqui em diante
+        accumulating = ~in_withdrawal
+        this_contribution = contributions[year_index] * accumulating
+        portfolio += this_contribution
+        total_contributions += this_contribution
+
+        effective_return = np.asarray(returns[year_index], dtype=dtype) - management_fee
+        if cap is not None:
+            negative = effective_return < 0
+            capped = negative & (negative_years >= cap)
+            negative_years += negative & ~capped
+            effective_return = np.where(capped, 0.0, effective_return)
+        portfolio *= 1 + effective_return
+        newly_ruined = accumulating & ~ruined & (portfolio <= 0)
+        if newly_ruined.any():
+            ruined |= newly_ruined
+            ruin_year[newly_ruined] = year
+
+    switched = np.flatnonzero(in_withdrawal)
+    switched = switched[np.argsort(withdrawal_start_year[switched], kind="stable")]
+    return PhaseCheckpoint(
+        balance=np.where(in_withdrawal, balance, portfolio),
+        total_contributions=np.where(in_withdrawal, contributed, total_contributions),
+        phase=in_withdrawal,
+        withdrawal_start_year=withdrawal_start_year,
+        negative_years=np.where(in_withdrawal, negative_at_switch, negative_years),
+        ruined=ruined,
+        ruin_year=ruin_year,
+        switched=switched,
+        returns=np.asarray(returns)[:, switched],
+        contributions=contributions,
+        management_fee=management_fee,
+        negative_years_cap=cap,
+        dtype=dtype,
+        withdrawal={name: params[name] for name in WITHDRAWAL_PARAMS},
+    )
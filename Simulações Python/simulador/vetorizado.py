@@ -0,0 +1,391 @@
+"""
+Motor Monte Carlo vetorizado.
+
+Em vez de simular uma trajetória por chamada, simula N trajetórias em
+simultâneo, ano a ano. O estado de cada trajetória (saldo, fase, aportes,
+retiradas, anos negativos) vive em arrays NumPy sobre o eixo das trajetórias
+e as regras de `monte_carlo_simulation_modified` passam a ser máscaras
+booleanas:
+
+- mudança de fase Acumulação -> Retirada quando o saldo atinge o target;
+- retirada só acima de `min_threshold` e a dobrar acima de `upper_threshold`;
+- bruto calculado a partir do líquido desejado (imposto só sobre mais-valias);
+- a partir de 12 anos negativos, os retornos negativos passam a 0%.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from simulador.compilado import compiled_paths, resolve_engine
+from simulador.instrumentacao import stage_timer
+from simulador.resultados import LABELS_MONTE_CARLO, YearlyResults
+
+
+@dataclass
+class BatchResult:
+    """
+    Resultado de uma simulação em lote (um valor por trajetória).
+
+    Attributes:
+        final_balance: Saldo final de cada trajetória
+        withdrawal_start_year: Ano em que começam as retiradas (0 = não atingido)
+        total_withdrawn: Total retirado (líquido) por trajetória
+        total_contributions: Total de contribuições por trajetória
+        ruined: Trajetórias cujo saldo chegou a zero (ou abaixo) em algum ano
+        ruin_year: Primeiro ano com saldo esgotado (0 = nunca)
+        table: Tabela anual completa, (anos, trajetórias), se pedida
+    """
+
+    final_balance: np.ndarray
+    withdrawal_start_year: np.ndarray
+    total_withdrawn: np.ndarray
+    total_contributions: np.ndarray
+    ruined: np.ndarray
+    ruin_year: np.ndarray
+    table: Optional[YearlyResults] = None
+
+    @property
+    def n_paths(self):
+        return len(self.final_balance)
+
+    @property
+    def balances(self):
+        """Saldo no fim de cada ano, (anos, trajetórias), se a tabela foi pedida"""
+        return None if self.table is None else self.table.end_balance
+
+    @property
+    def reached_target(self):
+        return self.withdrawal_start_year > 0
+
+    def target_probability(self):
+        """Probabilidade de atingir o target (iniciar a fase de retirada)"""
+        return float(np.mean(self.reached_target))
+
+    def ruin_probability(self):
+        """Probabilidade de o saldo se esgotar em algum ano"""
+        return float(np.mean(self.ruined))
+
+    def success_probability(self):
+        """Probabilidade de atingir o target sem nunca esgotar o saldo"""
+        return float(np.mean(self.reached_target & ~self.ruined))
+
+
+def contribution_schedule(
+    total_years,
+    initial_monthly_contribution,
+    contribution_multiplier=14,
+    contribution_growth_rate=0.00,
+    contribution_step_interval=5,
+    contribution_step_amount=0.0,
+    min_monthly_contribution=None,
+    max_monthly_contribution=None,
+):
+    """
+    Calcula o aporte anual de cada ano.
+
+    O aporte não depende da trajetória, por isso é calculado uma única vez.
+    `contribution_step_amount` negativo reproduz o decrescimento de
+    `Simulacao10_1.py`; positivo reproduz o aumento de `Simulacao10_2.py`.
+
+    Returns:
+        Array (anos,) com o aporte anual
+    """
+    years = np.arange(total_years)
+    step_periods = years // contribution_step_interval
+    adjusted_monthly_contribution = initial_monthly_contribution + contribution_step_amount * step_periods
+
+    if min_monthly_contribution is not None:
+        adjusted_monthly_contribution = np.maximum(adjusted_monthly_contribution, min_monthly_contribution)
+    if max_monthly_contribution is not None:
+        adjusted_monthly_contribution = np.minimum(adjusted_monthly_contribution, max_monthly_contribution)
+
+    annual_contribution = adjusted_monthly_contribution * contribution_multiplier
+    return annual_contribution * (1 + contribution_growth_rate) ** years
+
+
+def withdrawal_amounts(
+    portfolio,
+    total_contributions,
+    current_withdrawal_net,
+    can_withdraw,
+    withdrawal_strategy,
+    upper_threshold,
+    tax_rate_withdrawal,
+    dtype=np.float64,
+):
+    """
+    Retirada bruta e líquida de um ano, para as trajetórias em `can_withdraw`.
+
+    O líquido desejado é o valor corrente (a dobrar acima de
+    `upper_threshold`) ou 4% do saldo; o bruto é calculado de forma a que,
+    depois do imposto sobre a parte de mais-valias, fique o líquido desejado.
+
+    Returns:
+        (retirada bruta, retirada líquida), 0 nas restantes trajetórias
+    """
+    if withdrawal_strategy == 1:
+        desired_net = np.where(portfolio >= upper_threshold, current_withdrawal_net * 2, current_withdrawal_net)
+    else:  # 4% anual líquido
+        desired_net = 0.04 * portfolio
+
+    capital_ratio = np.ones(len(portfolio), dtype=dtype)
+    positive = portfolio > 0
+    np.minimum(1.0, total_contributions / np.where(positive, portfolio, 1.0), out=capital_ratio, where=positive)
+    gross_withdrawal = desired_net / (1 - tax_rate_withdrawal * (1 - capital_ratio))
+
+    capital_withdrawn = gross_withdrawal * capital_ratio
+    gain_withdrawn = gross_withdrawal - capital_withdrawn
+    tax_paid = gain_withdrawn * tax_rate_withdrawal
+    net_withdrawal = gross_withdrawal - tax_paid
+
+    return np.where(can_withdraw, gross_withdrawal, 0.0), np.where(can_withdraw, net_withdrawal, 0.0)
+
+
+def simulate_paths(
+    returns,
+    contributions,
+    n_paths=None,
+    initial_portfolio=2500,
+    management_fee=0.005,
+    target_portfolio=400000,
+    min_threshold=100000,
+    upper_threshold=550000,
+    withdrawal_base=30000,  # líquido
+    withdrawal_growth_rate=0.00,
+    tax_rate_withdrawal=0.198,
+    continue_contributions_during_withdrawal=False,
+    negative_years_cap=12,
+    withdrawal_strategy=1,  # 1 = Valor fixo, 2 = 4% anual líquido
+    threshold_before_contribution=True,
+    record=False,
+    engine="numpy",
+    dtype=np.float64,
+    instrumentation=None,
+):
+    """
+    Simula várias trajetórias em simultâneo, ano a ano.
+
+    Os parâmetros numéricos (saldo inicial, taxas, limiares, target e
+    retirada base) podem ser arrays (trajetórias,), com um valor por
+    trajetória (só no motor NumPy); é assim que `simulador.grelha` avalia várias
+    combinações numa só passagem.
+
+    Args:
+        returns: Retornos anuais brutos, (anos, trajetórias), ou um iterável
+            que produza um array (trajetórias,) por ano
+        contributions: Aporte anual de cada ano (ver `contribution_schedule`),
+            (anos,) ou (anos, trajetórias)
+        n_paths: Número de trajetórias (obrigatório se `returns` for um iterável)
+        negative_years_cap: Número de anos negativos a partir do qual os
+            retornos negativos passam a 0% (None = sem limite)
+        withdrawal_strategy: Estratégia de retirada (1=fixo, 2=4% anual)
+        threshold_before_contribution: Verificar `min_threshold` antes do
+            aporte do ano (Simulacao10_*) ou depois (simulation())
+        record: Guardar a tabela anual completa de cada trajetória
+        engine: "numpy", "numba" (núcleo compilado, ver `simulador.compilado`)
+            ou "auto"; sem Numba instalado usa sempre o NumPy
+        dtype: Tipo dos saldos e retornos (np.float32 reduz para metade a
+            memória e o tráfego, com precisão de ~7 algarismos; o núcleo
+            Numba usa sempre float64)
+        instrumentation: `simulador.instrumentacao.Instrumentation` que
+            regista os tempos por etapa e as trajetórias por fase
+
+    Returns:
+        BatchResult
+    """
+    stage = stage_timer(instrumentation)
+    if resolve_engine(engine) == "numba":
+        with stage("kernel"):
+            fields, table = compiled_paths(
+                returns,
+                contributions,
+                n_paths=n_paths,
+                initial_portfolio=initial_portfolio,
+                management_fee=management_fee,
+                target_portfolio=target_portfolio,
+                min_threshold=min_threshold,
+                upper_threshold=upper_threshold,
+                withdrawal_base=withdrawal_base,
+                withdrawal_growth_rate=withdrawal_growth_rate,
+                tax_rate_withdrawal=tax_rate_withdrawal,
+                continue_contributions_during_withdrawal=continue_contributions_during_withdrawal,
+                negative_years_cap=negative_years_cap,
+                withdrawal_strategy=withdrawal_strategy,
+                threshold_before_contribution=threshold_before_contribution,
+                record=record,
+            )
+        return BatchResult(**fields, table=table)
+
+    contributions = np.asarray(contributions, dtype=dtype)
+    total_years = len(contributions)
+    if n_paths is None:
+        n_paths = np.shape(returns)[1]
+    if instrumentation is not None:
+        returns = instrumentation.timed("returns", returns)
+
+    portfolio = np.full(n_paths, initial_portfolio, dtype=dtype)
+    in_withdrawal = np.zeros(n_paths, dtype=bool)
+    withdrawal_start_year = np.zeros(n_paths, dtype=np.int32)
+    current_withdrawal_net = np.full(n_paths, withdrawal_base, dtype=dtype)
+    total_withdrawn = np.zeros(n_paths, dtype=dtype)
+    total_contributions = np.zeros(n_paths, dtype=dtype)
+    negative_years = np.zeros(n_paths, dtype=np.int32)
+    ruined = np.zeros(n_paths, dtype=bool)
+    ruin_year = np.zeros(n_paths, dtype=np.int32)
+    table = YearlyResults(total_years, n_paths, dtype=dtype) if record else None
+
+    for year_index, annual_return in zip(range(total_years), returns):
+        year = year_index + 1
+        annual_contribution = contributions[year_index]
+        if table is not None:
+            table.start_balance[year_index] = portfolio
+
+        # Muda para fase de retirada
+        with stage("phase_transition"):
+            switch = ~in_withdrawal & (portfolio >= target_portfolio)
+            if switch.any():
+                in_withdrawal |= switch
+                withdrawal_start_year[switch] = year
+
+        # Aportes (em retirada só se continue_contributions_during_withdrawal)
+        with stage("contributions"):
+            if continue_contributions_during_withdrawal:
+                if threshold_before_contribution:
+                    can_withdraw = in_withdrawal & (portfolio >= min_threshold)
+                this_contribution = annual_contribution
+                portfolio += this_contribution
+                total_contributions += this_contribution
+                if not threshold_before_contribution:
+                    can_withdraw = in_withdrawal & (portfolio >= min_threshold)
+            else:
+                this_contribution = annual_contribution * ~in_withdrawal
+                portfolio += this_contribution
+                total_contributions += this_contribution
+                can_withdraw = in_withdrawal & (portfolio >= min_threshold)
+
+        # Define valor líquido desejado e calcula retirada bruta
+        with stage("withdrawal"):
+            if can_withdraw.any():
+                gross_withdrawal, net_withdrawal = withdrawal_amounts(
+                    portfolio, total_contributions, current_withdrawal_net, can_withdraw,
+                    withdrawal_strategy, upper_threshold, tax_rate_withdrawal, dtype,
+                )
+                portfolio -= gross_withdrawal
+                total_withdrawn += net_withdrawal
+                if withdrawal_strategy == 1:
+                    current_withdrawal_net = np.where(
+                        can_withdraw, current_withdrawal_net * (1 + withdrawal_growth_rate), current_withdrawal_net
+                    )
+
+        # Retorno do ano (com limite de anos negativos)
+        with stage("growth"):
+            effective_return = np.asarray(annual_return, dtype=dtype) - management_fee
+            if negative_years_cap is not None:
+                negative = effective_return < 0
+                capped = negative & (negative_years >= negative_years_cap)
+                negative_years += negative & ~capped
+                effective_return = np.where(capped, 0.0, effective_return)
+
+            portfolio *= 1 + effective_return
+            newly_ruined = ~ruined & (portfolio <= 0)
+            if newly_ruined.any():
+                ruined |= newly_ruined
+                ruin_year[newly_ruined] = year
+
+        if table is not None:
+            with stage("materialization"):
+                table.phase[year_index] = in_withdrawal
+                table.contribution[year_index] = this_contribution
+                if can_withdraw.any():
+                    table.withdrawal[year_index] = gross_withdrawal
+                    table.net_withdrawal[year_index] = net_withdrawal
+                table.growth[year_index] = effective_return
+                table.end_balance[year_index] = portfolio
+        if instrumentation is not None:
+            instrumentation.count_phases(year_index, in_withdrawal, ruined, total_years)
+
+    return BatchResult(
+        final_balance=portfolio,
+        withdrawal_start_year=withdrawal_start_year,
+        total_withdrawn=total_withdrawn,
+        total_contributions=total_contributions,
+        ruined=ruined,
+        ruin_year=ruin_year,
+        table=table,
+    )
+
+
+def monte_carlo_batch(
+    n_paths=100000,
+    total_years=55,
+    initial_portfolio=2500,
+    initial_monthly_contribution=200,
+    contribution_multiplier=14,
+    contribution_growth_rate=0.00,
+    mean_return=0.12,
+    std_return=0.00,
+    management_fee=0.005,
+    target_portfolio=400000,
+    min_threshold=100000,
+    upper_threshold=550000,
+    withdrawal_base=30000,  # líquido
+    withdrawal_growth_rate=0.00,
+    tax_rate_withdrawal=0.198,
+    continue_contributions_during_withdrawal=False,
+    contribution_step_interval=5,
+    contribution_step_amount=-50,
+    min_monthly_contribution=200,
+    max_monthly_contribution=None,
+    negative_years_cap=12,
+    seed=None,
+    record=False,
+    engine="numpy",
+):
+    """
+    Versão em lote de `monte_carlo_simulation_modified`: simula `n_paths`
+    trajetórias com retornos normais independentes.
+
+    Os retornos são gerados ano a ano (um array por ano), por isso a memória
+    cresce com o número de trajetórias e não com trajetórias × anos, a menos
+    que `record=True`.
+    Com `engine="numba"` os retornos são materializados numa matriz antes
+    de entrarem no núcleo compilado.
+
+    Returns:
+        BatchResult
+    """
+    rng = np.random.default_rng(seed)
+    contributions = contribution_schedule(
+        total_years,
+        initial_monthly_contribution,
+        contribution_multiplier=contribution_multiplier,
+        contribution_growth_rate=contribution_growth_rate,
+        contribution_step_interval=contribution_step_interval,
+        contribution_step_amount=contribution_step_amount,
+        min_monthly_contribution=min_monthly_contribution,
+        max_monthly_contribution=max_monthly_contribution,
+    )
+    returns = (rng.normal(mean_return, std_return, n_paths) for _ in range(total_years))
+
+    result = simulate_paths(
+        returns,
+        contributions,
+        n_paths=n_paths,
+        initial_portfolio=initial_portfolio,
+        management_fee=management_fee,
+        target_portfolio=target_portfolio,
+        min_threshold=min_threshold,
+        upper_threshold=upper_threshold,
+        withdrawal_base=withdrawal_base,
+        withdrawal_growth_rate=withdrawal_growth_rate,
+        tax_rate_withdrawal=tax_rate_withdrawal,
+        continue_contributions_during_withdrawal=continue_contributions_during_withdrawal,
+        negative_years_cap=negative_years_cap,
+        record=record,
+        engine=engine,
+    )
+    if result.table is not None:
+        result.table.labels = LABELS_MONTE_CARLO
+    return result
+